@@ -7,6 +7,9 @@ from aiogram.fsm.state import State, StatesGroup
 from app.utils.logging import get_logger
 from app.services.prefs import PreferencesService
 from app.services.webhook_client import WebhookClient
+from app.services.health import WebhookHealth, WebhookHealthProber
+from app.services.sweeper import state_sweeper
+from app.utils.cache import TTLCache
 from app.utils.env import config
 
 logger = get_logger(__name__)
@@ -14,9 +17,12 @@ router = Router()
 
 prefs_service = PreferencesService()
 webhook_client = WebhookClient()
+health_prober = WebhookHealthProber(webhook_client)
 
-# Память: последнее информационное сообщение бота на пользователя
-last_info_message_id: dict[int, int] = {}
+# Память: последнее информационное сообщение бота на пользователя.
+# Бот может удалять сообщения только в течение 48 часов — дольше не храним.
+last_info_message_id = TTLCache(maxsize=config.INFO_MESSAGE_CACHE_SIZE, ttl=48 * 3600)
+state_sweeper.track_cache("info_messages", last_info_message_id)
 
 
 class PlacementState(StatesGroup):
@@ -77,7 +83,7 @@ async def send_instruction(message: Message, text: str, reply_markup: InlineKeyb
             pass
     # Отправляем новое сообщение вниз (после команды пользователя)
     sent = await message.answer(text, reply_markup=reply_markup)
-    last_info_message_id[user_id] = sent.message_id
+    last_info_message_id.set(user_id, sent.message_id)
 
 
 @router.message(Command("start"))
@@ -87,8 +93,7 @@ async def cmd_start(message: Message):
     username = message.from_user.username or "пользователь"
     
     # Получаем текущий сервис и место размещения
-    current_service = prefs_service.get_user_service(user_id)
-    current_placement = prefs_service.get_user_placement(user_id)
+    current_service, current_placement = await prefs_service.get_user_context(user_id)
     
     greeting = f"👋 Привет, {username}!\n\nЯ помогу проверить и переслать материалы на выбранный сервис."
     await send_instruction(message, greeting + "\n\n" + build_full_instructions(current_service, current_placement))
@@ -127,7 +132,7 @@ async def cmd_help(message: Message):
 @router.message(Command("text"))
 async def cmd_text(message: Message):
     """Инструкция по работе с текстами и Excel."""
-    current_service = prefs_service.get_user_service(message.from_user.id)
+    current_service = await prefs_service.get_user_service(message.from_user.id)
     text = f"""📝 Инструкция по текстам
 
 Текущий сервис: {current_service.title()}
@@ -146,8 +151,7 @@ async def cmd_text(message: Message):
 async def cmd_service(message: Message):
     """Обработчик команды /service."""
     user_id = message.from_user.id
-    current_service = prefs_service.get_user_service(user_id)
-    current_placement = prefs_service.get_user_placement(user_id)
+    current_service, current_placement = await prefs_service.get_user_context(user_id)
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [
@@ -175,30 +179,47 @@ async def cmd_service(message: Message):
 async def cmd_status(message: Message):
     """Обработчик команды /status."""
     user_id = message.from_user.id
-    current_service = prefs_service.get_user_service(user_id)
+    current_service = await prefs_service.get_user_service(user_id)
     
     webhook_url = config.get_webhook_url(current_service)
     if not webhook_url:
         await message.answer("❌ Не удалось определить URL вебхука")
         return
     
-    await message.answer("🔄 Проверяю статус вебхука...")
+    health = health_prober.get(webhook_url)
+    if health is None or not health_prober.enabled:
+        # Фоновая проверка выключена или ещё не дошла до этого вебхука
+        await message.answer("🔄 Проверяю статус вебхука...")
+        health = await health_prober.probe(webhook_url)
     
-    success = await webhook_client.send_ping(webhook_url)
-    
-    if success:
-        await message.answer(f"✅ Вебхук {current_service.title()} работает корректно")
-    else:
-        await message.answer(f"❌ Проблемы с вебхуком {current_service.title()}")
+    text = format_health(current_service, health)
+    breaker = webhook_client.breakers.find(webhook_url)
+    if breaker is not None and breaker.state != "closed":
+        text += f"\n🚫 Отправка приостановлена (circuit breaker: {breaker.state})"
+    await message.answer(text)
     
     logger.info(f"🔍 Пользователь {user_id} проверил статус вебхука {current_service}")
 
 
+def format_health(service: str, health: WebhookHealth) -> str:
+    """Текст статуса вебхука для /status."""
+    if health.healthy:
+        text = f"✅ Вебхук {service.title()} работает корректно"
+    else:
+        status = health.last_status if health.last_status is not None else "нет ответа"
+        text = f"❌ Проблемы с вебхуком {service.title()} (статус: {status}, ошибок подряд: {health.consecutive_failures})"
+    if health.last_latency is not None:
+        text += f"\n⏱ Время ответа: {health.last_latency * 1000:.0f} мс"
+    if health.age is not None:
+        text += f"\n🕒 Проверено {health.age:.0f} с назад"
+    return text
+
+
 @router.message(Command("placement"))
 async def cmd_placement(message: Message, state: FSMContext):
     """Обработчик команды /placement - установка места размещения."""
     user_id = message.from_user.id
-    current_placement = prefs_service.get_user_placement(user_id)
+    current_placement = await prefs_service.get_user_placement(user_id)
     
     text = f"""📍 Место размещения креатива
 
@@ -227,10 +248,10 @@ async def handle_placement_input(message: Message, state: FSMContext):
         return
     
     # Сохраняем место размещения
-    prefs_service.set_user_placement(user_id, placement_text)
+    await prefs_service.set_user_placement(user_id, placement_text)
     
     # Получаем текущий сервис для показа обновленных инструкций
-    current_service = prefs_service.get_user_service(user_id)
+    current_service = await prefs_service.get_user_service(user_id)
     
     await message.answer(f"✅ Место размещения установлено:\n**{placement_text}**")
     await send_instruction(message, build_full_instructions(current_service, placement_text))
@@ -244,8 +265,8 @@ async def callback_service(callback: CallbackQuery):
     user_id = callback.from_user.id
     service = callback.data.split("_")[1]
     
-    prefs_service.set_user_service(user_id, service)
-    current_placement = prefs_service.get_user_placement(user_id)
+    await prefs_service.set_user_service(user_id, service)
+    current_placement = await prefs_service.get_user_placement(user_id)
     
     await callback.message.edit_text(
         f"✅ Сервис изменен на **{service.title()}**\n\n" + build_full_instructions(service, current_placement),
@@ -1,97 +1,210 @@
 """Обработчики медиа и текста."""
 import asyncio
+import functools
 import json
+import time
 import uuid
 from typing import Dict, List, Set, Optional
 from datetime import datetime, timedelta
-from aiogram import Router, F
+from aiogram import Bot, Router, F
 from aiogram.types import Message
 from app.utils.logging import get_logger
 from app.services.tg_files import TelegramFileService
 from app.services.webhook_client import WebhookClient
+from app.services.excel import download_to_spool, aiter_excel_texts
 from app.services.prefs import PreferencesService
+from app.services.outbox import WebhookOutbox
+from app.services.health import WebhookHealthProber
+from app.services.state import create_buffer_store
+from app.services.sweeper import state_sweeper
+from app.utils.scheduler import DeadlineScheduler
+from app.utils.debounce import AdaptiveDebounce
 from app.models.payload import WebhookPayload, Creative, ChatInfo, UserInfo, MessageInfo, BatchInfo
 from app.models.payload import TextsPayload
 from app.utils.env import config
-import httpx
-from io import BytesIO
+from app.utils.metrics import COUNT_BUCKETS, gauge, histogram, registry
+from app.services.webhook_client import BATCH_CHUNKS
 
 logger = get_logger(__name__)
 router = Router()
 
-# Глобальные переменные для управления burst-режимом
-user_buffers: Dict[int, List[Message]] = {}
-user_timers: Dict[int, asyncio.Task] = {}
-media_groups: Dict[str, List[Message]] = {}
-media_group_timers: Dict[str, asyncio.Task] = {}
+BUFFER_FLUSH_SECONDS = histogram(
+    "buffer_flush_seconds", "Время от первого фото в буфере до сброса", ["kind"]
+)
+BATCH_CREATIVES = histogram("batch_creatives", "Креативов в одном пакете", ["grouping"], COUNT_BUCKETS)
+OUTBOX_IN_FLIGHT = gauge("outbox_in_flight", "Доставки outbox в процессе отправки")
+OUTBOX_QUEUE_DEPTH = gauge("outbox_queue_depth", "Доставки, ожидающие отправки в outbox")
+
+# Буфер, срок которого прошёл так давно, считается потерянным (сбой задачи сброса)
+ORPHAN_GRACE_SECS = 5.0
+
+# Сколько ждать остальные фото альбома после последнего полученного
+# (верхняя граница адаптивного окна)
+MEDIA_GROUP_DELAY_SECS = 1.5
+
+# Буферы burst-режима и альбомов (в памяти или общие для реплик, см. STATE_BACKEND)
+buffer_store = create_buffer_store()
+# Сроки сброса буферов этого процесса: одна куча и одна задача-цикл
+flush_scheduler = DeadlineScheduler()
+background_tasks: Set[asyncio.Task] = set()
+# Окна ожидания по интервалам между фото пользователя (в границах
+# DEBOUNCE_MIN_SECS и MEDIA_GROUP_DELAY_SECS / BURST_DEBOUNCE_SECS)
+debounce = AdaptiveDebounce(config.DEBOUNCE_MIN_SECS, enabled=config.ADAPTIVE_DEBOUNCE_ENABLED)
 
 # Сервисы
 tg_files_service = TelegramFileService(None)  # Будет инициализирован в main
 webhook_client = WebhookClient()
 prefs_service = PreferencesService()
+outbox = WebhookOutbox(webhook_client)  # Запускается в main при OUTBOX_ENABLED
+health_prober = WebhookHealthProber(webhook_client)  # Запускается в main
 
 # Инициализация будет выполнена в main.py
 
+def log_webhook_health(webhook_url: str) -> None:
+    """Записать в лог известные проблемы вебхука (отправку не блокирует).
+
+    Предупреждение только для таймаута, ошибки соединения или 5xx: вебхук,
+    отвечающий на ping 4xx, принимает обычные запросы.
+    """
+    health = health_prober.get(webhook_url)
+    if health is not None and not health.reachable:
+        logger.warning(
+            "⚠️ Вебхук %s по последней проверке недоступен (статус %s, ошибок подряд: %d)",
+            webhook_url, health.last_status, health.consecutive_failures
+        )
+
 @router.message(F.media_group_id & F.photo)
 async def handle_media_group(message: Message):
     """Обработчик альбомов фото (media groups)."""
     media_group_id = message.media_group_id
     user_id = message.from_user.id
+    key = f"album:{media_group_id}"
     
-    # Добавляем сообщение в группу
-    if media_group_id not in media_groups:
-        media_groups[media_group_id] = []
-    media_groups[media_group_id].append(message)
-    
-    # Отменяем предыдущий таймер для этой группы
-    if media_group_id in media_group_timers:
-        media_group_timers[media_group_id].cancel()
+    # Добавляем сообщение в группу; каждое новое фото переносит срок сброса
+    debounce.observe(key, user_id, MEDIA_GROUP_DELAY_SECS)
+    window = debounce.window("album", user_id, MEDIA_GROUP_DELAY_SECS)
+    state = await buffer_store.append(key, message, time.time() + window)
+    schedule_flush(key, state.deadline, message.bot)
     
-    # Создаем новый таймер
-    timer_task = asyncio.create_task(
-        process_media_group_after_delay(media_group_id, user_id)
-    )
-    media_group_timers[media_group_id] = timer_task
-    
-    logger.info(f"📦 Добавлено фото в media group {media_group_id}")
-
-async def process_media_group_after_delay(media_group_id: str, user_id: int):
-    """Обработать media group после задержки."""
-    await asyncio.sleep(1.5)  # Ждем 1.5 секунды для сбора всех сообщений
-    
-    if media_group_id in media_groups:
-        messages = media_groups[media_group_id]
-        del media_groups[media_group_id]
-        
-        if media_group_id in media_group_timers:
-            del media_group_timers[media_group_id]
-        
-        await process_messages_batch(messages, user_id, "media_group")
-        
-        logger.info(f"📦 Обработан media group {media_group_id} с {len(messages)} сообщениями")
+    logger.info("📦 Добавлено фото в media group %s", media_group_id)
 
 @router.message(F.photo & ~F.media_group_id)
 async def handle_single_photo(message: Message):
     """Обработчик одиночных фото (не в media group)."""
     user_id = message.from_user.id
+    key = f"burst:{user_id}"
     
-    # Добавляем в burst-буфер
-    if user_id not in user_buffers:
-        user_buffers[user_id] = []
-    
-    user_buffers[user_id].append(message)
+    # Добавляем в burst-буфер: каждое новое фото переносит срок сброса,
+    # но не дальше BURST_HARDCAP_SECS от первого фото в буфере
+    debounce.observe(key, user_id, config.BURST_DEBOUNCE_SECS)
+    window = debounce.window("burst", user_id, config.BURST_DEBOUNCE_SECS)
+    state = await buffer_store.append(key, message, time.time() + window, max_age=config.BURST_HARDCAP_SECS)
+    logger.info("📎 Добавлено одиночное фото в буфер пользователя %s", user_id)
     
-    # Отменяем предыдущий таймер для пользователя
-    if user_id in user_timers:
-        user_timers[user_id].cancel()
-    
-    # Создаем новый таймер
-    timer_task = asyncio.create_task(
-        process_user_buffer_after_delay(user_id)
-    )
-    user_timers[user_id] = timer_task
+    if state.count >= config.MAX_CREATIVES_PER_BATCH:
+        # Набран полный пакет: сбрасываем сразу, не дожидаясь срока
+        flush_scheduler.cancel(key)
+        messages = await buffer_store.take(key, message.bot)
+        if messages:
+            spawn(process_buffered_messages(key, messages))
+        return
+    schedule_flush(key, state.deadline, message.bot)
+
+def spawn(coro) -> asyncio.Task:
+    """Запустить фоновую задачу, удерживая ссылку до её завершения."""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+def schedule_flush(key: str, deadline: float, bot: Optional[Bot]) -> None:
+    """Установить (перенести) срок сброса буфера в общем планировщике."""
+    flush_scheduler.schedule(key, deadline, functools.partial(flush_buffer, key, bot))
+
+async def flush_buffer(key: str, bot: Optional[Bot]):
+    """Сбросить буфер, срок которого наступил.
     
-    logger.info(f"📎 Добавлено одиночное фото в буфер пользователя {user_id}")
+    Срок в хранилище могло перенести пришедшее позже сообщение (в том числе на
+    другой реплике) — тогда буфер перепланируется; забрать его может
+    только одна реплика.
+    """
+    messages = await buffer_store.take(key, bot, due_before=time.time())
+    if not messages:
+        state = await buffer_store.peek(key)
+        if state is not None and key not in flush_scheduler:
+            schedule_flush(key, state.deadline, bot)
+        return
+    await process_buffered_messages(key, messages)
+
+async def process_buffered_messages(key: str, messages: List[Message]):
+    """Обработать сообщения, забранные из буфера."""
+    kind, _, buffer_id = key.partition(":")
+    user_id = messages[0].from_user.id
+    latency = debounce.flushed(key)
+    if latency is not None:
+        BUFFER_FLUSH_SECONDS.observe(latency, kind=kind)
+    if kind == "album":
+        await process_messages_batch(messages, user_id, "media_group")
+        logger.info("📦 Обработан media group %s с %d сообщениями", buffer_id, len(messages))
+    else:
+        await process_messages_batch(messages, user_id, "debounce")
+        logger.info("⚡ Обработан burst пользователя %s с %d сообщениями", user_id, len(messages))
+
+async def resume_buffers(bot: Bot) -> int:
+    """Запланировать сброс буферов, оставшихся в общем хранилище (после перезапуска)."""
+    keys = await buffer_store.keys()
+    for key in keys:
+        state = await buffer_store.peek(key)
+        if state is not None:
+            schedule_flush(key, state.deadline, bot)
+    return len(keys)
+
+async def recover_orphaned_buffers() -> int:
+    """Запланировать сброс буферов, срок которых давно прошёл, а сброс не запланирован.
+
+    Такие буферы остаются, если задача сброса упала или реплика, владевшая
+    буфером в общем хранилище, остановилась.
+    """
+    recovered = 0
+    cutoff = time.time() - ORPHAN_GRACE_SECS
+    for key in await buffer_store.keys():
+        if key in flush_scheduler:
+            continue
+        state = await buffer_store.peek(key)
+        if state is not None and state.deadline < cutoff:
+            logger.warning(f"⚠️ Буфер {key} ({state.count} сообщений) не был сброшен вовремя, сбрасываем")
+            schedule_flush(key, time.time(), tg_files_service.bot)
+            recovered += 1
+    return recovered
+
+async def count_buffers() -> int:
+    """Количество непустых буферов в хранилище."""
+    return len(await buffer_store.keys())
+
+state_sweeper.track("buffers", count_buffers, recover_orphaned_buffers)
+state_sweeper.track("flush_scheduler", flush_scheduler.__len__)
+state_sweeper.track("background_tasks", background_tasks.__len__)
+state_sweeper.track("debounce", debounce.__len__, debounce.expire)
+state_sweeper.track_cache("tg_file_paths", tg_files_service.path_cache)
+
+async def count_finished_deliveries() -> int:
+    """Завершённые записи outbox (без запроса к БД, пока outbox не запущен)."""
+    return await outbox.finished_count() if outbox.running else 0
+
+async def purge_finished_deliveries() -> int:
+    """Удалить завершённые записи outbox старше OUTBOX_RETENTION_SECS."""
+    return await outbox.purge() if outbox.running else 0
+
+state_sweeper.track("outbox_finished", count_finished_deliveries, purge_finished_deliveries)
+
+OUTBOX_IN_FLIGHT.set_function(lambda: outbox.in_flight)
+
+async def collect_outbox_metrics() -> None:
+    """Обновить глубину очереди outbox (только пока outbox запущен)."""
+    if outbox.running:
+        OUTBOX_QUEUE_DEPTH.set((await outbox.stats())["queue_depth"])
+
+registry.add_collector(collect_outbox_metrics)
 
 @router.message(F.text)
 async def handle_texts(message: Message):
@@ -100,23 +213,20 @@ async def handle_texts(message: Message):
     - Отправляет массив строк на текстовый вебхук выбранного сервиса
     """
     user_id = message.from_user.id
-    service = prefs_service.get_user_service(user_id)
+    service, placement = await prefs_service.get_user_context(user_id)
     webhook_url = config.get_text_webhook_url(service)
     if not webhook_url:
         await message.answer("❌ Текстовый вебхук не настроен для выбранного сервиса")
         return
-    # Пингуем для логов, но не блокируем отправку (prod может возвращать 401/405)
-    try:
-        _ = await webhook_client.send_ping(webhook_url)
-    except Exception:
-        pass
+    log_webhook_health(webhook_url)
     lines = [line.strip() for line in (message.text or "").splitlines()]
     texts = [line for line in lines if line]
     if not texts:
         await message.answer("⚠️ Текст не найден для отправки")
         return
-    idem = webhook_client.generate_idempotency_key(str(message.message_id), 1)
-    placement = prefs_service.get_user_placement(user_id)
+    # Ключи идемпотентности чанков: <chat_id>:<message_id>.<seq> — message_id
+    # уникален только в пределах чата
+    batch_id = f"{message.chat.id}:{message.message_id}"
     chat = {
         "chat_id": message.chat.id,
         "type": message.chat.type,
@@ -126,17 +236,35 @@ async def handle_texts(message: Message):
         "user_id": message.from_user.id,
         "username": message.from_user.username,
     }
-    ok = await webhook_client.send_texts(
+    if config.OUTBOX_ENABLED:
+        added = await outbox.enqueue_texts(
+            texts=texts,
+            webhook_url=webhook_url,
+            service=service,
+            chat=chat,
+            from_=from_,
+            batch_id=batch_id,
+            placement=placement,
+            user_id=user_id,
+        )
+        if not added:
+            await message.answer("♻️ Эти тексты уже поставлены в очередь на отправку")
+            return
+        await message.answer(f"📥 Принято {len(texts)} текстов для {service.title()}, отправка поставлена в очередь")
+        return
+    delivered, total = await webhook_client.send_texts_batch(
         texts=texts,
         webhook_url=webhook_url,
         service=service,
         chat=chat,
         from_=from_,
         placement=placement,
-        idempotency_key=idem,
+        batch_id=batch_id,
     )
-    if ok:
+    if delivered == total:
         await message.answer(f"✅ Отправлено {len(texts)} текстов на {service.title()}")
+    elif delivered:
+        await message.answer(f"⚠️ Отправлено {delivered}/{total} пакетов текстов на {service.title()}")
     else:
         await message.answer("❌ Не удалось отправить тексты")
 
@@ -155,56 +283,43 @@ async def handle_excel(message: Message):
     if not is_xlsx:
         return  # игнорируем прочие документы
     user_id = message.from_user.id
-    service = prefs_service.get_user_service(user_id)
+    service, placement = await prefs_service.get_user_context(user_id)
     webhook_url = config.get_text_webhook_url(service)
     if not webhook_url:
         await message.answer("❌ Текстовый вебхук не настроен для выбранного сервиса")
         return
     # получаем URL файла и скачиваем
-    file_url = await tg_files_service.get_file_url(message.document.file_id)
+    file_url = await tg_files_service.get_file_url(
+        message.document.file_id, message.document.file_unique_id
+    )
     if not file_url:
         await message.answer("❌ Не удалось получить файл")
         return
+    # скачиваем потоком во временный файл (большие файлы уходят на диск)
     try:
-        async with httpx.AsyncClient(timeout=httpx.Timeout(config.HTTP_TIMEOUT_SECONDS)) as client:
-            resp = await client.get(file_url)
-            resp.raise_for_status()
-            data = BytesIO(resp.content)
+        spool = await download_to_spool(file_url)
     except Exception as e:
         logger.error(f"❌ Ошибка скачивания Excel: {e}")
         await message.answer("❌ Ошибка скачивания файла")
         return
-    # парсим xlsx (ленивый импорт openpyxl)
+    # парсим xlsx в пуле потоков, получая тексты пачками
+    texts: List[str] = []
     try:
-        from openpyxl import load_workbook  # type: ignore
-        wb = load_workbook(filename=data, read_only=True, data_only=True)
-        texts: List[str] = []
-        for ws in wb.worksheets:
-            first = True
-            for row in ws.iter_rows(values_only=True):
-                if first:
-                    first = False
-                    continue  # пропускаем заголовок
-                for cell in row:
-                    if cell is None:
-                        continue
-                    s = str(cell).strip()
-                    if s:
-                        texts.append(s)
+        async for batch in aiter_excel_texts(spool):
+            texts.extend(batch)
     except Exception as e:
         logger.error(f"❌ Ошибка обработки Excel: {e}")
         await message.answer("❌ Ошибка обработки Excel")
         return
+    finally:
+        spool.close()
     if not texts:
         await message.answer("⚠️ Не найден текст в Excel")
         return
-    # Пингуем для логов, но не блокируем отправку
-    try:
-        _ = await webhook_client.send_ping(webhook_url)
-    except Exception:
-        pass
-    idem = webhook_client.generate_idempotency_key(str(message.message_id), 1)
-    placement = prefs_service.get_user_placement(user_id)
+    log_webhook_health(webhook_url)
+    # Ключи идемпотентности чанков: <chat_id>:<message_id>.<seq> — message_id
+    # уникален только в пределах чата
+    batch_id = f"{message.chat.id}:{message.message_id}"
     chat = {
         "chat_id": message.chat.id,
         "type": message.chat.type,
@@ -214,44 +329,45 @@ async def handle_excel(message: Message):
         "user_id": message.from_user.id,
         "username": message.from_user.username,
     }
-    ok = await webhook_client.send_texts(
+    if config.OUTBOX_ENABLED:
+        added = await outbox.enqueue_texts(
+            texts=texts,
+            webhook_url=webhook_url,
+            service=service,
+            chat=chat,
+            from_=from_,
+            batch_id=batch_id,
+            placement=placement,
+            user_id=user_id,
+        )
+        if not added:
+            await message.answer("♻️ Тексты из этого Excel уже поставлены в очередь на отправку")
+            return
+        await message.answer(f"📥 Принято {len(texts)} текстов из Excel для {service.title()}, отправка поставлена в очередь")
+        return
+    delivered, total = await webhook_client.send_texts_batch(
         texts=texts,
         webhook_url=webhook_url,
         service=service,
         chat=chat,
         from_=from_,
         placement=placement,
-        idempotency_key=idem,
+        batch_id=batch_id,
     )
-    if ok:
+    if delivered == total:
         await message.answer(f"✅ Отправлено {len(texts)} текстов из Excel на {service.title()}")
+    elif delivered:
+        await message.answer(f"⚠️ Отправлено {delivered}/{total} пакетов текстов из Excel на {service.title()}")
     else:
         await message.answer("❌ Не удалось отправить тексты из Excel")
 
-async def process_user_buffer_after_delay(user_id: int):
-    """Обработать буфер пользователя после задержки."""
-    # Ждем debounce время
-    await asyncio.sleep(config.BURST_DEBOUNCE_SECS)
-    
-    if user_id in user_buffers and user_buffers[user_id]:
-        messages = user_buffers[user_id].copy()
-        user_buffers[user_id] = []
-        
-        if user_id in user_timers:
-            del user_timers[user_id]
-        
-        await process_messages_batch(messages, user_id, "debounce")
-        
-        logger.info(f"⚡ Обработан burst пользователя {user_id} с {len(messages)} сообщениями")
-
 async def process_messages_batch(messages: List[Message], user_id: int, grouping: str):
     """Обработать пакет сообщений."""
     if not messages:
         return
     
     # Получаем сервис пользователя
-    service = prefs_service.get_user_service(user_id)
-    placement = prefs_service.get_user_placement(user_id)
+    service, placement = await prefs_service.get_user_context(user_id)
     webhook_url = config.get_webhook_url(service)
     
     if not webhook_url:
@@ -274,12 +390,12 @@ async def process_messages_batch(messages: List[Message], user_id: int, grouping
     # Разбиваем на чанки если нужно
     max_per_batch = config.MAX_CREATIVES_PER_BATCH
     chunks = [creatives[i:i + max_per_batch] for i in range(0, len(creatives), max_per_batch)]
+    BATCH_CREATIVES.observe(len(creatives), grouping=grouping)
+    BATCH_CHUNKS.observe(len(chunks), kind="creatives")
     
-    success_count = 0
-    
-    for seq, chunk in enumerate(chunks, 1):
-        # Создаем payload
-        payload = create_webhook_payload(
+    def build_chunk(seq: int, chunk: List[Creative]) -> WebhookPayload:
+        """Собрать payload для одного чанка."""
+        return create_webhook_payload(
             messages=messages,
             creatives=chunk,
             download_urls=download_urls,
@@ -290,15 +406,47 @@ async def process_messages_batch(messages: List[Message], user_id: int, grouping
             grouping=grouping,
             placement=placement
         )
-        
-        # Отправляем на вебхук
+    
+    if config.OUTBOX_ENABLED:
+        # Ставим чанки в очередь и сразу отвечаем: доставят фоновые воркеры
+        body = b""
+        added = 0
+        for seq, chunk in enumerate(chunks, 1):
+            payload = build_chunk(seq, chunk)
+            body = webhook_client.encode_payload(payload)
+            idempotency_key = webhook_client.generate_idempotency_key(batch_id, seq)
+            added += await outbox.enqueue_payload(payload, webhook_url, idempotency_key, user_id, body=body)
+        await prefs_service.save_last_payload(user_id, body.decode("utf-8"))
+        if added < len(chunks):
+            await messages[0].answer(
+                f"⚠️ В очередь поставлено {added}/{len(chunks)} пакетов креативов для {service.title()}"
+            )
+            return
+        await messages[0].answer(
+            f"📥 Принято {len(creatives)} креативов для {service.title()}, отправка поставлена в очередь"
+        )
+        return
+    
+    async def send_chunk(seq: int, chunk: List[Creative]) -> Optional[bytes]:
+        """Отправить один чанк; вернуть отправленное JSON-тело при успехе."""
+        payload = build_chunk(seq, chunk)
+        # Сериализуем один раз: те же байты уходят на вебхук и в last_payload
+        body = webhook_client.encode_payload(payload)
         idempotency_key = webhook_client.generate_idempotency_key(batch_id, seq)
-        success = await webhook_client.send_payload(payload, webhook_url, idempotency_key)
-        
-        if success:
-            success_count += 1
-            # Сохраняем payload для retry
-            prefs_service.save_last_payload(user_id, payload.model_dump_json())
+        success = await webhook_client.send_payload(payload, webhook_url, idempotency_key, body=body)
+        return body if success else None
+    
+    # Отправляем чанки параллельно; одновременные запросы к одному вебхуку
+    # ограничивает сам WebhookClient (WEBHOOK_PARALLELISM)
+    results = await asyncio.gather(
+        *(send_chunk(seq, chunk) for seq, chunk in enumerate(chunks, 1))
+    )
+    delivered = [body for body in results if body is not None]
+    success_count = len(delivered)
+    
+    if delivered:
+        # Сохраняем для retry последний доставленный чанк (с наибольшим seq)
+        await prefs_service.save_last_payload(user_id, delivered[-1].decode("utf-8"))
     
     # Уведомляем пользователя
     if success_count == len(chunks):
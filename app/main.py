@@ -1,18 +1,39 @@
 """Основной файл приложения."""
 import asyncio
+import signal
 import sys
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from aiogram.types import BotCommand
-from aiogram.fsm.storage.memory import MemoryStorage
 from app.utils.env import config
-from app.utils.logging import setup_logging, get_logger
+from app.utils.logging import setup_logging, shutdown_logging, get_logger
 from app.handlers import commands_router, media_router
-from app.models.database import create_tables
+from app.models.database import create_tables, shutdown_db_executor
+from app.services.webhook_client import check_optional_packages, close_http_client
+from app.services.prefs import PreferencesService
+from app.services.excel import shutdown_excel_executor
+from app.services.update_server import UpdateServer
+from app.services.metrics_server import MetricsServer
+from app.utils.loop_monitor import loop_monitor
+from app.services.state import create_fsm_storage
 
 logger = get_logger(__name__)
 
+async def wait_for_stop_signal() -> None:
+    """Дождаться SIGTERM или SIGINT."""
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    signals = (signal.SIGTERM, signal.SIGINT)
+    for sig in signals:
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+        logger.info("⏹️ Получен сигнал остановки")
+    finally:
+        for sig in signals:
+            loop.remove_signal_handler(sig)
+
 async def main():
     """Основная функция."""
     # Настраиваем логирование
@@ -24,11 +45,16 @@ async def main():
     except ValueError as e:
         logger.error(f"❌ Ошибка конфигурации: {e}")
         sys.exit(1)
+    check_optional_packages()
     
     # Создаем таблицы БД
     create_tables()
     logger.info("✅ База данных инициализирована")
     
+    # Прогреваем кэш предпочтений
+    if config.PREFS_CACHE_WARM:
+        await PreferencesService().warm_cache()
+    
     # Создаем бота
     bot = Bot(
         token=config.TELEGRAM_BOT_TOKEN,
@@ -36,9 +62,29 @@ async def main():
     )
     
     # Инициализируем сервис файлов
-    from app.handlers.media import tg_files_service
+    from app.handlers.media import tg_files_service, outbox, health_prober, resume_buffers
+    from app.services.sweeper import state_sweeper
     tg_files_service.bot = bot
     
+    # Запускаем воркеры доставки на вебхуки
+    if config.OUTBOX_ENABLED:
+        await outbox.start()
+    
+    # Запускаем фоновую проверку вебхуков (HEALTH_PROBE_INTERVAL_SECS=0 — выключена)
+    if health_prober.enabled:
+        health_prober.start()
+    
+    # Запускаем очистку состояния в памяти
+    state_sweeper.start()
+    
+    # Замер задержки event loop и поиск блокирующих колбэков
+    loop_monitor.start()
+    
+    # Метрики Prometheus на локальном порту
+    metrics_server = MetricsServer() if config.METRICS_ENABLED else None
+    if metrics_server is not None:
+        await metrics_server.start()
+    
     # Настраиваем команды бота
     commands = [
         BotCommand(command="start", description="🚀 Запустить бота"),
@@ -51,26 +97,58 @@ async def main():
     await bot.set_my_commands(commands)
     logger.info("✅ Команды бота настроены")
     
-    # Создаем диспетчер с хранилищем FSM
-    storage = MemoryStorage()
+    # Создаем диспетчер с хранилищем FSM (STATE_BACKEND)
+    storage = create_fsm_storage()
     dp = Dispatcher(storage=storage)
     
     # Регистрируем обработчики
     dp.include_router(commands_router)
     dp.include_router(media_router)
     
+    # Досбрасываем буферы, оставшиеся в общем хранилище
+    resumed = await resume_buffers(bot)
+    if resumed:
+        logger.info(f"♻️ Возобновлено буферов: {resumed}")
+    
     logger.info("🚀 Бот запущен")
     
+    update_server = None
     try:
-        # Запускаем бота
-        await dp.start_polling(bot)
-    except KeyboardInterrupt:
+        if config.UPDATE_MODE == "webhook":
+            # Принимаем обновления по HTTP
+            update_server = UpdateServer(dp, bot)
+            await dp.emit_startup(bot=bot)
+            await update_server.start()
+            if config.BOT_WEBHOOK_URL:
+                await update_server.set_webhook(config.BOT_WEBHOOK_URL)
+            # SIGTERM (docker stop) и SIGINT завершают ожидание, и finally успевает
+            # дообработать принятые обновления и закрыть ресурсы
+            await wait_for_stop_signal()
+        else:
+            # Вебхук, оставшийся от режима webhook, ломает getUpdates (409 Conflict)
+            await bot.delete_webhook()
+            # Запускаем бота
+            await dp.start_polling(bot)
+    except (KeyboardInterrupt, asyncio.CancelledError):
         logger.info("⏹️ Получен сигнал остановки")
     except Exception as e:
         logger.error(f"❌ Критическая ошибка: {e}")
     finally:
+        if update_server is not None:
+            await update_server.stop()
+            await dp.emit_shutdown(bot=bot)
+        await health_prober.stop()
+        await state_sweeper.stop()
+        await loop_monitor.stop()
+        if metrics_server is not None:
+            await metrics_server.stop()
+        await outbox.stop()
+        await close_http_client()
         await bot.session.close()
+        shutdown_excel_executor()
+        shutdown_db_executor()
         logger.info("👋 Бот остановлен")
+        shutdown_logging()
 
 if __name__ == "__main__":
     asyncio.run(main())
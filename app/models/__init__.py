@@ -1,5 +1,5 @@
 """Модели данных."""
 from .payload import Creative, WebhookPayload, BatchInfo
-from .database import UserPrefs, LastPayload
+from .database import UserPrefs, LastPayload, OutboxDelivery, BufferedMessage, BufferMeta, FSMRecord
 
-__all__ = ["Creative", "WebhookPayload", "BatchInfo", "UserPrefs", "LastPayload"]
+__all__ = ["Creative", "WebhookPayload", "BatchInfo", "UserPrefs", "LastPayload", "OutboxDelivery", "BufferedMessage", "BufferMeta", "FSMRecord"]
@@ -1,5 +1,8 @@
 """Модели базы данных."""
-from typing import Optional
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
 from datetime import datetime
 from sqlmodel import SQLModel, Field, create_engine, Session, text
 from app.utils.env import config
@@ -24,8 +27,61 @@ class LastPayload(SQLModel, table=True):
     json_payload: str = Field()  # JSON строка
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
-# Создаем движок базы данных
-engine = create_engine("sqlite:///bot.db", echo=False)
+class OutboxDelivery(SQLModel, table=True):
+    """Доставка на вебхук в очереди (outbox)."""
+    __tablename__ = "webhook_outbox"
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    idempotency_key: str = Field(unique=True)  # batch_id.seq — повтор не создаёт дубль
+    webhook_url: str = Field()
+    kind: str = Field()  # payload, texts
+    body: str = Field()  # JSON тела запроса
+    user_id: Optional[int] = Field(default=None)
+    status: str = Field(default="pending", index=True)  # pending, in_flight, delivered, failed
+    attempts: int = Field(default=0)
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    delivered_at: Optional[datetime] = Field(default=None)
+    last_error: Optional[str] = Field(default=None)
+
+class BufferedMessage(SQLModel, table=True):
+    """Сообщение Telegram в общем буфере (burst или альбом)."""
+    __tablename__ = "state_buffer_items"
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    buffer_key: str = Field(index=True)  # burst:<user_id> или album:<media_group_id>
+    payload: str = Field()  # JSON сообщения
+
+class BufferMeta(SQLModel, table=True):
+    """Состояние общего буфера: когда начат и когда сбрасывать."""
+    __tablename__ = "state_buffers"
+    
+    buffer_key: str = Field(primary_key=True)
+    count: int = Field(default=0)
+    first_at: float = Field()  # unix time первого сообщения
+    deadline: float = Field()  # unix time сброса буфера
+
+class FSMRecord(SQLModel, table=True):
+    """Состояние и данные FSM aiogram."""
+    __tablename__ = "fsm_state"
+    
+    key: str = Field(primary_key=True)
+    state: Optional[str] = Field(default=None)
+    data: str = Field(default="{}")  # JSON
+
+T = TypeVar("T")
+
+# Создаем движок базы данных. Соединения создаются и используются в отдельном
+# DB-потоке (см. run_in_db), поэтому проверку потока SQLite отключаем.
+engine = create_engine(
+    "sqlite:///bot.db",
+    echo=False,
+    connect_args={"check_same_thread": False}
+)
+
+# Единственный поток для работы с БД: SQLite допускает одного писателя,
+# а вынос запросов из event loop не даёт fsync блокировать обработчики.
+_db_executor: Optional[ThreadPoolExecutor] = None
 
 def create_tables():
     """Создать таблицы в базе данных."""
@@ -63,3 +119,27 @@ def _migrate_add_placement_column():
 def get_session():
     """Получить сессию базы данных."""
     return Session(engine)
+
+
+def _get_db_executor() -> ThreadPoolExecutor:
+    """Получить (или создать) executor для запросов к БД."""
+    global _db_executor
+    if _db_executor is None:
+        _db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db")
+    return _db_executor
+
+
+async def run_in_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Выполнить синхронную функцию работы с БД в DB-потоке, не блокируя event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_db_executor(), functools.partial(func, *args, **kwargs)
+    )
+
+
+def shutdown_db_executor() -> None:
+    """Остановить DB-поток, дождавшись завершения запросов."""
+    global _db_executor
+    if _db_executor is not None:
+        _db_executor.shutdown(wait=True)
+        _db_executor = None
@@ -41,7 +41,7 @@ class BatchInfo(BaseModel):
     batch_id: str
     seq: int
     total: int
-    grouping: str  # debounce, media_group
+    grouping: str  # debounce, media_group, texts
 
 class WebhookPayload(BaseModel):
     """Payload для отправки на вебхук."""
@@ -74,6 +74,7 @@ class TextsPayload(BaseModel):
     chat: ChatInfo
     from_: UserInfo = Field(alias="from")
     placement: Optional[str] = None  # Место размещения креатива
+    batch: Optional[BatchInfo] = None  # Чанк большого набора текстов
 
     class Config:
         populate_by_name = True
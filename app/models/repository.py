@@ -0,0 +1,394 @@
+"""Асинхронные репозитории: предпочтения, outbox, буферы и FSM."""
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from sqlalchemy import delete, func, update
+from sqlalchemy import select as core_select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import select
+from app.models.database import (
+    UserPrefs, LastPayload, OutboxDelivery, BufferedMessage, BufferMeta, FSMRecord, get_session, run_in_db
+)
+
+
+class UserContext(NamedTuple):
+    """Сервис и место размещения пользователя."""
+    service: str
+    placement: Optional[str] = None
+
+
+def _to_context(user_prefs: UserPrefs) -> UserContext:
+    """Преобразовать строку user_prefs в UserContext."""
+    return UserContext(service=user_prefs.service, placement=user_prefs.placement)
+
+
+class PrefsRepository:
+    """Репозиторий предпочтений пользователей.
+
+    Публичные методы асинхронные: запросы выполняются в DB-потоке,
+    а event loop в это время обслуживает остальных пользователей.
+    """
+
+    async def get_or_create(self, user_id: int, default_service: str) -> UserContext:
+        """Получить предпочтения пользователя, создав запись с сервисом по умолчанию."""
+        return await run_in_db(self._get_or_create, user_id, default_service)
+
+    async def set_service(self, user_id: int, service: str) -> UserContext:
+        """Установить сервис пользователя, создав запись при необходимости."""
+        return await run_in_db(self._set_service, user_id, service)
+
+    async def set_placement(self, user_id: int, placement: str, default_service: str) -> UserContext:
+        """Установить место размещения, создав запись с сервисом по умолчанию."""
+        return await run_in_db(self._set_placement, user_id, placement, default_service)
+
+    async def recent_prefs(self, limit: int) -> List[tuple]:
+        """Последние обновлённые записи: список (user_id, UserContext)."""
+        return await run_in_db(self._recent_prefs, limit)
+
+    async def save_last_payload(self, user_id: int, json_payload: str) -> None:
+        """Сохранить последний payload пользователя."""
+        await run_in_db(self._save_last_payload, user_id, json_payload)
+
+    async def get_last_payload(self, user_id: int) -> Optional[str]:
+        """Получить последний payload пользователя."""
+        return await run_in_db(self._get_last_payload, user_id)
+
+    # Синхронные реализации, выполняются только в DB-потоке
+
+    def _upsert_prefs(self, values: dict, update: dict) -> UserContext:
+        """INSERT ... ON CONFLICT DO UPDATE ... RETURNING одним запросом."""
+        table = UserPrefs.__table__
+        stmt = (
+            sqlite_insert(table)
+            .values(**values)
+            .on_conflict_do_update(index_elements=[table.c.user_id], set_=update)
+            .returning(table.c.service, table.c.placement)
+        )
+        with get_session() as session:
+            row = session.execute(stmt).one()
+            session.commit()
+            return UserContext(service=row.service, placement=row.placement)
+
+    def _select_prefs(self, session, user_id: int) -> Optional[UserContext]:
+        table = UserPrefs.__table__
+        row = session.execute(
+            core_select(table.c.service, table.c.placement).where(table.c.user_id == user_id)
+        ).first()
+        return UserContext(service=row.service, placement=row.placement) if row else None
+
+    def _get_or_create(self, user_id: int, default_service: str) -> UserContext:
+        # Существующий пользователь — только SELECT, без транзакции записи
+        table = UserPrefs.__table__
+        with get_session() as session:
+            context = self._select_prefs(session, user_id)
+            if context is not None:
+                return context
+            row = session.execute(
+                sqlite_insert(table)
+                .values(user_id=user_id, service=default_service, updated_at=datetime.utcnow())
+                .on_conflict_do_nothing(index_elements=[table.c.user_id])
+                .returning(table.c.service, table.c.placement)
+            ).first()
+            session.commit()
+            if row is not None:
+                return UserContext(service=row.service, placement=row.placement)
+            # Запись успела создать другая реплика — RETURNING при DO NOTHING пуст
+            return self._select_prefs(session, user_id)
+
+    def _set_service(self, user_id: int, service: str) -> UserContext:
+        return self._upsert_prefs(
+            {"user_id": user_id, "service": service, "updated_at": datetime.utcnow()},
+            {"service": service}
+        )
+
+    def _set_placement(self, user_id: int, placement: str, default_service: str) -> UserContext:
+        now = datetime.utcnow()
+        return self._upsert_prefs(
+            {"user_id": user_id, "service": default_service, "placement": placement, "updated_at": now},
+            {"placement": placement, "updated_at": now}
+        )
+
+    def _recent_prefs(self, limit: int) -> List[tuple]:
+        with get_session() as session:
+            stmt = select(UserPrefs).order_by(UserPrefs.updated_at.desc()).limit(limit)
+            return [(row.user_id, _to_context(row)) for row in session.exec(stmt).all()]
+
+    def _save_last_payload(self, user_id: int, json_payload: str) -> None:
+        table = LastPayload.__table__
+        stmt = (
+            sqlite_insert(table)
+            .values(user_id=user_id, json_payload=json_payload, created_at=datetime.utcnow())
+            .on_conflict_do_update(
+                index_elements=[table.c.user_id],
+                set_={"json_payload": json_payload}
+            )
+        )
+        with get_session() as session:
+            session.execute(stmt)
+            session.commit()
+
+    def _get_last_payload(self, user_id: int) -> Optional[str]:
+        with get_session() as session:
+            stmt = select(LastPayload).where(LastPayload.user_id == user_id)
+            last_payload = session.exec(stmt).first()
+            return last_payload.json_payload if last_payload else None
+
+
+class OutboxItem(NamedTuple):
+    """Доставка, взятая воркером outbox в работу."""
+    id: int
+    idempotency_key: str
+    webhook_url: str
+    kind: str
+    body: str
+    attempts: int
+    created_at: datetime
+
+
+class OutboxRepository:
+    """Репозиторий очереди доставок на вебхуки (таблица webhook_outbox)."""
+
+    async def add(
+        self,
+        idempotency_key: str,
+        webhook_url: str,
+        kind: str,
+        body: str,
+        user_id: Optional[int] = None
+    ) -> bool:
+        """Добавить доставку. False, если ключ идемпотентности уже в очереди."""
+        return await run_in_db(self._add, idempotency_key, webhook_url, kind, body, user_id)
+
+    async def claim_due(self, limit: int, now: datetime) -> List[OutboxItem]:
+        """Атомарно взять в работу доставки, время которых подошло."""
+        return await run_in_db(self._claim_due, limit, now)
+
+    async def mark_delivered(self, item_id: int, attempts: int, now: datetime) -> None:
+        """Отметить доставку успешной."""
+        await run_in_db(self._update, item_id, status="delivered", attempts=attempts, delivered_at=now)
+
+    async def mark_retry(self, item_id: int, attempts: int, next_attempt_at: datetime, error: str) -> None:
+        """Вернуть доставку в очередь на повтор."""
+        await run_in_db(
+            self._update, item_id,
+            status="pending", attempts=attempts, next_attempt_at=next_attempt_at, last_error=error
+        )
+
+    async def mark_failed(self, item_id: int, attempts: int, error: str) -> None:
+        """Отметить доставку окончательно неуспешной."""
+        await run_in_db(self._update, item_id, status="failed", attempts=attempts, last_error=error)
+
+    async def requeue_in_flight(self) -> int:
+        """Вернуть в очередь доставки, прерванные остановкой процесса."""
+        return await run_in_db(self._requeue_in_flight)
+
+    async def counts(self) -> Dict[str, int]:
+        """Количество доставок по статусам."""
+        return await run_in_db(self._counts)
+
+    async def purge_finished(self, before: datetime) -> int:
+        """Удалить доставленные и неуспешные записи, завершённые раньше before."""
+        return await run_in_db(self._purge_finished, before)
+
+    # Синхронные реализации, выполняются только в DB-потоке
+
+    def _add(self, idempotency_key: str, webhook_url: str, kind: str, body: str, user_id: Optional[int]) -> bool:
+        now = datetime.utcnow()
+        stmt = (
+            sqlite_insert(OutboxDelivery.__table__)
+            .values(
+                idempotency_key=idempotency_key,
+                webhook_url=webhook_url,
+                kind=kind,
+                body=body,
+                user_id=user_id,
+                status="pending",
+                attempts=0,
+                next_attempt_at=now,
+                created_at=now
+            )
+            .on_conflict_do_nothing(index_elements=["idempotency_key"])
+        )
+        with get_session() as session:
+            result = session.execute(stmt)
+            session.commit()
+            return result.rowcount == 1
+
+    def _claim_due(self, limit: int, now: datetime) -> List[OutboxItem]:
+        table = OutboxDelivery.__table__
+        due_ids = (
+            core_select(table.c.id)
+            .where(table.c.status == "pending", table.c.next_attempt_at <= now)
+            .order_by(table.c.next_attempt_at, table.c.id)
+            .limit(limit)
+            .scalar_subquery()
+        )
+        # UPDATE ... RETURNING одним запросом: две реплики не возьмут одну строку
+        stmt = (
+            update(table)
+            .where(table.c.id.in_(due_ids), table.c.status == "pending")
+            .values(status="in_flight")
+            .returning(
+                table.c.id, table.c.idempotency_key, table.c.webhook_url,
+                table.c.kind, table.c.body, table.c.attempts, table.c.created_at
+            )
+        )
+        with get_session() as session:
+            rows = session.execute(stmt).all()
+            session.commit()
+        return sorted((OutboxItem(*row) for row in rows), key=lambda item: item.id)
+
+    def _update(self, item_id: int, **values) -> None:
+        table = OutboxDelivery.__table__
+        with get_session() as session:
+            session.execute(update(table).where(table.c.id == item_id).values(**values))
+            session.commit()
+
+    def _requeue_in_flight(self) -> int:
+        table = OutboxDelivery.__table__
+        with get_session() as session:
+            result = session.execute(
+                update(table).where(table.c.status == "in_flight").values(status="pending")
+            )
+            session.commit()
+            return result.rowcount
+
+    def _purge_finished(self, before: datetime) -> int:
+        table = OutboxDelivery.__table__
+        # У неуспешных доставок нет delivered_at — для них считаем от постановки в очередь
+        finished_at = func.coalesce(table.c.delivered_at, table.c.created_at)
+        with get_session() as session:
+            result = session.execute(
+                delete(table).where(table.c.status.in_(("delivered", "failed")), finished_at < before)
+            )
+            session.commit()
+            return result.rowcount
+
+    def _counts(self) -> Dict[str, int]:
+        table = OutboxDelivery.__table__
+        with get_session() as session:
+            rows = session.execute(
+                core_select(table.c.status, func.count()).group_by(table.c.status)
+            ).all()
+        return {status: count for status, count in rows}
+
+
+class BufferState(NamedTuple):
+    """Состояние буфера сообщений."""
+    count: int
+    first_at: float
+    deadline: float
+
+
+class BufferRepository:
+    """Репозиторий общих буферов сообщений (таблицы state_buffers и state_buffer_items).
+
+    Буфер может пополняться и сбрасываться разными репликами: добавление
+    и изъятие выполняются одной транзакцией, поэтому сообщения буфера
+    забирает ровно одна реплика.
+    """
+
+    async def append(
+        self, key: str, payload: str, now: float, deadline: float, max_age: Optional[float] = None
+    ) -> BufferState:
+        """Добавить сообщение и установить срок сброса (не позже first_at + max_age)."""
+        return await run_in_db(self._append, key, payload, now, deadline, max_age)
+
+    async def peek(self, key: str) -> Optional[BufferState]:
+        """Состояние буфера или None, если буфер пуст."""
+        return await run_in_db(self._peek, key)
+
+    async def take(self, key: str, due_before: Optional[float] = None) -> List[str]:
+        """Забрать сообщения буфера (только если срок сброса не позже due_before)."""
+        return await run_in_db(self._take, key, due_before)
+
+    async def keys(self) -> List[str]:
+        """Ключи непустых буферов."""
+        return await run_in_db(self._keys)
+
+    # Синхронные реализации, выполняются только в DB-потоке
+
+    def _append(self, key: str, payload: str, now: float, deadline: float, max_age: Optional[float]) -> BufferState:
+        meta = BufferMeta.__table__
+        new_deadline = deadline
+        if max_age is not None:
+            # Скалярный min() SQLite: срок не уходит дальше first_at + max_age
+            deadline = min(deadline, now + max_age)
+            new_deadline = func.min(new_deadline, meta.c.first_at + max_age)
+        stmt = (
+            sqlite_insert(meta)
+            .values(buffer_key=key, count=1, first_at=now, deadline=deadline)
+            .on_conflict_do_update(
+                index_elements=[meta.c.buffer_key],
+                set_={"count": meta.c.count + 1, "deadline": new_deadline}
+            )
+            .returning(meta.c.count, meta.c.first_at, meta.c.deadline)
+        )
+        with get_session() as session:
+            session.execute(sqlite_insert(BufferedMessage.__table__).values(buffer_key=key, payload=payload))
+            row = session.execute(stmt).one()
+            session.commit()
+        return BufferState(*row)
+
+    def _peek(self, key: str) -> Optional[BufferState]:
+        meta = BufferMeta.__table__
+        with get_session() as session:
+            row = session.execute(
+                core_select(meta.c.count, meta.c.first_at, meta.c.deadline).where(meta.c.buffer_key == key)
+            ).first()
+        return BufferState(*row) if row else None
+
+    def _take(self, key: str, due_before: Optional[float]) -> List[str]:
+        meta = BufferMeta.__table__
+        items = BufferedMessage.__table__
+        claim = delete(meta).where(meta.c.buffer_key == key)
+        if due_before is not None:
+            claim = claim.where(meta.c.deadline <= due_before)
+        with get_session() as session:
+            # Удаление метаданных берёт блокировку записи: вторая реплика
+            # увидит буфер уже пустым
+            if session.execute(claim.returning(meta.c.buffer_key)).first() is None:
+                session.rollback()
+                return []
+            rows = session.execute(
+                delete(items).where(items.c.buffer_key == key).returning(items.c.id, items.c.payload)
+            ).all()
+            session.commit()
+        return [payload for _, payload in sorted(rows)]
+
+    def _keys(self) -> List[str]:
+        meta = BufferMeta.__table__
+        with get_session() as session:
+            return list(session.execute(core_select(meta.c.buffer_key)).scalars())
+
+
+class FSMRepository:
+    """Репозиторий состояний FSM (таблица fsm_state)."""
+
+    async def get(self, key: str) -> Optional[Tuple[Optional[str], str]]:
+        """(state, data JSON) или None."""
+        return await run_in_db(self._get, key)
+
+    async def set_state(self, key: str, state: Optional[str]) -> None:
+        await run_in_db(self._upsert, key, {"state": state})
+
+    async def set_data(self, key: str, data: str) -> None:
+        await run_in_db(self._upsert, key, {"data": data})
+
+    def _get(self, key: str) -> Optional[Tuple[Optional[str], str]]:
+        table = FSMRecord.__table__
+        with get_session() as session:
+            row = session.execute(
+                core_select(table.c.state, table.c.data).where(table.c.key == key)
+            ).first()
+        return (row.state, row.data) if row else None
+
+    def _upsert(self, key: str, values: dict) -> None:
+        table = FSMRecord.__table__
+        stmt = (
+            sqlite_insert(table)
+            .values(key=key, **values)
+            .on_conflict_do_update(index_elements=[table.c.key], set_=values)
+        )
+        with get_session() as session:
+            session.execute(stmt)
+            session.commit()
@@ -1,6 +1,11 @@
 """Сервисы."""
-from .webhook_client import WebhookClient
+from .webhook_client import WebhookClient, get_http_client, close_http_client
 from .tg_files import TelegramFileService
 from .prefs import PreferencesService
+from .outbox import WebhookOutbox
+from .health import WebhookHealthProber
+from .update_server import UpdateServer
+from .sweeper import StateSweeper
+from .metrics_server import MetricsServer
 
-__all__ = ["WebhookClient", "TelegramFileService", "PreferencesService"]
+__all__ = ["WebhookClient", "get_http_client", "close_http_client", "TelegramFileService", "PreferencesService", "WebhookOutbox", "WebhookHealthProber", "UpdateServer", "StateSweeper", "MetricsServer"]
@@ -0,0 +1,133 @@
+"""Потоковое скачивание и разбор Excel-файлов (.xlsx) вне event loop."""
+import asyncio
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, Any, AsyncIterator, Iterable, Iterator, List, Optional
+from app.services.webhook_client import get_http_client
+from app.utils.env import config
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Отдельный пул для разбора xlsx: openpyxl не должен занимать DB-поток
+# и дефолтный executor event loop
+_excel_executor: Optional[ThreadPoolExecutor] = None
+
+_DONE = object()
+
+
+def _get_excel_executor() -> ThreadPoolExecutor:
+    """Получить (или создать) пул потоков для разбора Excel."""
+    global _excel_executor
+    if _excel_executor is None:
+        _excel_executor = ThreadPoolExecutor(
+            max_workers=max(1, config.EXCEL_WORKERS), thread_name_prefix="excel"
+        )
+    return _excel_executor
+
+
+def shutdown_excel_executor() -> None:
+    """Остановить пул разбора Excel."""
+    global _excel_executor
+    if _excel_executor is not None:
+        _excel_executor.shutdown(wait=False, cancel_futures=True)
+        _excel_executor = None
+
+
+async def download_to_spool(url: str, max_memory: Optional[int] = None) -> IO[bytes]:
+    """Скачать файл потоком во временный файл.
+
+    Пока файл меньше max_memory, он остаётся в памяти, большие файлы
+    сбрасываются на диск. Возвращает файл, спозиционированный на начало.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=max_memory or config.EXCEL_SPOOL_MAX_MEMORY)
+    try:
+        async with get_http_client().stream("GET", url) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+def extract_texts_from_rows(rows: Iterable[Iterable[Any]]) -> Iterator[str]:
+    """Непустые значения ячеек листа, кроме первой строки (заголовка)."""
+    rows = iter(rows)
+    next(rows, None)  # пропускаем заголовок
+    for row in rows:
+        for cell in row:
+            if cell is None:
+                continue
+            s = str(cell).strip()
+            if s:
+                yield s
+
+
+def iter_workbook_texts(fileobj: IO[bytes]) -> Iterator[str]:
+    """Тексты всех листов книги (синхронно, вызывать вне event loop)."""
+    from openpyxl import load_workbook  # type: ignore
+    wb = load_workbook(filename=fileobj, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            yield from extract_texts_from_rows(ws.iter_rows(values_only=True))
+    finally:
+        wb.close()
+
+
+async def aiter_excel_texts(
+    fileobj: IO[bytes],
+    batch_size: Optional[int] = None
+) -> AsyncIterator[List[str]]:
+    """Разобрать книгу в пуле потоков, отдавая тексты пачками по мере чтения.
+
+    Очередь между потоком разбора и event loop ограничена, поэтому медленный
+    потребитель притормаживает разбор, а не копит весь файл в памяти.
+    Ошибка разбора пробрасывается потребителю.
+    """
+    batch_size = batch_size or config.EXCEL_BATCH_SIZE
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=4)
+    cancelled = False
+
+    def put(item: Any) -> None:
+        # Блокирует поток разбора, пока в очереди нет места
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    def produce() -> None:
+        batch: List[str] = []
+        try:
+            for text in iter_workbook_texts(fileobj):
+                if cancelled:
+                    return
+                batch.append(text)
+                if len(batch) >= batch_size:
+                    put(batch)
+                    batch = []
+            if batch:
+                put(batch)
+            put(_DONE)
+        except BaseException as e:
+            if not cancelled:
+                put(e)
+
+    future = loop.run_in_executor(_get_excel_executor(), produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+        await future
+    finally:
+        if not future.done():
+            # Потребитель ушёл раньше: останавливаем разбор и освобождаем поток
+            cancelled = True
+            while not future.done():
+                while not queue.empty():
+                    queue.get_nowait()
+                await asyncio.sleep(0.01)
@@ -0,0 +1,147 @@
+"""Фоновая проверка доступности вебхуков."""
+import asyncio
+import time
+from typing import Dict, List, Optional
+from app.services.webhook_client import WebhookClient
+from app.utils.env import config
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class WebhookHealth:
+    """Последнее известное состояние вебхука."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.last_status: Optional[int] = None  # None — ошибка соединения/таймаут
+        self.last_latency: Optional[float] = None  # секунды
+        self.last_checked: Optional[float] = None  # time.monotonic()
+        self.consecutive_failures = 0
+
+    @property
+    def healthy(self) -> bool:
+        """Последний ping вернул 2xx."""
+        return self.last_status is not None and 200 <= self.last_status < 300
+
+    @property
+    def reachable(self) -> bool:
+        """Вебхук отвечает: 4xx на ping значит, что он отклоняет проверку, а не лежит."""
+        return self.last_status is not None and self.last_status < 500
+
+    @property
+    def age(self) -> Optional[float]:
+        """Сколько секунд назад выполнялась проверка."""
+        if self.last_checked is None:
+            return None
+        return time.monotonic() - self.last_checked
+
+    def to_dict(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "last_status": self.last_status,
+            "last_latency": self.last_latency,
+            "consecutive_failures": self.consecutive_failures,
+            "age": self.age,
+        }
+
+
+# Общее для всех экземпляров состояние: url -> WebhookHealth.
+# Проверки выполняет экземпляр, запущенный в main, а хендлеры команд и медиа
+# читают результаты через свои экземпляры.
+_health_states: Dict[str, WebhookHealth] = {}
+
+
+def configured_webhook_urls() -> List[str]:
+    """Все настроенные URL вебхуков (медиа и текстовые) без повторов."""
+    urls: List[str] = []
+    for service in ("drive", "samokaty", "prokat"):
+        for url in (config.get_webhook_url(service), config.get_text_webhook_url(service)):
+            if url and url not in urls:
+                urls.append(url)
+    return urls
+
+
+class WebhookHealthProber:
+    """Периодически пингует вебхуки и хранит их состояние.
+
+    Хендлеры и /status читают состояние из памяти и не делают
+    дополнительных HTTP-запросов перед отправкой.
+    """
+
+    def __init__(
+        self,
+        webhook_client: WebhookClient,
+        interval: Optional[float] = None,
+        states: Optional[Dict[str, WebhookHealth]] = None
+    ):
+        self.webhook_client = webhook_client
+        # 0 и меньше — фоновая проверка выключена, /status пингует по запросу
+        self.interval = config.HEALTH_PROBE_INTERVAL_SECS if interval is None else interval
+        self._states = states if states is not None else _health_states
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        """Включена ли фоновая проверка."""
+        return self.interval > 0
+
+    def get(self, url: str) -> Optional[WebhookHealth]:
+        """Состояние вебхука или None, если он ещё не проверялся."""
+        return self._states.get(url)
+
+    def record(self, url: str, status: Optional[int], latency: float) -> WebhookHealth:
+        """Записать результат проверки."""
+        health = self._states.get(url)
+        if health is None:
+            health = self._states[url] = WebhookHealth(url)
+        was_healthy = health.healthy if health.last_checked is not None else None
+        health.last_status = status
+        health.last_latency = latency
+        health.last_checked = time.monotonic()
+        if health.healthy:
+            health.consecutive_failures = 0
+        else:
+            health.consecutive_failures += 1
+        if was_healthy is not None and was_healthy != health.healthy:
+            if health.healthy:
+                logger.info(f"✅ Вебхук {url} снова доступен ({status}, {latency * 1000:.0f} мс)")
+            else:
+                logger.warning(f"⚠️ Вебхук {url} недоступен (статус {status})")
+        return health
+
+    async def probe(self, url: str) -> WebhookHealth:
+        """Проверить один вебхук сейчас."""
+        started = time.perf_counter()
+        status = await self.webhook_client.ping(url)
+        return self.record(url, status, time.perf_counter() - started)
+
+    async def probe_all(self) -> List[WebhookHealth]:
+        """Проверить все настроенные вебхуки параллельно."""
+        return list(await asyncio.gather(*(self.probe(url) for url in configured_webhook_urls())))
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as e:
+                logger.error(f"❌ Ошибка проверки вебхуков: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Запустить фоновую проверку (при interval <= 0 ничего не делает)."""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="webhook-health-prober")
+            logger.info("✅ Проверка вебхуков запущена (каждые %sс)", self.interval)
+
+    async def stop(self) -> None:
+        """Остановить фоновую проверку."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, dict]:
+        """Состояние всех проверенных вебхуков."""
+        return {url: health.to_dict() for url, health in self._states.items()}
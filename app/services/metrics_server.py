@@ -0,0 +1,51 @@
+"""HTTP-сервер метрик Prometheus (GET /metrics)."""
+from typing import Optional
+from aiohttp import web
+from app.utils.env import config
+from app.utils.logging import get_logger
+from app.utils.metrics import MetricsRegistry, registry as default_registry
+
+logger = get_logger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsServer:
+    """Отдаёт метрики реестра в текстовом формате Prometheus.
+
+    По умолчанию слушает только 127.0.0.1: метрики предназначены для
+    локального агента сбора, а не для публичного доступа.
+    """
+
+    def __init__(
+        self,
+        registry: Optional[MetricsRegistry] = None,
+        host: Optional[str] = None,
+        port: Optional[int] = None
+    ):
+        self.registry = registry or default_registry
+        self.host = host or config.METRICS_HOST
+        self.port = config.METRICS_PORT if port is None else port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        body = await self.registry.render()
+        return web.Response(body=body.encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+    async def start(self) -> None:
+        """Запустить HTTP-сервер метрик."""
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        if not self.port:
+            self.port = self._runner.addresses[0][1]
+        logger.info(f"✅ Метрики: http://{self.host}:{self.port}/metrics")
+
+    async def stop(self) -> None:
+        """Остановить HTTP-сервер метрик."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
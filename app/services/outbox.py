@@ -0,0 +1,236 @@
+"""Очередь доставок на вебхуки (outbox) с фоновыми воркерами."""
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from app.models.payload import WebhookPayload
+from app.models.repository import OutboxItem, OutboxRepository
+from app.services.webhook_client import WebhookClient, encode_model
+from app.utils.env import config
+from app.utils.logging import get_logger
+from app.utils.stats import LatencyWindow
+
+logger = get_logger(__name__)
+
+
+class WebhookOutbox:
+    """Персистентная очередь доставок на вебхуки.
+
+    Хендлер только кладёт доставку в таблицу webhook_outbox и сразу отвечает
+    пользователю; отправку и повторы выполняют фоновые воркеры. Доставка
+    at-least-once: ключ идемпотентности (batch_id.seq) уникален в очереди
+    и передаётся вебхуку в X-Idempotency-Key, а прерванные остановкой
+    доставки возвращаются в очередь при следующем запуске. Доставленные
+    и неуспешные записи хранятся retention секунд, затем удаляются purge().
+    """
+
+    def __init__(
+        self,
+        webhook_client: WebhookClient,
+        repository: Optional[OutboxRepository] = None,
+        workers: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        max_backoff: Optional[float] = None,
+        retention: Optional[float] = None
+    ):
+        self.webhook_client = webhook_client
+        self._repo = repository or OutboxRepository()
+        self.workers = max(1, workers or config.OUTBOX_WORKERS)
+        self.max_attempts = max(1, max_attempts or config.OUTBOX_MAX_ATTEMPTS)
+        self.poll_interval = poll_interval or config.OUTBOX_POLL_INTERVAL_SECS
+        self.max_backoff = max_backoff or config.OUTBOX_MAX_BACKOFF_SECS
+        self.retention = retention or config.OUTBOX_RETENTION_SECS
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self.in_flight = 0
+        self.delivered = 0
+        self.failed = 0
+        self.deferred = 0  # отложено из-за открытого circuit breaker
+        # Время от постановки в очередь до успешной доставки, секунды
+        self.delivery_latency = LatencyWindow()
+
+    @property
+    def running(self) -> bool:
+        """Запущены ли воркеры."""
+        return bool(self._tasks)
+
+    async def enqueue(
+        self,
+        webhook_url: str,
+        body: str,
+        idempotency_key: str,
+        kind: str,
+        user_id: Optional[int] = None
+    ) -> bool:
+        """Поставить готовое JSON-тело в очередь. False, если ключ уже в очереди."""
+        added = await self._repo.add(idempotency_key, webhook_url, kind, body, user_id)
+        if added:
+            logger.info("📥 Доставка %s поставлена в очередь на %s", idempotency_key, webhook_url)
+            self._wakeup.set()
+        else:
+            logger.info("♻️ Доставка %s уже в очереди", idempotency_key)
+        return added
+
+    async def enqueue_payload(
+        self,
+        payload: WebhookPayload,
+        webhook_url: str,
+        idempotency_key: str,
+        user_id: Optional[int] = None,
+        body: Optional[bytes] = None
+    ) -> bool:
+        """Поставить в очередь payload с креативами (body — готовый encode_payload)."""
+        if body is None:
+            body = self.webhook_client.encode_payload(payload)
+        return await self.enqueue(webhook_url, body.decode("utf-8"), idempotency_key, "payload", user_id)
+
+    async def enqueue_texts(
+        self,
+        texts: list[str],
+        webhook_url: str,
+        service: str,
+        chat: dict,
+        from_: dict,
+        batch_id: str,
+        placement: Optional[str] = None,
+        user_id: Optional[int] = None
+    ) -> int:
+        """Поставить в очередь тексты чанками; вернуть количество новых чанков.
+
+        0 означает, что все чанки с такими ключами уже были в очереди.
+        """
+        payloads = self.webhook_client.build_texts_chunks(texts, service, chat, from_, batch_id, placement)
+        added = 0
+        for payload in payloads:
+            idempotency_key = self.webhook_client.generate_idempotency_key(batch_id, payload.batch.seq)
+            body = encode_model(payload).decode("utf-8")
+            added += await self.enqueue(webhook_url, body, idempotency_key, "texts", user_id)
+        return added
+
+    async def purge(self) -> int:
+        """Удалить завершённые доставки старше retention; вернуть их количество."""
+        return await self._repo.purge_finished(datetime.utcnow() - timedelta(seconds=self.retention))
+
+    async def finished_count(self) -> int:
+        """Доставленные и неуспешные записи, ещё хранящиеся в таблице."""
+        counts = await self._repo.counts()
+        return counts.get("delivered", 0) + counts.get("failed", 0)
+
+    async def start(self) -> None:
+        """Запустить воркеры доставки."""
+        if self._tasks:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        requeued = await self._repo.requeue_in_flight()
+        if requeued:
+            logger.info("♻️ Возвращено в очередь прерванных доставок: %d", requeued)
+        self._tasks = [
+            asyncio.create_task(self._worker(n), name=f"outbox-worker-{n}")
+            for n in range(self.workers)
+        ]
+        logger.info("✅ Outbox запущен: %d воркеров", self.workers)
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Остановить воркеры, дав текущим доставкам завершиться."""
+        if not self._tasks:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+        logger.info("⏹️ Outbox остановлен")
+
+    async def _worker(self, n: int) -> None:
+        """Цикл воркера: взять подошедшую доставку, отправить, повторить."""
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                items = await self._repo.claim_due(1, datetime.utcnow())
+            except Exception as e:
+                logger.error("❌ Outbox-воркер %d: ошибка чтения очереди: %s", n, e)
+                items = []
+            if not items:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            for item in items:
+                try:
+                    await self._process(item)
+                except Exception:
+                    logger.exception("❌ Outbox-воркер %d: ошибка обработки доставки %s", n, item.idempotency_key)
+                    await self._release(item)
+
+    async def _release(self, item: OutboxItem) -> None:
+        """Вернуть взятую доставку в очередь после сбоя обработки.
+
+        Попытка не расходуется; если вебхук уже принял запрос, повтор
+        придёт с тем же X-Idempotency-Key.
+        """
+        retry_at = datetime.utcnow() + timedelta(seconds=self.poll_interval)
+        try:
+            await self._repo.mark_retry(item.id, item.attempts, retry_at, "processing error")
+        except Exception:
+            # Строка останется in_flight до requeue_in_flight при следующем старте
+            logger.exception("❌ Не удалось вернуть доставку %s в очередь", item.idempotency_key)
+
+    def _backoff(self, attempts: int) -> float:
+        """Задержка перед следующей попыткой."""
+        return min(self.webhook_client.retry_backoff * (2 ** (attempts - 1)), self.max_backoff)
+
+    async def _process(self, item: OutboxItem) -> None:
+        """Одна попытка доставки и перепланирование по результату."""
+        breaker = self.webhook_client.breaker(item.webhook_url)
+        if not breaker.allow_request():
+            # Вебхук временно отключён: откладываем без расхода попытки
+            delay = max(breaker.retry_after(), self.poll_interval)
+            await self._repo.mark_retry(
+                item.id, item.attempts, datetime.utcnow() + timedelta(seconds=delay), "circuit open"
+            )
+            self.deferred += 1
+            return
+        
+        attempts = item.attempts + 1
+        self.in_flight += 1
+        try:
+            ok = await self.webhook_client.deliver(item.webhook_url, item.body, item.idempotency_key)
+        finally:
+            self.in_flight -= 1
+
+        now = datetime.utcnow()
+        if ok:
+            await self._repo.mark_delivered(item.id, attempts, now)
+            self.delivered += 1
+            self.delivery_latency.add((now - item.created_at).total_seconds())
+            logger.info("✅ Доставка %s выполнена (попытка %d)", item.idempotency_key, attempts)
+        elif attempts >= self.max_attempts:
+            await self._repo.mark_failed(item.id, attempts, "delivery failed")
+            self.failed += 1
+            logger.error(
+                "❌ Доставка %s на %s не удалась после %d попыток",
+                item.idempotency_key, item.webhook_url, attempts
+            )
+        else:
+            delay = self._backoff(attempts)
+            await self._repo.mark_retry(item.id, attempts, now + timedelta(seconds=delay), "delivery failed")
+            logger.info("⏳ Доставка %s: повтор через %sс (попытка %d)", item.idempotency_key, delay, attempts)
+
+    async def stats(self) -> Dict[str, Any]:
+        """Глубина очереди, доставки в работе, задержка доставки и состояние breaker'ов."""
+        counts = await self._repo.counts()
+        return {
+            "queue_depth": counts.get("pending", 0),
+            "in_flight": self.in_flight,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "failed_total": counts.get("failed", 0),
+            "deferred": self.deferred,
+            "circuit_breakers": self.webhook_client.breaker_stats(),
+            "delivery_latency": self.delivery_latency.summary(),
+        }
@@ -1,98 +1,105 @@
 """Сервис для работы с предпочтениями пользователей."""
 from typing import Optional
-from sqlmodel import select
-from app.models.database import UserPrefs, LastPayload, get_session
+from app.models.repository import PrefsRepository, UserContext
+from app.services.sweeper import state_sweeper
+from app.utils.cache import TTLCache
+from app.utils.env import config
 from app.utils.logging import get_logger
 
 logger = get_logger(__name__)
 
+
+def prefs_cache_ttl() -> float:
+    """TTL кэша предпочтений с учётом STATE_BACKEND.
+
+    Запись через кэш сквозная только в пределах процесса; при общем
+    хранилище (sqlite) реплики не знают об изменениях друг друга, поэтому
+    TTL ограничивается PREFS_CACHE_SHARED_TTL_SECS.
+    """
+    ttl = config.PREFS_CACHE_TTL_SECS
+    if config.STATE_BACKEND == "sqlite":
+        shared_ttl = config.PREFS_CACHE_SHARED_TTL_SECS
+        # TTL 0 — без ограничения по времени
+        ttl = shared_ttl if ttl <= 0 else min(ttl, shared_ttl)
+    return ttl
+
+
+# Общий для всех экземпляров сервиса кэш: user_id -> UserContext(service, placement).
+# Хендлеры команд и медиа создают свои экземпляры, поэтому кэш должен быть один,
+# иначе запись через один экземпляр оставит устаревшие данные в другом.
+_prefs_cache = TTLCache(
+    maxsize=config.PREFS_CACHE_SIZE,
+    ttl=prefs_cache_ttl()
+)
+state_sweeper.track_cache("prefs_cache", _prefs_cache)
+
 class PreferencesService:
-    """Сервис для работы с предпочтениями пользователей."""
+    """Сервис для работы с предпочтениями пользователей.
     
-    def get_user_service(self, user_id: int) -> str:
+    Чтения из кэша не покидают event loop; обращения к БД выполняются
+    в DB-потоке через PrefsRepository.
+    """
+    
+    def __init__(self, cache: Optional[TTLCache] = None, repository: Optional[PrefsRepository] = None):
+        self._cache = cache if cache is not None else _prefs_cache
+        self._repo = repository or PrefsRepository()
+    
+    async def get_user_context(self, user_id: int) -> UserContext:
+        """Получить сервис и место размещения пользователя.
+        
+        При промахе кэша выполняется один запрос INSERT ... ON CONFLICT ... RETURNING:
+        он же создаёт запись с сервисом по умолчанию для нового пользователя.
+        """
+        context = self._cache.get(user_id)
+        if context is None:
+            context = await self._repo.get_or_create(user_id, config.DEFAULT_SERVICE)
+            self._cache.set(user_id, context)
+        return context
+    
+    async def get_user_service(self, user_id: int) -> str:
         """Получить выбранный сервис пользователя."""
-        with get_session() as session:
-            stmt = select(UserPrefs).where(UserPrefs.user_id == user_id)
-            user_prefs = session.exec(stmt).first()
-            
-            if user_prefs:
-                return user_prefs.service
-            else:
-                # Создаем запись с дефолтным сервисом
-                from app.utils.env import config
-                default_service = config.DEFAULT_SERVICE
-                self.set_user_service(user_id, default_service)
-                return default_service
+        return (await self.get_user_context(user_id)).service
     
-    def set_user_service(self, user_id: int, service: str) -> None:
+    async def set_user_service(self, user_id: int, service: str) -> None:
         """Установить сервис для пользователя."""
-        with get_session() as session:
-            stmt = select(UserPrefs).where(UserPrefs.user_id == user_id)
-            user_prefs = session.exec(stmt).first()
-            
-            if user_prefs:
-                user_prefs.service = service
-            else:
-                user_prefs = UserPrefs(user_id=user_id, service=service)
-                session.add(user_prefs)
-            
-            session.commit()
-            logger.info(f"✅ Сервис пользователя {user_id} изменен на {service}")
+        context = await self._repo.set_service(user_id, service)
+        self._cache.set(user_id, context)
+        logger.info("✅ Сервис пользователя %s изменен на %s", user_id, service)
     
-    def save_last_payload(self, user_id: int, json_payload: str) -> None:
+    async def save_last_payload(self, user_id: int, json_payload: str) -> None:
         """Сохранить последний payload для retry."""
-        with get_session() as session:
-            stmt = select(LastPayload).where(LastPayload.user_id == user_id)
-            last_payload = session.exec(stmt).first()
-            
-            if last_payload:
-                last_payload.json_payload = json_payload
-            else:
-                last_payload = LastPayload(user_id=user_id, json_payload=json_payload)
-                session.add(last_payload)
-            
-            session.commit()
-            logger.info(f"✅ Payload пользователя {user_id} сохранен для retry")
+        await self._repo.save_last_payload(user_id, json_payload)
+        logger.info("✅ Payload пользователя %s сохранен для retry", user_id)
     
-    def get_last_payload(self, user_id: int) -> Optional[str]:
+    async def get_last_payload(self, user_id: int) -> Optional[str]:
         """Получить последний payload пользователя."""
-        with get_session() as session:
-            stmt = select(LastPayload).where(LastPayload.user_id == user_id)
-            last_payload = session.exec(stmt).first()
-            
-            if last_payload:
-                return last_payload.json_payload
-            return None
+        return await self._repo.get_last_payload(user_id)
     
-    def get_user_placement(self, user_id: int) -> Optional[str]:
+    async def get_user_placement(self, user_id: int) -> Optional[str]:
         """Получить место размещения пользователя."""
-        with get_session() as session:
-            stmt = select(UserPrefs).where(UserPrefs.user_id == user_id)
-            user_prefs = session.exec(stmt).first()
-            
-            if user_prefs:
-                placement = user_prefs.placement
-                logger.debug(f"📍 Placement пользователя {user_id}: {placement}")
-                return placement
-            logger.debug(f"📍 Placement пользователя {user_id}: не найдено (запись не существует)")
-            return None
+        placement = (await self.get_user_context(user_id)).placement
+        logger.debug("📍 Placement пользователя %s: %s", user_id, placement)
+        return placement
     
-    def set_user_placement(self, user_id: int, placement: str) -> None:
+    async def set_user_placement(self, user_id: int, placement: str) -> None:
         """Установить место размещения для пользователя."""
-        from datetime import datetime
-        with get_session() as session:
-            stmt = select(UserPrefs).where(UserPrefs.user_id == user_id)
-            user_prefs = session.exec(stmt).first()
-            
-            if user_prefs:
-                user_prefs.placement = placement
-                user_prefs.updated_at = datetime.utcnow()
-            else:
-                # Создаем запись с дефолтным сервисом
-                from app.utils.env import config
-                default_service = config.DEFAULT_SERVICE
-                user_prefs = UserPrefs(user_id=user_id, service=default_service, placement=placement)
-                session.add(user_prefs)
-            
-            session.commit()
-            logger.info(f"✅ Место размещения пользователя {user_id} установлено: {placement}")
\ No newline at end of file
+        context = await self._repo.set_placement(user_id, placement, config.DEFAULT_SERVICE)
+        self._cache.set(user_id, context)
+        logger.info("✅ Место размещения пользователя %s установлено: %s", user_id, placement)
+    
+    async def warm_cache(self, limit: Optional[int] = None) -> int:
+        """Прогреть кэш последними обновлёнными записями.
+        
+        Возвращает количество загруженных пользователей.
+        """
+        limit = min(limit or self._cache.maxsize, self._cache.maxsize)
+        rows = await self._repo.recent_prefs(limit)
+        # Загружаем от старых к новым, чтобы свежие записи были последними в LRU
+        for user_id, context in reversed(rows):
+            self._cache.set(user_id, context)
+        logger.info("🔥 Кэш предпочтений прогрет: %d пользователей", len(rows))
+        return len(rows)
+    
+    def cache_stats(self) -> dict:
+        """Статистика кэша предпочтений."""
+        return self._cache.stats()
@@ -0,0 +1,154 @@
+"""Хранилища состояния: буферы burst/альбомов и FSM.
+
+memory — состояние в памяти процесса (одна реплика).
+sqlite — общее состояние в базе: несколько реплик делят нагрузку,
+не разрывая альбомы и burst-пачки одного пользователя.
+"""
+import json
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Mapping
+from typing import Any, Dict, List, Optional, Tuple
+from aiogram import Bot
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Message
+from app.models.repository import BufferRepository, BufferState, FSMRepository
+from app.utils.env import config
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class BufferStore(ABC):
+    """Буферы сообщений с общим сроком сброса.
+
+    Сообщения копятся под ключом (burst:<user_id>, album:<media_group_id>);
+    каждое новое сообщение переносит срок сброса. Буфер забирает тот, кто
+    первым вызвал take после срока, — остальные получают пустой список.
+    """
+
+    @abstractmethod
+    async def append(
+        self, key: str, message: Message, deadline: float, max_age: Optional[float] = None
+    ) -> BufferState:
+        """Добавить сообщение и установить срок сброса (unix time).
+        
+        max_age ограничивает срок: не позже first_at + max_age, сколько бы
+        сообщений ни приходило.
+        """
+
+    @abstractmethod
+    async def peek(self, key: str) -> Optional[BufferState]:
+        """Состояние буфера или None, если он пуст."""
+
+    @abstractmethod
+    async def take(self, key: str, bot: Optional[Bot] = None, due_before: Optional[float] = None) -> List[Message]:
+        """Забрать сообщения (при due_before — только если срок сброса наступил)."""
+
+    @abstractmethod
+    async def keys(self) -> List[str]:
+        """Ключи непустых буферов."""
+
+
+class MemoryBufferStore(BufferStore):
+    """Буферы в памяти процесса."""
+
+    def __init__(self):
+        self._buffers: Dict[str, Tuple[List[Message], float, float]] = {}
+
+    async def append(
+        self, key: str, message: Message, deadline: float, max_age: Optional[float] = None
+    ) -> BufferState:
+        messages, first_at, _ = self._buffers.get(key) or ([], time.time(), deadline)
+        messages.append(message)
+        if max_age is not None:
+            deadline = min(deadline, first_at + max_age)
+        self._buffers[key] = (messages, first_at, deadline)
+        return BufferState(len(messages), first_at, deadline)
+
+    async def peek(self, key: str) -> Optional[BufferState]:
+        entry = self._buffers.get(key)
+        if entry is None:
+            return None
+        messages, first_at, deadline = entry
+        return BufferState(len(messages), first_at, deadline)
+
+    async def take(self, key: str, bot: Optional[Bot] = None, due_before: Optional[float] = None) -> List[Message]:
+        entry = self._buffers.get(key)
+        if entry is None or (due_before is not None and entry[2] > due_before):
+            return []
+        del self._buffers[key]
+        return entry[0]
+
+    async def keys(self) -> List[str]:
+        return list(self._buffers)
+
+
+class SQLiteBufferStore(BufferStore):
+    """Общие буферы в SQLite: сообщения хранятся как JSON Bot API."""
+
+    def __init__(self, repository: Optional[BufferRepository] = None):
+        self._repo = repository or BufferRepository()
+
+    async def append(
+        self, key: str, message: Message, deadline: float, max_age: Optional[float] = None
+    ) -> BufferState:
+        payload = message.model_dump_json(by_alias=True, exclude_none=True)
+        return await self._repo.append(key, payload, time.time(), deadline, max_age)
+
+    async def peek(self, key: str) -> Optional[BufferState]:
+        return await self._repo.peek(key)
+
+    async def take(self, key: str, bot: Optional[Bot] = None, due_before: Optional[float] = None) -> List[Message]:
+        payloads = await self._repo.take(key, due_before)
+        # Контекст с ботом нужен, чтобы у восстановленных сообщений работал answer()
+        return [Message.model_validate_json(payload, context={"bot": bot}) for payload in payloads]
+
+    async def keys(self) -> List[str]:
+        return await self._repo.keys()
+
+
+class SQLiteStorage(BaseStorage):
+    """FSM-хранилище aiogram в SQLite (таблица fsm_state)."""
+
+    def __init__(self, repository: Optional[FSMRepository] = None, key_builder: Optional[KeyBuilder] = None):
+        self._repo = repository or FSMRepository()
+        self.key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+
+    def _key(self, key: StorageKey) -> str:
+        return self.key_builder.build(key)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._repo.set_state(self._key(key), state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = await self._repo.get(self._key(key))
+        return record[0] if record else None
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        await self._repo.set_data(self._key(key), json.dumps(dict(data), ensure_ascii=False))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = await self._repo.get(self._key(key))
+        return json.loads(record[1]) if record else {}
+
+    async def close(self) -> None:
+        pass
+
+
+def create_buffer_store(backend: Optional[str] = None) -> BufferStore:
+    """Хранилище буферов по STATE_BACKEND."""
+    backend = backend or config.STATE_BACKEND
+    if backend == "sqlite":
+        return SQLiteBufferStore()
+    return MemoryBufferStore()
+
+
+def create_fsm_storage(backend: Optional[str] = None) -> BaseStorage:
+    """FSM-хранилище по STATE_BACKEND."""
+    backend = backend or config.STATE_BACKEND
+    if backend == "sqlite":
+        return SQLiteStorage()
+    return MemoryStorage()
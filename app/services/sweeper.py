@@ -0,0 +1,111 @@
+"""Периодическая очистка состояния в памяти и его размеры."""
+import asyncio
+import inspect
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+from app.utils.cache import TTLCache
+from app.utils.env import config
+from app.utils.logging import get_logger
+from app.utils.metrics import gauge, registry
+
+logger = get_logger(__name__)
+
+STATE_ENTRIES = gauge("state_entries", "Записей в структурах состояния в памяти (буферы, кэши)", ["structure"])
+
+
+async def _call(func: Callable[[], Any]) -> Any:
+    """Вызвать функцию или корутину и вернуть результат."""
+    result = func()
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+class StateSweeper:
+    """Реестр структур состояния в памяти с фоновой очисткой.
+
+    Модули регистрируют свои кэши и буферы через track(): size() даёт
+    текущий размер (gauge), sweep() удаляет или восстанавливает
+    просроченные записи и возвращает их число. Фоновая задача вызывает
+    sweep() всех структур раз в interval секунд, чтобы память
+    долгоживущего процесса не росла.
+    """
+
+    def __init__(self, interval: Optional[float] = None):
+        self.interval = interval or config.STATE_SWEEP_INTERVAL_SECS
+        self._tracked: Dict[str, Tuple[Callable[[], Any], Optional[Callable[[], Any]]]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.sweeps = 0
+        self.swept: Dict[str, int] = {}
+
+    def track(self, name: str, size: Callable[[], Any], sweep: Optional[Callable[[], Any]] = None) -> None:
+        """Зарегистрировать структуру (size и sweep могут быть корутинами)."""
+        self._tracked[name] = (size, sweep)
+
+    def track_cache(self, name: str, cache: TTLCache) -> None:
+        """Зарегистрировать TTLCache: размер и удаление просроченных записей."""
+        self.track(name, cache.__len__, cache.expire)
+
+    async def sweep(self) -> Dict[str, int]:
+        """Очистить все структуры; вернуть число удалённых записей по именам."""
+        removed = {}
+        for name, (_, sweep) in list(self._tracked.items()):
+            if sweep is None:
+                continue
+            try:
+                count = await _call(sweep) or 0
+            except Exception as e:
+                logger.error(f"❌ Ошибка очистки {name}: {e}")
+                continue
+            removed[name] = count
+            self.swept[name] = self.swept.get(name, 0) + count
+        self.sweeps += 1
+        if any(removed.values()):
+            logger.info(f"🧹 Очищено состояние: {', '.join(f'{k}={v}' for k, v in removed.items() if v)}")
+        return removed
+
+    async def gauges(self) -> Dict[str, int]:
+        """Текущие размеры всех зарегистрированных структур."""
+        sizes = {}
+        for name, (size, _) in list(self._tracked.items()):
+            try:
+                sizes[name] = await _call(size)
+            except Exception as e:
+                logger.error(f"❌ Ошибка чтения размера {name}: {e}")
+        return sizes
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.sweep()
+            # Размеры собираются только ради debug-лога
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("📏 Размеры состояния: %s", await self.gauges())
+
+    def start(self) -> None:
+        """Запустить фоновую очистку."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="state-sweeper")
+            logger.info(f"✅ Очистка состояния запущена (каждые {self.interval}с)")
+
+    async def stop(self) -> None:
+        """Остановить фоновую очистку."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def stats(self) -> Dict[str, Any]:
+        return {"sizes": await self.gauges(), "sweeps": self.sweeps, "swept": dict(self.swept)}
+
+
+# Общий реестр: модули регистрируют в нём своё состояние при импорте
+state_sweeper = StateSweeper()
+
+
+async def collect_state_metrics() -> None:
+    """Обновить gauge размеров структур состояния."""
+    for name, size in (await state_sweeper.gauges()).items():
+        STATE_ENTRIES.set(size, structure=name)
+
+registry.add_collector(collect_state_metrics)
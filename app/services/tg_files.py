@@ -1,26 +1,73 @@
 """Сервис для работы с файлами Telegram."""
+import asyncio
+import time
 from typing import Optional, Dict, Any, List
 from aiogram import Bot
 from aiogram.types import Message, PhotoSize, Video, Document, Audio, Voice, Sticker, Animation
+from app.utils.cache import TTLCache
+from app.utils.env import config
 from app.utils.logging import get_logger
+from app.utils.metrics import counter, histogram
 from app.models.payload import Creative
 
 logger = get_logger(__name__)
 
+TG_GET_FILE_SECONDS = histogram("tg_get_file_seconds", "Длительность запроса getFile", ["result"])
+TG_FILE_PATH_CACHE = counter("tg_file_path_cache_total", "Обращения к кэшу путей файлов", ["result"])
+
 class TelegramFileService:
     """Сервис для работы с файлами Telegram."""
     
-    def __init__(self, bot: Bot):
+    def __init__(self, bot: Bot, concurrency: Optional[int] = None, path_cache: Optional[TTLCache] = None):
         self.bot = bot
+        # Сколько запросов getFile выполнять одновременно в рамках одного пакета
+        self.concurrency = max(1, concurrency or config.TG_FILES_CONCURRENCY)
+        # file_unique_id / file_id -> file_path. Telegram гарантирует, что ссылка
+        # на файл действительна не меньше часа, поэтому TTL держим ниже этого.
+        self.path_cache = path_cache if path_cache is not None else TTLCache(
+            maxsize=config.TG_FILE_CACHE_SIZE,
+            ttl=config.TG_FILE_CACHE_TTL_SECS
+        )
     
-    async def get_file_url(self, file_id: str) -> Optional[str]:
-        """Получить URL для скачивания файла."""
-        try:
-            file = await self.bot.get_file(file_id)
-            return f"https://api.telegram.org/file/bot{self.bot.token}/{file.file_path}"
-        except Exception as e:
-            logger.error(f"❌ Ошибка получения URL файла {file_id}: {e}")
-            return None
+    async def get_file_url(self, file_id: str, file_unique_id: Optional[str] = None) -> Optional[str]:
+        """Получить URL для скачивания файла.
+        
+        Путь файла берётся из кэша, если этот файл (по file_unique_id или file_id)
+        уже запрашивался недавно; иначе выполняется запрос getFile.
+        """
+        # file_unique_id стабилен между пересылками и повторными отправками
+        cache_key = file_unique_id or file_id
+        file_path = self.path_cache.get(cache_key)
+        
+        if file_path is None:
+            TG_FILE_PATH_CACHE.inc(result="miss")
+            started = time.perf_counter()
+            try:
+                file = await self.bot.get_file(file_id)
+            except Exception as e:
+                TG_GET_FILE_SECONDS.observe(time.perf_counter() - started, result="error")
+                logger.error(f"❌ Ошибка получения URL файла {file_id}: {e}")
+                return None
+            TG_GET_FILE_SECONDS.observe(time.perf_counter() - started, result="ok")
+            file_path = file.file_path
+            if file_path:
+                self.path_cache.set(cache_key, file_path)
+        else:
+            TG_FILE_PATH_CACHE.inc(result="hit")
+        
+        return self.file_url(file_path)
+    
+    def file_url(self, file_path: str) -> str:
+        """URL скачивания файла на сервере Bot API, с которым работает бот."""
+        session = getattr(self.bot, "session", None)
+        api = getattr(session, "api", None)
+        if api is not None:
+            return api.file_url(self.bot.token, file_path)
+        return f"https://api.telegram.org/file/bot{self.bot.token}/{file_path}"
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Статистика кэша путей файлов."""
+        return self.path_cache.stats()
     
     async def extract_creative_from_message(self, message: Message) -> Optional[Creative]:
         """Извлечь креатив из сообщения."""
@@ -56,7 +103,7 @@ class TelegramFileService:
         # Получаем URL для скачивания (если есть файл)
         download_url = None
         if file_id:
-            download_url = await self.get_file_url(file_id)
+            download_url = await self.get_file_url(file_id, file_unique_id)
         
         return Creative(
             type=creative_type,
@@ -75,12 +122,21 @@ class TelegramFileService:
         )
     
     async def extract_creatives_from_messages(self, messages: List[Message]) -> List[Creative]:
-        """Извлечь креативы из списка сообщений."""
-        creatives = []
+        """Извлечь креативы из списка сообщений.
+        
+        URL файлов запрашиваются параллельно (не более `concurrency` одновременно),
+        порядок креативов совпадает с порядком сообщений. Ошибка в одном
+        сообщении не влияет на остальные.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
         
-        for message in messages:
-            creative = await self.extract_creative_from_message(message)
-            if creative:
-                creatives.append(creative)
+        async def extract(message: Message) -> Optional[Creative]:
+            async with semaphore:
+                try:
+                    return await self.extract_creative_from_message(message)
+                except Exception as e:
+                    logger.error(f"❌ Ошибка извлечения креатива из сообщения {message.message_id}: {e}")
+                    return None
         
-        return creatives
+        results = await asyncio.gather(*(extract(message) for message in messages))
+        return [creative for creative in results if creative]
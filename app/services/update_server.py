@@ -0,0 +1,172 @@
+"""Приём обновлений Telegram по HTTP (webhook) вместо long polling."""
+import asyncio
+import hmac
+import time
+from typing import List, Optional
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+from app.utils.env import config
+from app.utils.logging import get_logger
+from app.utils.metrics import counter, gauge, histogram
+from app.utils.stats import LatencyWindow
+
+logger = get_logger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+UPDATE_HANDLE_SECONDS = histogram("update_handle_seconds", "Время от приёма обновления до конца обработки")
+UPDATE_QUEUE_DEPTH = gauge("update_queue_depth", "Обновлений в очереди на обработку")
+UPDATE_REQUESTS = counter("update_requests_total", "Запросы Telegram к серверу обновлений", ["result"])
+
+
+class UpdateServer:
+    """HTTP-сервер обновлений с ограниченной очередью и пулом обработчиков.
+
+    Запрос Telegram подтверждается сразу после проверки секрета и постановки
+    обновления в очередь; обработку выполняют workers фоновых задач через
+    dp.feed_update. Если очередь заполнена, сервер отвечает 503 и Telegram
+    повторит доставку позже — так входящий поток не копится в памяти.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        secret_token: Optional[str] = None,
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        path: Optional[str] = None
+    ):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.secret_token = secret_token if secret_token is not None else config.BOT_WEBHOOK_SECRET
+        self.workers = max(1, workers or config.UPDATE_WORKERS)
+        self.queue_size = max(1, queue_size or config.UPDATE_QUEUE_SIZE)
+        self.host = host or config.BOT_WEBHOOK_HOST
+        self.port = config.BOT_WEBHOOK_PORT if port is None else port
+        self.path = path or config.BOT_WEBHOOK_PATH
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._runner: Optional[web.AppRunner] = None
+        self.accepted = 0
+        self.rejected = 0  # очередь заполнена
+        self.unauthorized = 0
+        self.processed = 0
+        self.errors = 0
+        # Время от приёма обновления до окончания обработки, секунды
+        self.handle_latency = LatencyWindow()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _authorized(self, request: web.Request) -> bool:
+        """Проверить секретный токен Telegram (сравнение за постоянное время)."""
+        token = request.headers.get(SECRET_HEADER, "")
+        return hmac.compare_digest(token.encode("utf-8"), self.secret_token.encode("utf-8"))
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        """Принять обновление и поставить его в очередь."""
+        if not self._authorized(request):
+            self.unauthorized += 1
+            UPDATE_REQUESTS.inc(result="unauthorized")
+            return web.Response(status=401)
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except Exception as e:
+            logger.warning(f"⚠️ Некорректное обновление: {e}")
+            UPDATE_REQUESTS.inc(result="invalid")
+            return web.Response(status=400)
+        try:
+            self._queue.put_nowait((time.perf_counter(), update))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            UPDATE_REQUESTS.inc(result="rejected")
+            logger.warning(f"⚠️ Очередь обновлений заполнена ({self.queue_size}), update {update.update_id} отклонён")
+            return web.Response(status=503)
+        self.accepted += 1
+        UPDATE_REQUESTS.inc(result="accepted")
+        return web.Response()
+
+    async def _worker(self, n: int) -> None:
+        """Обрабатывать обновления из очереди."""
+        while True:
+            received_at, update = await self._queue.get()
+            try:
+                await self.dispatcher.feed_update(self.bot, update)
+                self.processed += 1
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"❌ Ошибка обработки update {update.update_id} (воркер {n}): {e}")
+            finally:
+                elapsed = time.perf_counter() - received_at
+                self.handle_latency.add(elapsed)
+                UPDATE_HANDLE_SECONDS.observe(elapsed)
+                self._queue.task_done()
+
+    def build_app(self) -> web.Application:
+        """aiohttp-приложение с маршрутом обновлений."""
+        app = web.Application()
+        app.router.add_post(self.path, self._handle)
+        return app
+
+    async def start(self) -> None:
+        """Запустить воркеры и HTTP-сервер."""
+        if not self.secret_token:
+            raise ValueError("BOT_WEBHOOK_SECRET не установлен")
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        UPDATE_QUEUE_DEPTH.set_function(lambda: self.queue_depth)
+        self._tasks = [
+            asyncio.create_task(self._worker(n), name=f"update-worker-{n}")
+            for n in range(self.workers)
+        ]
+        self._runner = web.AppRunner(self.build_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        if not self.port:
+            self.port = self._runner.addresses[0][1]
+        logger.info(
+            f"✅ Приём обновлений: http://{self.host}:{self.port}{self.path} "
+            f"({self.workers} воркеров, очередь {self.queue_size})"
+        )
+
+    async def set_webhook(self, url: str) -> None:
+        """Зарегистрировать URL у Telegram с секретным токеном."""
+        await self.bot.set_webhook(
+            url=url,
+            secret_token=self.secret_token,
+            allowed_updates=self.dispatcher.resolve_used_update_types(),
+            max_connections=config.BOT_WEBHOOK_MAX_CONNECTIONS,
+        )
+        logger.info(f"✅ Webhook Telegram установлен: {url}")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Перестать принимать запросы, дообработать очередь и остановить воркеры."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        if self._queue is not None and self._tasks:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"⚠️ Не обработано обновлений при остановке: {self._queue.qsize()}")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("⏹️ Приём обновлений остановлен")
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "unauthorized": self.unauthorized,
+            "processed": self.processed,
+            "errors": self.errors,
+            "handle_latency": self.handle_latency.summary(),
+        }
@@ -1,108 +1,473 @@
 """Клиент для отправки данных на вебхуки."""
 import asyncio
-import json
+import gzip
+import hashlib
+import importlib.util
+import time
 import uuid
-from typing import Optional, Dict, Any
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional, Dict, Tuple
 import httpx
+from pydantic import BaseModel
+from app.utils.circuit_breaker import OPEN, CircuitBreaker, CircuitBreakerRegistry
 from app.utils.env import config
 from app.utils.logging import get_logger
-from app.models.payload import WebhookPayload, UrlsOnlyPayload, TextsPayload
+from app.utils.metrics import COUNT_BUCKETS, counter, gauge, histogram, registry
+from app.models.payload import WebhookPayload, UrlsOnlyPayload, TextsPayload, BatchInfo
 
 logger = get_logger(__name__)
 
+# Общий HTTP-клиент процесса: держит пул keep-alive соединений между запросами
+_http_client: Optional[httpx.AsyncClient] = None
+
+# Circuit breaker на каждый URL вебхука, общий для всех экземпляров клиента
+_breakers = CircuitBreakerRegistry(
+    failure_threshold=config.CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout=config.CIRCUIT_RESET_TIMEOUT_SECS,
+    half_open_max_calls=config.CIRCUIT_HALF_OPEN_MAX_CALLS,
+)
+
+WEBHOOK_REQUEST_SECONDS = histogram(
+    "webhook_request_seconds", "Длительность POST на вебхук", ["service", "status"]
+)
+WEBHOOK_IN_FLIGHT = gauge("webhook_in_flight", "Запросы к вебхуку в процессе отправки", ["service"])
+WEBHOOK_RETRIES = counter("webhook_retries_total", "Повторные попытки отправки на вебхук", ["service"])
+WEBHOOK_FAILURES = counter(
+    "webhook_failures_total", "Неудачные попытки отправки на вебхук", ["service", "reason"]
+)
+WEBHOOK_DELIVERIES = counter(
+    "webhook_deliveries_total", "Итог отправки с повторами (ok, failed, circuit_open)", ["service", "result"]
+)
+BATCH_CHUNKS = histogram("batch_chunks", "Чанков (запросов) в одном пакете", ["kind"], COUNT_BUCKETS)
+WEBHOOK_CIRCUIT_OPEN = gauge("webhook_circuit_open", "Circuit breaker вебхука открыт (1) или нет (0)", ["service"])
+
+
+def webhook_label(webhook_url: str) -> str:
+    """Метка service для метрик: имя вебхука из конфигурации или other."""
+    return config.get_webhook_name(webhook_url) or "other"
+
+
+def collect_breaker_metrics() -> None:
+    """Обновить gauge открытых circuit breaker'ов вебхуков."""
+    for url, stats in _breakers.stats().items():
+        WEBHOOK_CIRCUIT_OPEN.set(1 if stats["state"] == OPEN else 0, service=webhook_label(url))
+
+registry.add_collector(collect_breaker_metrics)
+
+
+def check_optional_packages() -> List[str]:
+    """Предупредить о включённых опциях без нужных пакетов; вернуть их список.
+
+    Вызывается один раз при старте: сами опции без пакетов молча
+    откатываются на HTTP/1.1 и gzip.
+    """
+    missing = []
+    if config.HTTP2_ENABLED and importlib.util.find_spec("h2") is None:
+        logger.warning("⚠️ HTTP2_ENABLED=true, но пакет h2 не установлен (pip install h2) — используем HTTP/1.1")
+        missing.append("h2")
+    if "zstd" in config.WEBHOOK_COMPRESSION.values() and importlib.util.find_spec("zstandard") is None:
+        logger.warning(
+            "⚠️ WEBHOOK_COMPRESSION использует zstd, но пакет zstandard не установлен "
+            "(pip install zstandard) — используем gzip"
+        )
+        missing.append("zstandard")
+    return missing
+
+
+def _create_http_client() -> httpx.AsyncClient:
+    """Создать HTTP-клиент с пулом соединений по настройкам конфигурации."""
+    # Без пакета h2 — HTTP/1.1 (предупреждение пишет check_optional_packages)
+    http2 = config.HTTP2_ENABLED and importlib.util.find_spec("h2") is not None
+    limits = httpx.Limits(
+        max_connections=config.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY_SECS,
+    )
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(config.HTTP_TIMEOUT_SECONDS),
+        limits=limits,
+        http2=http2,
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Получить общий HTTP-клиент (создаётся при первом обращении)."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _create_http_client()
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Закрыть общий HTTP-клиент и все соединения пула."""
+    global _http_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+        logger.info("✅ HTTP-клиент закрыт")
+    _http_client = None
+
+
+def encode_model(model: BaseModel) -> bytes:
+    """Сериализовать модель в JSON (UTF-8, с алиасами полей) сразу в байты.
+    
+    Сериализатор pydantic-core пишет байты напрямую, без промежуточного
+    словаря и повторного json.dumps.
+    """
+    return type(model).__pydantic_serializer__.to_json(model, by_alias=True)
+
+
+def payload_digest(body: bytes) -> str:
+    """Дайджест тела запроса для заголовка X-Payload-Digest."""
+    return "sha256=" + hashlib.sha256(body).hexdigest()
+
+
+def compress_body(body: bytes, codec: str, level: Optional[int] = None) -> Tuple[bytes, str]:
+    """Сжать тело запроса; вернуть (сжатые данные, значение Content-Encoding).
+    
+    zstd требует пакет zstandard; без него используется gzip
+    (предупреждение пишет check_optional_packages при старте).
+    """
+    if codec == "zstd":
+        try:
+            import zstandard  # type: ignore
+        except ImportError:
+            pass
+        else:
+            compressor = zstandard.ZstdCompressor(level=level or config.WEBHOOK_ZSTD_LEVEL)
+            return compressor.compress(body), "zstd"
+    return gzip.compress(body, compresslevel=level or config.WEBHOOK_GZIP_LEVEL, mtime=0), "gzip"
+
+
+def chunk_texts(texts: List[str], max_count: int, max_bytes: int) -> List[List[str]]:
+    """Разбить тексты на чанки не больше max_count штук и ~max_bytes байт JSON.
+    
+    Текст, который сам по себе больше max_bytes, уходит отдельным чанком.
+    """
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    size = 0
+    for text in texts:
+        # +3 байта: кавычки и запятая в JSON-массиве
+        text_size = len(text.encode("utf-8")) + 3
+        if current and (len(current) >= max_count or size + text_size > max_bytes):
+            chunks.append(current)
+            current, size = [], 0
+        current.append(text)
+        size += text_size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
 class WebhookClient:
     """Клиент для отправки данных на вебхуки."""
     
-    def __init__(self):
+    def __init__(self, parallelism: Optional[int] = None, breakers: Optional[CircuitBreakerRegistry] = None):
         self.timeout = httpx.Timeout(config.HTTP_TIMEOUT_SECONDS)
         self.max_retries = config.MAX_RETRIES
         self.retry_backoff = 2  # Фиксированная задержка в 2 секунды
+        # Максимум одновременных запросов к одному URL вебхука
+        self.parallelism = max(1, parallelism or config.WEBHOOK_PARALLELISM)
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self.breakers = breakers if breakers is not None else _breakers
     
-    async def send_payload(
-        self, 
-        payload: WebhookPayload, 
-        webhook_url: str,
-        idempotency_key: Optional[str] = None
-    ) -> bool:
-        """Отправить payload на вебхук."""
-        if config.WEBHOOK_MODE == "urls_only":
-            # Отправляем только URLs
-            urls_payload = UrlsOnlyPayload(
-                service=payload.service,
-                download_urls=payload.download_urls
-            )
-            data = urls_payload.model_dump()
-        else:
-            # Отправляем полный payload
-            data = payload.model_dump(by_alias=True)
-        
+    def breaker(self, webhook_url: str) -> CircuitBreaker:
+        """Circuit breaker вебхука."""
+        return self.breakers.get(webhook_url)
+    
+    def breaker_stats(self) -> Dict[str, dict]:
+        """Состояние circuit breaker'ов по URL вебхуков."""
+        return self.breakers.stats()
+    
+    @asynccontextmanager
+    async def _slot(self, webhook_url: str) -> AsyncIterator[None]:
+        """Занять слот отправки на вебхук (паузы между повторами слот не держат)."""
+        semaphore = self._slots.get(webhook_url)
+        if semaphore is None:
+            semaphore = self._slots[webhook_url] = asyncio.Semaphore(self.parallelism)
+        async with semaphore:
+            yield
+    
+    def _headers(self, idempotency_key: Optional[str] = None) -> Dict[str, str]:
+        """Заголовки запроса к вебхуку."""
         headers = {
             "Content-Type": "application/json",
             "User-Agent": "TelegramBot/1.0"
         }
-        
         if idempotency_key:
             headers["X-Idempotency-Key"] = idempotency_key
+        return headers
+    
+    def _prepare_body(self, webhook_url: str, body: bytes, headers: Dict[str, str]) -> bytes:
+        """Добавить дайджест тела и сжать его, если для вебхука включено сжатие.
         
-        for attempt in range(self.max_retries + 1):
-            try:
-                async with httpx.AsyncClient(timeout=self.timeout) as client:
-                    response = await client.post(
+        Дайджест считается по несжатому JSON, поэтому не зависит от кодека.
+        """
+        headers["X-Payload-Digest"] = payload_digest(body)
+        codec = config.get_webhook_compression(webhook_url)
+        if codec and len(body) >= config.WEBHOOK_COMPRESSION_MIN_BYTES:
+            body, encoding = compress_body(body, codec)
+            headers["Content-Encoding"] = encoding
+        return body
+    
+    async def _attempt(
+        self,
+        webhook_url: str,
+        headers: Dict[str, str],
+        body: bytes,
+        attempt: int = 0
+    ) -> bool:
+        """Одна попытка POST на вебхук. Возвращает True при ответе 2xx.
+        
+        Результат учитывается circuit breaker'ом: ошибки соединения,
+        таймауты, 5xx и 429 считаются отказом вебхука.
+        """
+        breaker = self.breaker(webhook_url)
+        service = webhook_label(webhook_url)
+        status = "error"
+        try:
+            async with self._slot(webhook_url):
+                WEBHOOK_IN_FLIGHT.inc(service=service)
+                started = time.perf_counter()
+                try:
+                    response = await get_http_client().post(
                         webhook_url,
-                        json=data,
-                        headers=headers
+                        content=body,
+                        headers=headers,
+                        timeout=self.timeout
                     )
-                    
-                    if 200 <= response.status_code < 300:
-                        logger.info(f"✅ Payload успешно отправлен на {webhook_url}")
-                        return True
-                    else:
-                        logger.warning(
-                            f"⚠️ Неожиданный статус {response.status_code} от {webhook_url}: {response.text}"
-                        )
-                        
-            except httpx.TimeoutException:
-                logger.warning(f"⏰ Таймаут при отправке на {webhook_url} (попытка {attempt + 1})")
-            except httpx.RequestError as e:
-                logger.error(f"❌ Ошибка запроса к {webhook_url}: {e}")
-            except Exception as e:
-                logger.error(f"❌ Неожиданная ошибка при отправке на {webhook_url}: {e}")
+                    status = str(response.status_code)
+                except httpx.TimeoutException:
+                    status = "timeout"
+                    raise
+                finally:
+                    WEBHOOK_IN_FLIGHT.dec(service=service)
+                    WEBHOOK_REQUEST_SECONDS.observe(time.perf_counter() - started, service=service, status=status)
+            
+            if response.status_code >= 500 or response.status_code == 429:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if 200 <= response.status_code < 300:
+                return True
+            WEBHOOK_FAILURES.inc(service=service, reason="status")
+            logger.warning(
+                "⚠️ Неожиданный статус %d от %s: %s", response.status_code, webhook_url, response.text
+            )
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except httpx.TimeoutException:
+            breaker.record_failure()
+            WEBHOOK_FAILURES.inc(service=service, reason="timeout")
+            logger.warning("⏰ Таймаут при отправке на %s (попытка %d)", webhook_url, attempt + 1)
+        except httpx.RequestError as e:
+            breaker.record_failure()
+            WEBHOOK_FAILURES.inc(service=service, reason="error")
+            logger.error("❌ Ошибка запроса к %s: %s", webhook_url, e)
+        except Exception as e:
+            breaker.record_failure()
+            WEBHOOK_FAILURES.inc(service=service, reason="error")
+            logger.error("❌ Неожиданная ошибка при отправке на %s: %s", webhook_url, e)
+        return False
+    
+    async def _send_with_retries(
+        self,
+        webhook_url: str,
+        headers: Dict[str, str],
+        body: bytes,
+        what: str,
+        sent_message: str
+    ) -> bool:
+        """Отправить запрос с повторами и экспоненциальной задержкой.
+        
+        Тело сжимается один раз и переиспользуется во всех попытках.
+        Пока circuit breaker вебхука открыт, отправка завершается сразу,
+        без попыток и пауз между ними.
+        """
+        body = self._prepare_body(webhook_url, body, headers)
+        breaker = self.breaker(webhook_url)
+        service = webhook_label(webhook_url)
+        for attempt in range(self.max_retries + 1):
+            if not breaker.allow_request():
+                WEBHOOK_DELIVERIES.inc(service=service, result="circuit_open")
+                logger.warning(
+                    "🚫 Вебхук %s временно отключён (circuit breaker), %s не отправлено; "
+                    "пробный запрос через %.0fс",
+                    webhook_url, what, breaker.retry_after()
+                )
+                return False
+            if attempt:
+                WEBHOOK_RETRIES.inc(service=service)
+            if await self._attempt(webhook_url, headers, body, attempt):
+                WEBHOOK_DELIVERIES.inc(service=service, result="ok")
+                logger.info("✅ %s на %s", sent_message, webhook_url)
+                return True
             
-            if attempt < self.max_retries:
+            # Если breaker открылся, не ждём: следующая итерация сразу завершит отправку
+            if attempt < self.max_retries and breaker.state != OPEN:
                 wait_time = self.retry_backoff * (2 ** attempt)
-                logger.info(f"⏳ Повторная попытка через {wait_time}с...")
+                logger.info("⏳ Повторная попытка через %sс...", wait_time)
                 await asyncio.sleep(wait_time)
         
-        logger.error(f"❌ Не удалось отправить payload на {webhook_url} после {self.max_retries + 1} попыток")
+        WEBHOOK_DELIVERIES.inc(service=service, result="failed")
+        logger.error("❌ Не удалось отправить %s на %s после %d попыток", what, webhook_url, self.max_retries + 1)
         return False
     
-    async def send_ping(self, webhook_url: str) -> bool:
-        """Отправить ping на вебхук."""
-        ping_data = {"ping": "ok"}
+    def encode_payload(self, payload: WebhookPayload) -> bytes:
+        """JSON-тело запроса для payload с учётом WEBHOOK_MODE."""
+        if config.WEBHOOK_MODE == "urls_only":
+            # Отправляем только URLs
+            urls_payload = UrlsOnlyPayload(
+                service=payload.service,
+                download_urls=payload.download_urls
+            )
+            return encode_model(urls_payload)
+        # Отправляем полный payload
+        return encode_model(payload)
+    
+    def build_texts_payload(
+        self,
+        texts: list[str],
+        service: str,
+        chat: dict,
+        from_: dict,
+        placement: Optional[str] = None,
+        batch: Optional[BatchInfo] = None
+    ) -> TextsPayload:
+        """Собрать payload с текстами и контекстом чата."""
+        return TextsPayload(
+            service=service, 
+            texts=texts, 
+            chat_id=chat.get("chat_id"), 
+            chat=chat, 
+            from_=from_,
+            placement=placement,
+            batch=batch
+        )
+    
+    def build_texts_chunks(
+        self,
+        texts: list[str],
+        service: str,
+        chat: dict,
+        from_: dict,
+        batch_id: str,
+        placement: Optional[str] = None
+    ) -> List[TextsPayload]:
+        """Разбить тексты на payload-чанки с batch/seq/total.
+        
+        Размер чанка ограничен TEXTS_CHUNK_MAX_COUNT и TEXTS_CHUNK_MAX_BYTES.
+        """
+        chunks = chunk_texts(texts, config.TEXTS_CHUNK_MAX_COUNT, config.TEXTS_CHUNK_MAX_BYTES)
+        return [
+            self.build_texts_payload(
+                chunk, service, chat, from_, placement,
+                batch=BatchInfo(batch_id=batch_id, seq=seq, total=len(chunks), grouping="texts")
+            )
+            for seq, chunk in enumerate(chunks, 1)
+        ]
+    
+    async def send_payload(
+        self, 
+        payload: WebhookPayload, 
+        webhook_url: str,
+        idempotency_key: Optional[str] = None,
+        body: Optional[bytes] = None
+    ) -> bool:
+        """Отправить payload на вебхук.
         
+        body — уже сериализованный encode_payload(payload), чтобы не
+        сериализовать payload повторно.
+        """
+        return await self._send_with_retries(
+            webhook_url,
+            self._headers(idempotency_key),
+            body if body is not None else self.encode_payload(payload),
+            "payload",
+            "Payload успешно отправлен"
+        )
+    
+    async def deliver(self, webhook_url: str, body: str, idempotency_key: Optional[str] = None) -> bool:
+        """Одна попытка отправки готового JSON-тела (без повторов).
+        
+        Используется outbox-воркерами, которые сами планируют повторы
+        и сами спрашивают circuit breaker перед попыткой.
+        """
+        headers = self._headers(idempotency_key)
+        content = self._prepare_body(webhook_url, body.encode("utf-8"), headers)
+        return await self._attempt(webhook_url, headers, content)
+    
+    async def ping(self, webhook_url: str) -> Optional[int]:
+        """Отправить ping на вебхук; вернуть HTTP-статус или None при ошибке."""
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    webhook_url,
-                    json=ping_data,
-                    headers={"Content-Type": "application/json"}
-                )
-                
-                if 200 <= response.status_code < 300:
-                    logger.info(f"✅ Ping успешно отправлен на {webhook_url}")
-                    return True
-                else:
-                    logger.warning(f"⚠️ Ping вернул статус {response.status_code}: {response.text}")
-                    return False
-                    
+            response = await get_http_client().post(
+                webhook_url,
+                content=b'{"ping":"ok"}',
+                headers={"Content-Type": "application/json"},
+                timeout=self.timeout
+            )
+            return response.status_code
         except Exception as e:
-            logger.error(f"❌ Ошибка при отправке ping на {webhook_url}: {e}")
+            logger.error("❌ Ошибка при отправке ping на %s: %s", webhook_url, e)
+            return None
+    
+    async def send_ping(self, webhook_url: str) -> bool:
+        """Отправить ping на вебхук."""
+        status = await self.ping(webhook_url)
+        if status is None:
             return False
+        if 200 <= status < 300:
+            logger.info("✅ Ping успешно отправлен на %s", webhook_url)
+            return True
+        logger.warning("⚠️ Ping вернул статус %d от %s", status, webhook_url)
+        return False
     
     def generate_idempotency_key(self, batch_id: str, seq: int) -> str:
         """Сгенерировать ключ идемпотентности."""
         return f"{batch_id}.{seq}"
 
+    async def send_texts_batch(
+        self,
+        texts: list[str],
+        webhook_url: str,
+        service: str,
+        chat: dict,
+        from_: dict,
+        placement: Optional[str] = None,
+        batch_id: Optional[str] = None,
+        parallel: Optional[bool] = None
+    ) -> Tuple[int, int]:
+        """Отправить тексты чанками; вернуть (доставлено чанков, всего чанков).
+        
+        Каждый чанк повторяется независимо и получает свой ключ
+        идемпотентности batch_id.seq. При parallel чанки отправляются
+        одновременно (в пределах WEBHOOK_PARALLELISM на вебхук).
+        """
+        batch_id = batch_id or str(uuid.uuid4())
+        parallel = config.TEXTS_PARALLEL if parallel is None else parallel
+        payloads = self.build_texts_chunks(texts, service, chat, from_, batch_id, placement)
+        BATCH_CHUNKS.observe(len(payloads), kind="texts")
+        
+        async def send_chunk(payload: TextsPayload) -> bool:
+            return await self._send_with_retries(
+                webhook_url,
+                self._headers(self.generate_idempotency_key(batch_id, payload.batch.seq)),
+                encode_model(payload),
+                "тексты",
+                "Тексты успешно отправлены"
+            )
+        
+        if parallel:
+            results = await asyncio.gather(*(send_chunk(payload) for payload in payloads))
+        else:
+            results = [await send_chunk(payload) for payload in payloads]
+        
+        delivered = sum(1 for ok in results if ok)
+        if len(payloads) > 1:
+            logger.info("📦 Тексты %s: доставлено %d/%d чанков на %s", batch_id, delivered, len(payloads), webhook_url)
+        return delivered, len(payloads)
+
     async def send_texts(
         self,
         texts: list[str],
@@ -111,47 +476,10 @@ class WebhookClient:
         chat: dict,
         from_: dict,
         placement: Optional[str] = None,
-        idempotency_key: Optional[str] = None
+        batch_id: Optional[str] = None
     ) -> bool:
-        """Отправить массив текстов на вебхук."""
-        payload = TextsPayload(
-            service=service, 
-            texts=texts, 
-            chat_id=chat.get("chat_id"), 
-            chat=chat, 
-            from_=from_,
-            placement=placement
+        """Отправить массив текстов на вебхук (True, если доставлены все чанки)."""
+        delivered, total = await self.send_texts_batch(
+            texts, webhook_url, service, chat, from_, placement, batch_id
         )
-        headers = {
-            "Content-Type": "application/json",
-            "User-Agent": "TelegramBot/1.0"
-        }
-        if idempotency_key:
-            headers["X-Idempotency-Key"] = idempotency_key
-        for attempt in range(self.max_retries + 1):
-            try:
-                async with httpx.AsyncClient(timeout=self.timeout) as client:
-                    response = await client.post(
-                        webhook_url,
-                        json=payload.model_dump(by_alias=True),
-                        headers=headers
-                    )
-                    if 200 <= response.status_code < 300:
-                        logger.info(f"✅ Тексты успешно отправлены на {webhook_url}")
-                        return True
-                    else:
-                        logger.warning(
-                            f"⚠️ Неожиданный статус {response.status_code} от {webhook_url}: {response.text}"
-                        )
-            except httpx.TimeoutException:
-                logger.warning(f"⏰ Таймаут при отправке на {webhook_url} (попытка {attempt + 1})")
-            except httpx.RequestError as e:
-                logger.error(f"❌ Ошибка запроса к {webhook_url}: {e}")
-            except Exception as e:
-                logger.error(f"❌ Неожиданная ошибка при отправке на {webhook_url}: {e}")
-            if attempt < self.max_retries:
-                wait_time = self.retry_backoff * (2 ** attempt)
-                logger.info(f"⏳ Повторная попытка через {wait_time}с...")
-                await asyncio.sleep(wait_time)
-        logger.error(f"❌ Не удалось отправить тексты на {webhook_url} после {self.max_retries + 1} попыток")
-        return False
+        return delivered == total
@@ -0,0 +1,175 @@
+"""Circuit breaker: быстрый отказ при недоступном внешнем сервисе."""
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+def _caller() -> Optional[asyncio.Task]:
+    """Задача, выполняющая запрос (None вне event loop)."""
+    try:
+        return asyncio.current_task()
+    except RuntimeError:
+        return None
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Автомат closed → open → half_open → closed.
+
+    В состоянии closed запросы проходят, ошибки подряд считаются. После
+    failure_threshold ошибок breaker открывается и reset_timeout секунд
+    отклоняет запросы сразу. Затем он переходит в half_open и пропускает
+    не больше half_open_max_calls пробных запросов: успех закрывает его,
+    ошибка снова открывает. Состояние open/half_open меняет только результат
+    пробного запроса (пробу узнаём по задаче, получившей слот): ответы
+    запросов, пропущенных ещё до открытия, его не закрывают.
+    failure_threshold <= 0 выключает breaker.
+    Не потокобезопасен: рассчитан на один event loop.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        reset_timeout: float,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = max(1, half_open_max_calls)
+        self._clock = clock
+        self._state = CLOSED
+        self._opened_at = 0.0
+        # Задачи, получившие пробные слоты half_open
+        self._probes: List[Optional[asyncio.Task]] = []
+        self.failures = 0  # ошибки подряд
+        self.opened = 0  # сколько раз открывался
+        self.rejected = 0  # отклонено запросов
+
+    @property
+    def enabled(self) -> bool:
+        return self.failure_threshold > 0
+
+    @property
+    def state(self) -> str:
+        """Текущее состояние (open по истечении reset_timeout становится half_open)."""
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def retry_after(self) -> float:
+        """Через сколько секунд breaker пропустит пробный запрос (0 — уже пропускает)."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout - self._clock())
+
+    def allow_request(self) -> bool:
+        """Можно ли выполнить запрос сейчас. В half_open занимает пробный слот."""
+        if not self.enabled:
+            return True
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and len(self._probes) < self.half_open_max_calls:
+            self._probes.append(_caller())
+            return True
+        self.rejected += 1
+        return False
+
+    def release(self) -> None:
+        """Вернуть пробный слот half_open без результата (запрос отменён)."""
+        self._take_probe()
+
+    def _take_probe(self) -> bool:
+        """Освободить пробный слот текущей задачи; False, если запрос не пробный."""
+        caller = _caller()
+        if self._state == HALF_OPEN and caller in self._probes:
+            self._probes.remove(caller)
+            return True
+        return False
+
+    def record_success(self) -> None:
+        """Запрос выполнен успешно."""
+        if self._state == CLOSED:
+            self.failures = 0
+        elif self._take_probe():
+            self.failures = 0
+            self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        """Запрос завершился ошибкой сервиса."""
+        if not self.enabled:
+            return
+        if self._state == CLOSED:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self._transition(OPEN)
+        elif self._take_probe():
+            self.failures += 1
+            self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        previous, self._state = self._state, state
+        self._probes = []
+        if state == OPEN:
+            self._opened_at = self._clock()
+            self.opened += 1
+            logger.warning(
+                "🚫 Circuit breaker %s: %s → open (%d ошибок подряд, пауза %sс)",
+                self.name, previous, self.failures, self.reset_timeout
+            )
+        elif state == HALF_OPEN:
+            logger.info("🔸 Circuit breaker %s: open → half_open, пробный запрос", self.name)
+        else:
+            logger.info("✅ Circuit breaker %s: %s → closed", self.name, previous)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+class CircuitBreakerRegistry:
+    """Breaker на каждый ключ (например, URL вебхука), создаётся при первом обращении."""
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        reset_timeout: float,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = self._breakers[name] = CircuitBreaker(
+                name, self.failure_threshold, self.reset_timeout, self.half_open_max_calls, self._clock
+            )
+        return breaker
+
+    def find(self, name: str) -> Optional[CircuitBreaker]:
+        return self._breakers.get(name)
+
+    def clear(self) -> None:
+        self._breakers.clear()
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        """Состояние и счётчики всех breaker'ов."""
+        return {name: breaker.stats() for name, breaker in self._breakers.items()}
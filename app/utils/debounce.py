@@ -0,0 +1,133 @@
+"""Адаптивные окна debounce по наблюдаемым интервалам между сообщениями."""
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Hashable, Optional, Tuple
+from app.utils.cache import TTLCache
+from app.utils.stats import LatencyWindow
+
+# Сколько интервалов нужно увидеть, прежде чем доверять оценке
+MIN_SAMPLES = 10
+
+
+class GapEstimator:
+    """Последние интервалы между сообщениями буфера.
+
+    window() = MARGIN * наибольший из последних интервалов: окно сжимается
+    к темпу, с которым пользователь реально присылает фото, а единичный
+    долгий интервал сразу его расширяет.
+    """
+
+    MARGIN = 3.0
+
+    def __init__(self, maxlen: int = 32):
+        self._gaps: Deque[float] = deque(maxlen=maxlen)
+
+    @property
+    def samples(self) -> int:
+        return len(self._gaps)
+
+    def add(self, gap: float) -> None:
+        self._gaps.append(gap)
+
+    def window(self) -> Optional[float]:
+        if len(self._gaps) < MIN_SAMPLES:
+            return None
+        return self.MARGIN * max(self._gaps)
+
+
+class AdaptiveDebounce:
+    """Окно ожидания для буфера (альбом, burst) по статистике пользователя.
+
+    Для каждого вида буфера и пользователя копятся интервалы между
+    сообщениями одного буфера; окно — оценка GapEstimator в границах
+    [min_window, default]. Пока у пользователя мало наблюдений, окно
+    равно default: чужой темп не переносится на медленных отправителей,
+    и первые альбомы не разрываются. Интервалы длиннее
+    default не учитываются: такие сообщения всё равно попали бы в разные
+    буферы. Если после сброса приходит ещё одно фото того же альбома,
+    это считается разрывом альбома; его интервал попадает в оценку и
+    расширяет окно.
+
+    Время сброса (от первого сообщения буфера) копится в flush_latency
+    по видам буферов. Не потокобезопасен: рассчитан на один event loop.
+    """
+
+    def __init__(
+        self,
+        min_window: float,
+        enabled: bool = True,
+        maxsize: int = 10000,
+        ttl: float = 3600,
+        clock: Callable[[], float] = time.time
+    ):
+        self.min_window = min_window
+        self.enabled = enabled
+        self._clock = clock
+        # (вид, user_id) -> GapEstimator
+        self._users = TTLCache(maxsize, ttl, clock=clock)
+        # ключ буфера -> (первое, последнее сообщение, сброшен ли буфер)
+        self._arrivals = TTLCache(maxsize, 600, clock=clock)
+        self.flush_latency: Dict[str, LatencyWindow] = {}
+        self.splits = 0
+
+    def __len__(self) -> int:
+        """Записей в памяти: пользователи с историей и недавние буферы."""
+        return len(self._users) + len(self._arrivals)
+
+    def expire(self) -> int:
+        """Удалить просроченные записи; вернуть их количество."""
+        return self._users.expire() + self._arrivals.expire()
+
+    def window(self, kind: str, user_id: Hashable, default: float) -> float:
+        """Окно ожидания после очередного сообщения, секунды."""
+        if not self.enabled:
+            return default
+        estimate = None
+        estimator = self._users.get((kind, user_id))
+        if estimator is not None:
+            estimate = estimator.window()
+        if estimate is None:
+            return default
+        return max(min(self.min_window, default), min(default, estimate))
+
+    def observe(self, key: str, user_id: Hashable, default: float) -> None:
+        """Учесть приход сообщения в буфер key (вид — префикс ключа)."""
+        kind = key.partition(":")[0]
+        now = self._clock()
+        previous: Optional[Tuple[float, float, bool]] = self._arrivals.get(key)
+        if previous is None:
+            self._arrivals.set(key, (now, now, False))
+            return
+        first_at, last_at, flushed = previous
+        gap = now - last_at
+        if flushed:
+            if kind == "album":
+                self.splits += 1
+            first_at = now
+        self._arrivals.set(key, (first_at, now, False))
+        if gap > default:
+            return
+        estimator = self._users.get((kind, user_id)) or GapEstimator()
+        estimator.add(gap)
+        # set продлевает TTL активного пользователя
+        self._users.set((kind, user_id), estimator)
+
+    def flushed(self, key: str) -> Optional[float]:
+        """Отметить сброс буфера; вернуть время от первого сообщения до сброса."""
+        entry = self._arrivals.get(key)
+        if entry is None or entry[2]:
+            return None
+        first_at, last_at, _ = entry
+        self._arrivals.set(key, (first_at, last_at, True))
+        latency = self._clock() - first_at
+        kind = key.partition(":")[0]
+        self.flush_latency.setdefault(kind, LatencyWindow()).add(latency)
+        return latency
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "users": len(self._users),
+            "splits": self.splits,
+            "flush_latency": {kind: window.summary() for kind, window in self.flush_latency.items()},
+        }
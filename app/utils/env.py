@@ -1,6 +1,6 @@
 """Конфигурация приложения."""
 import os
-from typing import List, Optional
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
 
 # Загружаем переменные окружения
@@ -34,18 +34,105 @@ class Config:
     # HTTP settings
     HTTP_TIMEOUT_SECONDS: int = int(os.getenv("HTTP_TIMEOUT_SECONDS", "25"))
     MAX_RETRIES: int = int(os.getenv("MAX_RETRIES", "3"))
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    HTTP_KEEPALIVE_EXPIRY_SECS: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECS", "30"))
+    WEBHOOK_PARALLELISM: int = int(os.getenv("WEBHOOK_PARALLELISM", "3"))
+    TEXTS_CHUNK_MAX_COUNT: int = int(os.getenv("TEXTS_CHUNK_MAX_COUNT", "500"))
+    TEXTS_CHUNK_MAX_BYTES: int = int(os.getenv("TEXTS_CHUNK_MAX_BYTES", str(256 * 1024)))
+    TEXTS_PARALLEL: bool = os.getenv("TEXTS_PARALLEL", "true").lower() in ("1", "true", "yes")
+    # Сжатие тела запроса: "drive=gzip,prokat_text=zstd" (ключ * — все вебхуки)
+    WEBHOOK_COMPRESSION: Dict[str, str] = {
+        key.strip(): codec.strip().lower()
+        for key, _, codec in (
+            item.partition("=") for item in os.getenv("WEBHOOK_COMPRESSION", "").split(",")
+        )
+        if key.strip() and codec.strip().lower() in ("gzip", "zstd")
+    }
+    WEBHOOK_COMPRESSION_MIN_BYTES: int = int(os.getenv("WEBHOOK_COMPRESSION_MIN_BYTES", "1024"))
+    WEBHOOK_GZIP_LEVEL: int = int(os.getenv("WEBHOOK_GZIP_LEVEL", "6"))
+    WEBHOOK_ZSTD_LEVEL: int = int(os.getenv("WEBHOOK_ZSTD_LEVEL", "3"))
+    HTTP2_ENABLED: bool = os.getenv("HTTP2_ENABLED", "false").lower() in ("1", "true", "yes")
+    # Circuit breaker на URL вебхука (0 ошибок — выключен)
+    CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_RESET_TIMEOUT_SECS: float = float(os.getenv("CIRCUIT_RESET_TIMEOUT_SECS", "30"))
+    CIRCUIT_HALF_OPEN_MAX_CALLS: int = int(os.getenv("CIRCUIT_HALF_OPEN_MAX_CALLS", "1"))
+    HEALTH_PROBE_INTERVAL_SECS: float = float(os.getenv("HEALTH_PROBE_INTERVAL_SECS", "0"))
+    
+    # Outbox: доставка на вебхуки фоновыми воркерами
+    OUTBOX_ENABLED: bool = os.getenv("OUTBOX_ENABLED", "false").lower() in ("1", "true", "yes")
+    OUTBOX_WORKERS: int = int(os.getenv("OUTBOX_WORKERS", "4"))
+    OUTBOX_MAX_ATTEMPTS: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+    OUTBOX_POLL_INTERVAL_SECS: float = float(os.getenv("OUTBOX_POLL_INTERVAL_SECS", "1.0"))
+    OUTBOX_MAX_BACKOFF_SECS: float = float(os.getenv("OUTBOX_MAX_BACKOFF_SECS", "300"))
+    # Сколько хранить доставленные и неуспешные записи outbox (по умолчанию неделя)
+    OUTBOX_RETENTION_SECS: float = float(os.getenv("OUTBOX_RETENTION_SECS", "604800"))
+    
+    # Telegram files
+    TG_FILES_CONCURRENCY: int = int(os.getenv("TG_FILES_CONCURRENCY", "5"))
+    TG_FILE_CACHE_SIZE: int = int(os.getenv("TG_FILE_CACHE_SIZE", "5000"))
+    TG_FILE_CACHE_TTL_SECS: float = float(os.getenv("TG_FILE_CACHE_TTL_SECS", "3300"))
+    
+    # Excel
+    EXCEL_WORKERS: int = int(os.getenv("EXCEL_WORKERS", "2"))
+    EXCEL_BATCH_SIZE: int = int(os.getenv("EXCEL_BATCH_SIZE", "1000"))
+    EXCEL_SPOOL_MAX_MEMORY: int = int(os.getenv("EXCEL_SPOOL_MAX_MEMORY", str(8 * 1024 * 1024)))
+    
+    # Preferences cache
+    PREFS_CACHE_SIZE: int = int(os.getenv("PREFS_CACHE_SIZE", "10000"))
+    PREFS_CACHE_TTL_SECS: float = float(os.getenv("PREFS_CACHE_TTL_SECS", "3600"))
+    PREFS_CACHE_WARM: bool = os.getenv("PREFS_CACHE_WARM", "false").lower() in ("1", "true", "yes")
+    # Потолок TTL при STATE_BACKEND=sqlite: кэш локален для процесса, и /service
+    # или /placement на другой реплике видны здесь не позже чем через столько секунд
+    PREFS_CACHE_SHARED_TTL_SECS: float = float(os.getenv("PREFS_CACHE_SHARED_TTL_SECS", "5"))
     
     # Logging
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    # text — строки для человека, json — по объекту JSON на строку
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text").lower()
+    # Писать логи из фонового потока через очередь, не блокируя event loop
+    LOG_QUEUE_ENABLED: bool = os.getenv("LOG_QUEUE_ENABLED", "true").lower() in ("1", "true", "yes")
+    
+    # Метрики Prometheus на локальном порту (GET /metrics)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
+    METRICS_HOST: str = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", "9100"))
+    
+    # Мониторинг event loop: период замера задержки, порог предупреждения
+    # о задержке и порог медленного колбэка (0 — выключено)
+    LOOP_LAG_INTERVAL_SECS: float = float(os.getenv("LOOP_LAG_INTERVAL_SECS", "0.5"))
+    LOOP_LAG_WARN_SECS: float = float(os.getenv("LOOP_LAG_WARN_SECS", "0.1"))
+    # Детектор подменяет asyncio.Handle._run — включается только для диагностики
+    SLOW_CALLBACK_SECS: float = float(os.getenv("SLOW_CALLBACK_SECS", "0"))
+    
+    # Хранилище буферов и FSM: memory (одна реплика) или sqlite (общее для реплик)
+    STATE_BACKEND: str = os.getenv("STATE_BACKEND", "memory")
+    # Очистка состояния в памяти и размер кэша инфо-сообщений бота
+    STATE_SWEEP_INTERVAL_SECS: float = float(os.getenv("STATE_SWEEP_INTERVAL_SECS", "60"))
+    INFO_MESSAGE_CACHE_SIZE: int = int(os.getenv("INFO_MESSAGE_CACHE_SIZE", "10000"))
     
     # Batching settings
     MAX_CREATIVES_PER_BATCH: int = int(os.getenv("MAX_CREATIVES_PER_BATCH", "10"))
     BURST_DEBOUNCE_SECS: float = float(os.getenv("BURST_DEBOUNCE_SECS", "2.0"))
     BURST_HARDCAP_SECS: float = float(os.getenv("BURST_HARDCAP_SECS", "3.5"))
+    # Окно ожидания подстраивается под интервалы между фото пользователя
+    ADAPTIVE_DEBOUNCE_ENABLED: bool = os.getenv("ADAPTIVE_DEBOUNCE_ENABLED", "false").lower() in ("1", "true", "yes")
+    DEBOUNCE_MIN_SECS: float = float(os.getenv("DEBOUNCE_MIN_SECS", "0.6"))
     
     # Webhook mode
     WEBHOOK_MODE: str = os.getenv("WEBHOOK_MODE", "rich")
     
+    # Получение обновлений Telegram: polling или webhook
+    UPDATE_MODE: str = os.getenv("UPDATE_MODE", "polling")
+    BOT_WEBHOOK_URL: str = os.getenv("BOT_WEBHOOK_URL", "")
+    BOT_WEBHOOK_SECRET: str = os.getenv("BOT_WEBHOOK_SECRET", "")
+    BOT_WEBHOOK_HOST: str = os.getenv("BOT_WEBHOOK_HOST", "0.0.0.0")
+    BOT_WEBHOOK_PORT: int = int(os.getenv("BOT_WEBHOOK_PORT", "8080"))
+    BOT_WEBHOOK_PATH: str = os.getenv("BOT_WEBHOOK_PATH", "/telegram/webhook")
+    BOT_WEBHOOK_MAX_CONNECTIONS: int = int(os.getenv("BOT_WEBHOOK_MAX_CONNECTIONS", "40"))
+    UPDATE_WORKERS: int = int(os.getenv("UPDATE_WORKERS", "16"))
+    UPDATE_QUEUE_SIZE: int = int(os.getenv("UPDATE_QUEUE_SIZE", "1000"))
+    
     @classmethod
     def get_webhook_url(cls, service: str) -> Optional[str]:
         """Получить URL вебхука для сервиса."""
@@ -68,6 +155,26 @@ class Config:
             return cls.WEBHOOK_PROKAT_TEXT
         return None
     
+    @classmethod
+    def get_webhook_name(cls, webhook_url: str) -> Optional[str]:
+        """Имя вебхука по URL: drive, drive_text, samokaty, ... или None."""
+        for service in ("drive", "samokaty", "prokat"):
+            if webhook_url == cls.get_webhook_url(service):
+                return service
+            if webhook_url == cls.get_text_webhook_url(service):
+                return f"{service}_text"
+        return None
+    
+    @classmethod
+    def get_webhook_compression(cls, webhook_url: str) -> Optional[str]:
+        """Получить кодек сжатия (gzip/zstd) для URL вебхука или None."""
+        if not cls.WEBHOOK_COMPRESSION:
+            return None
+        name = cls.get_webhook_name(webhook_url)
+        if name in cls.WEBHOOK_COMPRESSION:
+            return cls.WEBHOOK_COMPRESSION[name]
+        return cls.WEBHOOK_COMPRESSION.get("*")
+    
     @classmethod
     def validate(cls) -> bool:
         """Проверить корректность конфигурации."""
@@ -79,6 +186,14 @@ class Config:
             raise ValueError("WEBHOOK_SAMOKATY не установлен")
         if not cls.WEBHOOK_PROKAT:
             raise ValueError("WEBHOOK_PROKAT не установлен")
+        if cls.STATE_BACKEND not in ("memory", "sqlite"):
+            raise ValueError("STATE_BACKEND должен быть memory или sqlite")
+        if cls.UPDATE_MODE not in ("polling", "webhook"):
+            raise ValueError("UPDATE_MODE должен быть polling или webhook")
+        if cls.LOG_FORMAT not in ("text", "json"):
+            raise ValueError("LOG_FORMAT должен быть text или json")
+        if cls.UPDATE_MODE == "webhook" and not cls.BOT_WEBHOOK_SECRET:
+            raise ValueError("BOT_WEBHOOK_SECRET не установлен (обязателен при UPDATE_MODE=webhook)")
         return True
 
 # Создаем глобальный экземпляр конфигурации
@@ -1,47 +1,141 @@
 """Настройка логирования."""
+import atexit
+import json
 import logging
+import queue
 import re
-from typing import Any, Dict
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
 from app.utils.env import config
 
+# Токен бота в URL Bot API: bot<id>:<secret>
+TOKEN_PATTERN = re.compile(r'bot[0-9]+:[A-Za-z0-9_-]+')
+
+# Фоновый поток записи логов (см. setup_logging)
+_listener: Optional[QueueListener] = None
+
+
+def mask_tokens(text: str) -> str:
+    """Заменить токены бота в тексте на маску."""
+    # Подстрока "bot" есть не во всех строках — без неё регулярка не нужна
+    if "bot" not in text:
+        return text
+    return TOKEN_PATTERN.sub('bot***MASKED***', text)
+
+
 class TokenMaskingFormatter(logging.Formatter):
     """Форматтер для маскировки токенов в логах."""
-    
+
     def format(self, record: logging.LogRecord) -> str:
         """Форматировать запись лога с маскировкой токенов."""
-        msg = super().format(record)
-        
-        # Маскируем токен бота в URL
-        token_pattern = r'bot[0-9]+:[A-Za-z0-9_-]+'
-        msg = re.sub(token_pattern, 'bot***MASKED***', msg)
-        
-        return msg
+        return mask_tokens(super().format(record))
 
-def setup_logging() -> None:
-    """Настроить логирование."""
-    # Создаем форматтер
-    formatter = TokenMaskingFormatter(
+
+class JsonFormatter(logging.Formatter):
+    """Запись лога одной JSON-строкой (для сборщиков логов), токены маскируются."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return mask_tokens(json.dumps(entry, ensure_ascii=False))
+
+
+class LogQueueHandler(QueueHandler):
+    """QueueHandler, который в вызывающем потоке только подставляет аргументы.
+
+    Стандартный prepare форматирует запись целиком и копирует её, чтобы
+    передать в другой процесс; очередь здесь внутри процесса, поэтому
+    достаточно зафиксировать текст сообщения, пока аргументы не изменились.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def create_formatter(log_format: Optional[str] = None) -> logging.Formatter:
+    """Форматтер для LOG_FORMAT: text или json."""
+    if (log_format or config.LOG_FORMAT) == "json":
+        return JsonFormatter()
+    return TokenMaskingFormatter(
         fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
-    
+
+
+def setup_logging() -> None:
+    """Настроить логирование.
+
+    При LOG_QUEUE_ENABLED обработчик корневого логгера только кладёт
+    запись в очередь (в вызывающем потоке подставляются лишь аргументы
+    сообщения), а форматирование, маскировка токенов и запись в stderr
+    выполняются фоновым потоком QueueListener и не блокируют event loop.
+    """
+    global _listener
+    shutdown_logging()
+
+    # Консольный обработчик с форматтером
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(create_formatter())
+
     # Настраиваем корневой логгер
     root_logger = logging.getLogger()
     root_logger.setLevel(getattr(logging, config.LOG_LEVEL.upper()))
-    
+
     # Удаляем существующие обработчики
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
-    
-    # Создаем консольный обработчик
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
-    
+
+    if config.LOG_QUEUE_ENABLED:
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        root_logger.addHandler(LogQueueHandler(log_queue))
+        _listener = QueueListener(log_queue, console_handler, respect_handler_level=True)
+        _listener.start()
+    else:
+        root_logger.addHandler(console_handler)
+
     # Настраиваем логгеры для внешних библиотек
     logging.getLogger("httpx").setLevel(logging.WARNING)
     logging.getLogger("aiogram").setLevel(logging.INFO)
 
+
+def shutdown_logging() -> None:
+    """Дописать записи из очереди и остановить фоновый поток логов.
+
+    Корневой логгер снова пишет напрямую в обработчики слушателя: записи,
+    сделанные после остановки (закрытие event loop и пулов), не теряются
+    в очереди, которую никто не читает.
+    """
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    root_logger = logging.getLogger()
+    for handler in root_logger.handlers[:]:
+        if isinstance(handler, LogQueueHandler):
+            root_logger.removeHandler(handler)
+            for target in listener.handlers:
+                root_logger.addHandler(target)
+    # Остановка дописывает записи, успевшие попасть в очередь
+    listener.stop()
+
+
+# Записи, оставшиеся в очереди при выходе, не теряются
+atexit.register(shutdown_logging)
+
+
 def get_logger(name: str) -> logging.Logger:
     """Получить логгер с указанным именем."""
     return logging.getLogger(name)
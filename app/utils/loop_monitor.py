@@ -0,0 +1,170 @@
+"""Мониторинг event loop: задержка цикла и медленные колбэки."""
+import asyncio
+import os
+import time
+from typing import Callable, Dict, List, Optional
+from app.utils.env import config
+from app.utils.logging import get_logger
+from app.utils.metrics import counter, gauge, histogram, registry
+from app.utils.stats import LatencyWindow
+
+logger = get_logger(__name__)
+
+LOOP_LAG_SECONDS = histogram(
+    "event_loop_lag_seconds", "Опоздание пробуждения таймера event loop",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+LOOP_LAG_QUANTILE = gauge("event_loop_lag_quantile_seconds", "Перцентили задержки event loop за окно", ["quantile"])
+SLOW_CALLBACKS = counter("event_loop_slow_callbacks_total", "Колбэки, заблокировавшие event loop дольше порога")
+
+_ASYNCIO_DIR = os.path.dirname(asyncio.__file__)
+
+
+def _await_chain(coro) -> List[object]:
+    """Цепочка ожидающих друг друга корутин и генераторов, от внешней к внутренней."""
+    chain = []
+    while coro is not None and len(chain) < 64:
+        chain.append(coro)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return chain
+
+
+def describe_callback(callback: Callable) -> str:
+    """Описание колбэка: для шага задачи — задача, её корутина и место остановки.
+
+    После шага корутина стоит на следующем await, поэтому указанная
+    строка — первая точка ожидания после блокирующего кода.
+    """
+    owner = getattr(callback, "__self__", None)
+    if isinstance(owner, asyncio.Task):
+        chain = _await_chain(owner.get_coro())
+        names = [getattr(c, "__qualname__", type(c).__name__) for c in chain]
+        frames = [
+            f for f in (getattr(c, "cr_frame", None) or getattr(c, "gi_frame", None) for c in chain)
+            if f is not None and not f.f_code.co_filename.startswith(_ASYNCIO_DIR)
+        ]
+        where = f" ({frames[-1].f_code.co_filename}:{frames[-1].f_lineno})" if frames else ""
+        # Внешние корутины aiogram малоинформативны — показываем хвост цепочки
+        return f"задача {owner.get_name()}: {' → '.join(names[-3:])}{where}"
+    return getattr(callback, "__qualname__", None) or repr(callback)
+
+
+class LoopMonitor:
+    """Сэмплер задержки event loop и детектор медленных колбэков.
+
+    Сэмплер раз в interval секунд засыпает на interval и измеряет, насколько
+    позже он проснулся: это время, на которое цикл был занят чужим кодом.
+    Детектор оборачивает asyncio.Handle._run и замеряет каждый колбэк
+    (шаг задачи, call_soon, таймер); если колбэк выполнялся дольше
+    slow_callback секунд, в лог пишется, какая задача и корутина его
+    заняла. Обёртка стоит два вызова perf_counter на колбэк, действует
+    на все event loop процесса и опирается на приватный Handle._run
+    стандартного asyncio (с uvloop не работает), поэтому детектор выключен
+    по умолчанию и включается SLOW_CALLBACK_SECS для диагностики.
+    """
+
+    def __init__(
+        self,
+        interval: Optional[float] = None,
+        lag_threshold: Optional[float] = None,
+        slow_callback: Optional[float] = None,
+        window: Optional[LatencyWindow] = None
+    ):
+        self.interval = config.LOOP_LAG_INTERVAL_SECS if interval is None else interval
+        self.lag_threshold = config.LOOP_LAG_WARN_SECS if lag_threshold is None else lag_threshold
+        self.slow_callback = config.SLOW_CALLBACK_SECS if slow_callback is None else slow_callback
+        self.lag = window or LatencyWindow()
+        self.slow_callbacks = 0
+        self.worst_callback: Optional[str] = None
+        self.worst_duration = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._original_run: Optional[Callable] = None
+
+    async def _sample(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.lag.add(lag)
+            LOOP_LAG_SECONDS.observe(lag)
+            if self.lag_threshold and lag >= self.lag_threshold:
+                logger.warning(f"🐢 Event loop задержан на {lag * 1000:.0f} мс")
+
+    def report_slow(self, description: str, duration: float) -> None:
+        """Учесть колбэк, выполнявшийся duration секунд."""
+        self.slow_callbacks += 1
+        SLOW_CALLBACKS.inc()
+        if duration > self.worst_duration:
+            self.worst_duration = duration
+            self.worst_callback = description
+        logger.warning(f"🐢 Колбэк занял event loop на {duration * 1000:.0f} мс: {description}")
+
+    def install_slow_callback_detector(self) -> None:
+        """Начать замерять колбэки event loop (вызывается из работающего цикла)."""
+        if self._original_run is not None or self.slow_callback <= 0:
+            return
+        if not isinstance(asyncio.get_running_loop(), asyncio.BaseEventLoop):
+            # uvloop не использует asyncio.Handle — обёртка ничего бы не замеряла
+            logger.warning("⚠️ SLOW_CALLBACK_SECS работает только со стандартным event loop asyncio, детектор не включён")
+            return
+        original = self._original_run = asyncio.Handle._run
+        threshold = self.slow_callback
+        clock = time.perf_counter
+        monitor = self
+
+        def _run(handle: asyncio.Handle) -> None:
+            started = clock()
+            original(handle)
+            duration = clock() - started
+            if duration >= threshold:
+                try:
+                    monitor.report_slow(describe_callback(handle._callback), duration)
+                except Exception:
+                    pass
+
+        asyncio.Handle._run = _run
+
+    def uninstall_slow_callback_detector(self) -> None:
+        """Вернуть исходный Handle._run."""
+        if self._original_run is not None:
+            asyncio.Handle._run = self._original_run
+            self._original_run = None
+
+    def start(self) -> None:
+        """Запустить сэмплер и детектор."""
+        self.install_slow_callback_detector()
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._sample(), name="loop-lag-monitor")
+            slow = f"медленный колбэк от {self.slow_callback * 1000:.0f} мс" if self._original_run else "детектор колбэков выключен"
+            logger.info(
+                f"✅ Мониторинг event loop запущен (замер каждые {self.interval}с, "
+                f"порог задержки {self.lag_threshold * 1000:.0f} мс, {slow})"
+            )
+
+    async def stop(self) -> None:
+        """Остановить сэмплер и снять обёртку колбэков."""
+        self.uninstall_slow_callback_detector()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def collect_metrics(self) -> None:
+        summary = self.lag.summary()
+        for quantile, key in (("0.5", "p50"), ("0.95", "p95"), ("0.99", "p99"), ("1", "max")):
+            if summary[key] is not None:
+                LOOP_LAG_QUANTILE.set(summary[key], quantile=quantile)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "lag": self.lag.summary(),
+            "slow_callbacks": self.slow_callbacks,
+            "worst_callback": self.worst_callback,
+            "worst_duration": self.worst_duration,
+        }
+
+
+# Монитор процесса; запускается в main
+loop_monitor = LoopMonitor()
+registry.add_collector(loop_monitor.collect_metrics)
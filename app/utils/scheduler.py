@@ -0,0 +1,123 @@
+"""Планировщик сроков на куче: один цикл вместо задачи на каждый таймер."""
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class DeadlineScheduler:
+    """Сроки по ключам (пользователь, альбом) в одной куче.
+
+    schedule(key, when, callback) заменяет срок ключа за O(log n): новая
+    запись кладётся в кучу, а устаревшие пропускаются при извлечении.
+    Одна фоновая задача спит до ближайшего срока и вызывает callback()
+    наступивших ключей; если callback вернул корутину, она запускается
+    отдельной задачей. Рассчитан на один event loop.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self._clock = clock
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._entries: Dict[Hashable, Tuple[float, int, Callable[[], Any]]] = {}
+        self._seq = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._running: Set[asyncio.Task] = set()
+        self.scheduled = 0
+        self.fired = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def deadline(self, key: Hashable) -> Optional[float]:
+        """Текущий срок ключа или None."""
+        entry = self._entries.get(key)
+        return entry[0] if entry else None
+
+    def schedule(self, key: Hashable, when: float, callback: Callable[[], Any]) -> None:
+        """Установить (или перенести) срок ключа."""
+        seq = next(self._seq)
+        self._entries[key] = (when, seq, callback)
+        heapq.heappush(self._heap, (when, seq, key))
+        self.scheduled += 1
+        self._ensure_running()
+        # Будим цикл, только если срок стал ближайшим
+        if self._heap[0][1] == seq:
+            self._wakeup.set()
+
+    def cancel(self, key: Hashable) -> bool:
+        """Отменить срок ключа (запись в куче станет устаревшей)."""
+        return self._entries.pop(key, None) is not None
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run(), name="deadline-scheduler")
+
+    def _pop_due(self, now: float) -> List[Callable[[], Any]]:
+        """Извлечь наступившие сроки, пропуская устаревшие записи."""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, seq, key = heapq.heappop(self._heap)
+            entry = self._entries.get(key)
+            if entry is None or entry[1] != seq:
+                continue
+            del self._entries[key]
+            due.append(entry[2])
+        # Устаревших записей стало много — пересобираем кучу
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [(when, seq, key) for key, (when, seq, _) in self._entries.items()]
+            heapq.heapify(self._heap)
+        return due
+
+    def _fire(self, callback: Callable[[], Any]) -> None:
+        self.fired += 1
+        try:
+            result = callback()
+        except Exception as e:
+            logger.error(f"❌ Ошибка в обработчике срока: {e}")
+            return
+        if asyncio.iscoroutine(result):
+            task = asyncio.create_task(result)
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            for callback in self._pop_due(self._clock()):
+                self._fire(callback)
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            delay = self._heap[0][0] - self._clock()
+            if delay <= 0:
+                continue
+            try:
+                async with asyncio.timeout(delay):
+                    await self._wakeup.wait()
+            except TimeoutError:
+                pass
+
+    async def stop(self) -> None:
+        """Остановить цикл планировщика (сроки остаются в памяти)."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._entries),
+            "heap_size": len(self._heap),
+            "scheduled": self.scheduled,
+            "fired": self.fired,
+            "running_callbacks": len(self._running),
+        }
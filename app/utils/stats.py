@@ -0,0 +1,48 @@
+"""Скользящие окна значений и перцентили."""
+import math
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional
+
+
+def percentile(values: Iterable[float], q: float) -> Optional[float]:
+    """Перцентиль q (0..100) методом ближайшего ранга."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class LatencyWindow:
+    """Последние N измерений (например, задержек в секундах) с перцентилями."""
+
+    def __init__(self, maxlen: int = 1000):
+        self._values: Deque[float] = deque(maxlen=maxlen)
+        self.count = 0
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def add(self, value: float) -> None:
+        """Добавить измерение."""
+        self._values.append(value)
+        self.count += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Перцентиль по текущему окну."""
+        return percentile(self._values, q)
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        """Количество измерений и основные перцентили окна."""
+        ordered = sorted(self._values)
+
+        def pick(q: float) -> Optional[float]:
+            return percentile(ordered, q)
+
+        return {
+            "count": self.count,
+            "p50": pick(50),
+            "p95": pick(95),
+            "p99": pick(99),
+            "max": ordered[-1] if ordered else None,
+        }
@@ -0,0 +1,99 @@
+"""Бенчмарк сжатия тела запроса: байты на проводе и CPU на payload.
+
+Для payload с креативами (1/10/100) и текстов (100/1000/10000 строк)
+печатает исходный размер, размер после gzip/zstd на разных уровнях
+и время сжатия одного payload.
+
+Запуск:
+    python -m benchmarks.bench_compression [--repeat 50]
+"""
+import argparse
+import gzip
+import time
+from typing import Callable, List, Tuple
+from app.models.payload import BatchInfo, ChatInfo, Creative, MessageInfo, TextsPayload, UserInfo, WebhookPayload
+from app.services.webhook_client import encode_model
+
+TOKEN = "1234567890:AAH-Sample_Token_For_Benchmarks_1234567"
+
+
+def make_webhook_payload_model(creatives: int) -> WebhookPayload:
+    """Payload с креативами и длинными URL Telegram."""
+    items = [
+        Creative(
+            type="photo",
+            caption=f"Рекламный креатив №{i}: скидка 20% на первую поездку",
+            file_id=f"AgACAgIAAxkBAAIB{i:06d}ZmFrZV9maWxlX2lkX2Zvcl9iZW5jaG1hcms",
+            file_unique_id=f"AQAD{i:06d}",
+            file_size=120000 + i,
+            width=1080,
+            height=1350,
+            download_url=f"https://api.telegram.org/file/bot{TOKEN}/photos/file_{i}.jpg",
+        )
+        for i in range(creatives)
+    ]
+    return WebhookPayload(
+        service="drive",
+        chat=ChatInfo(chat_id=123456789, type="private"),
+        from_=UserInfo(user_id=123456789, username="marketing_user"),
+        message=MessageInfo(message_id=1000, date_ts=1728910000),
+        message_ids=list(range(1000, 1000 + creatives)),
+        creatives=items,
+        download_urls=[c.download_url for c in items],
+        batch=BatchInfo(batch_id="9f1c2b6e-6a0e-4b53-8d5e-3f0d6a1b2c3d", seq=1, total=1, grouping="debounce"),
+        placement="Телеграм-канал Драйва",
+    )
+
+
+def make_webhook_payload(creatives: int) -> bytes:
+    """JSON-тело payload с креативами."""
+    return encode_model(make_webhook_payload_model(creatives))
+
+
+def make_texts_payload(lines: int) -> bytes:
+    """Payload с текстами, как после разбора Excel."""
+    payload = TextsPayload(
+        service="drive",
+        texts=[f"Объявление {i}: аренда самоката от 5 ₽/мин в центре города" for i in range(lines)],
+        chat_id=123456789,
+        chat=ChatInfo(chat_id=123456789, type="private"),
+        from_=UserInfo(user_id=123456789, username="marketing_user"),
+    )
+    return encode_model(payload)
+
+
+def codecs() -> List[Tuple[str, Callable[[bytes], bytes]]]:
+    """Доступные кодеки и уровни."""
+    result = [(f"gzip-{level}", lambda b, level=level: gzip.compress(b, compresslevel=level, mtime=0)) for level in (1, 6, 9)]
+    try:
+        import zstandard  # type: ignore
+    except ImportError:
+        print("(zstandard не установлен — zstd пропущен; pip install zstandard)")
+    else:
+        for level in (1, 3, 10):
+            compressor = zstandard.ZstdCompressor(level=level)
+            result.append((f"zstd-{level}", compressor.compress))
+    return result
+
+
+def main(repeat: int) -> None:
+    payloads = [(f"creatives={n}", make_webhook_payload(n)) for n in (1, 10, 100)]
+    payloads += [(f"texts={n}", make_texts_payload(n)) for n in (100, 1000, 10000)]
+    available = codecs()
+    print(f"{'payload':<16}{'raw, B':>10}  " + "  ".join(f"{name:>22}" for name, _ in available))
+    for label, body in payloads:
+        cells = []
+        for _, compress in available:
+            started = time.perf_counter()
+            for _ in range(repeat):
+                compressed = compress(body)
+            per_call = (time.perf_counter() - started) / repeat
+            cells.append(f"{len(compressed):>8} B {per_call * 1e6:>8.0f} µs")
+        print(f"{label:<16}{len(body):>10}  " + "  ".join(f"{cell:>22}" for cell in cells))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    main(args.repeat)
@@ -0,0 +1,100 @@
+"""Бенчмарк окон debounce: фиксированные 1.5с против AdaptiveDebounce.
+
+Моделирует (в виртуальном времени, без сна) поток альбомов от пользователей
+с разными профилями: у большинства фото альбома приходят за десятки
+миллисекунд, у части — с интервалами в сотни миллисекунд и редкими
+выбросами. Альбом сбрасывается, когда окно после последнего фото истекло;
+если следующее фото пришло позже — альбом разорван.
+
+Печатает перцентили времени от первого фото до сброса и число разрывов.
+
+Запуск:
+    python -m benchmarks.bench_debounce [--users 200] [--albums 30] [--seed 1]
+"""
+import argparse
+import random
+from typing import Dict, List
+from app.utils.debounce import AdaptiveDebounce
+from app.utils.env import config
+from app.utils.stats import LatencyWindow
+
+DEFAULT_WINDOW = 1.5
+MIN_WINDOW = config.DEBOUNCE_MIN_SECS
+
+
+class VirtualClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_gaps(rng: random.Random, users: int, albums: int, photos: int) -> Dict[int, List[List[float]]]:
+    """Интервалы между фото каждого альбома каждого пользователя."""
+    result = {}
+    for user_id in range(users):
+        slow = user_id % 5 == 0
+        median = 0.35 if slow else 0.04
+        user_albums = []
+        for _ in range(albums):
+            gaps = [min(rng.lognormvariate(0, 0.6) * median, 1.4) for _ in range(photos - 1)]
+            user_albums.append(gaps)
+        result[user_id] = user_albums
+    return result
+
+
+def simulate(gaps: Dict[int, List[List[float]]], adaptive: bool) -> Dict[str, object]:
+    clock = VirtualClock()
+    debounce = AdaptiveDebounce(MIN_WINDOW, enabled=adaptive, clock=clock)
+    latency = LatencyWindow(maxlen=100000)
+    splits = 0
+    album_n = 0
+    for n in range(max(len(albums) for albums in gaps.values())):
+        for user_id, albums in gaps.items():
+            if n >= len(albums):
+                continue
+            album_n += 1
+            key = f"album:{album_n}"
+            clock.now += 10.0
+            debounce.observe(key, user_id, DEFAULT_WINDOW)
+            first_at = clock.now
+            deadline = clock.now + debounce.window("album", user_id, DEFAULT_WINDOW)
+            for gap in albums[n]:
+                arrival = clock.now + gap
+                if arrival > deadline:
+                    # Окно истекло раньше следующего фото: альбом разорван
+                    clock.now = deadline
+                    debounce.flushed(key)
+                    latency.add(deadline - first_at)
+                    splits += 1
+                    first_at = arrival
+                clock.now = arrival
+                debounce.observe(key, user_id, DEFAULT_WINDOW)
+                deadline = clock.now + debounce.window("album", user_id, DEFAULT_WINDOW)
+            clock.now = deadline
+            debounce.flushed(key)
+            latency.add(deadline - first_at)
+    return {"albums": album_n, "splits": splits, **latency.summary()}
+
+
+def main(users: int, albums: int, photos: int, seed: int) -> None:
+    gaps = make_gaps(random.Random(seed), users, albums, photos)
+    print(f"{users} пользователей × {albums} альбомов по {photos} фото, окно {MIN_WINDOW}–{DEFAULT_WINDOW}с")
+    print(f"{'mode':>10}{'p50, s':>10}{'p95, s':>10}{'p99, s':>10}{'splits':>10}")
+    for name, adaptive in (("fixed", False), ("adaptive", True)):
+        result = simulate(gaps, adaptive)
+        print(
+            f"{name:>10}{result['p50']:>10.2f}{result['p95']:>10.2f}"
+            f"{result['p99']:>10.2f}{result['splits']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--albums", type=int, default=30)
+    parser.add_argument("--photos", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    main(args.users, args.albums, args.photos, args.seed)
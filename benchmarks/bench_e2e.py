@@ -0,0 +1,193 @@
+"""Сквозной бенчмарк: синтетические обновления через настоящий Dispatcher.
+
+Одиночные фото (burst), альбомы, многострочные тексты и xlsx подаются
+в dp.feed_update с подключёнными commands_router и media_router, как это
+делает polling с handle_as_tasks. Бот работает с локальным fake Bot API
+(getFile, скачивание файлов, sendMessage), вебхуки — локальный
+stub-сервер с задержкой --latency и долей ответов 503 --error-rate.
+
+Печатает обновления в секунду (до возврата хендлеров и до полной
+доставки), перцентили времени сброса альбомов и burst, запросы
+к вебхукам и память: пик RSS процесса и, с --tracemalloc, пик
+выделений Python за прогон.
+
+Запуск:
+    python -m benchmarks.bench_e2e [--users 50] [--photos 4] [--albums 2] [--album-size 5]
+        [--texts 2] [--xlsx 1] [--latency 0.02] [--error-rate 0.0]
+"""
+import argparse
+import asyncio
+import io
+import itertools
+import resource
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import Update
+from openpyxl import Workbook
+from sqlmodel import create_engine
+from app.handlers import commands_router, media_router
+from app.handlers import media
+from app.models import database
+from app.services.webhook_client import close_http_client
+from app.utils.env import config
+from benchmarks.fakes import FakeTelegramAPI, make_document_update, make_photo_update, make_text_update
+from benchmarks.stub_server import StubWebhookServer
+
+TOKEN = "123456:BENCH-token"
+SERVICES = ("drive", "samokaty", "prokat")
+
+
+def make_xlsx(rows: int) -> bytes:
+    """Книга с заголовком и rows строками по две ячейки."""
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["title", "description"])
+    for n in range(rows):
+        sheet.append([f"Объявление {n}", f"Описание объявления {n}"])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def build_updates(args: argparse.Namespace, api: FakeTelegramAPI) -> List[Dict[str, Any]]:
+    """Обновления всех пользователей вперемешку; порядок внутри пользователя сохраняется."""
+    update_ids = itertools.count(1)
+    xlsx = make_xlsx(args.xlsx_rows) if args.xlsx else b""
+    per_user = []
+    for user_id in range(1, args.users + 1):
+        updates = []
+        for n in range(args.albums):
+            group = f"{user_id}-{n}"
+            updates.extend(make_photo_update(next(update_ids), user_id, group) for _ in range(args.album_size))
+        updates.extend(make_photo_update(next(update_ids), user_id) for _ in range(args.photos))
+        text = "\n".join(f"Текст объявления {n}" for n in range(args.text_lines))
+        updates.extend(make_text_update(next(update_ids), user_id, text) for _ in range(args.texts))
+        for _ in range(args.xlsx):
+            update_id = next(update_ids)
+            api.add_file(f"f{update_id}", f"documents/{update_id}.xlsx", xlsx)
+            updates.append(make_document_update(update_id, user_id))
+        per_user.append(updates)
+    return [u for batch in itertools.zip_longest(*per_user) for u in batch if u is not None]
+
+
+def configure(stub: StubWebhookServer, args: argparse.Namespace) -> None:
+    """Направить вебхуки на stub-сервер и задать окна ожидания."""
+    for service in SERVICES:
+        setattr(type(config), f"WEBHOOK_{service.upper()}", f"{stub.url}/{service}")
+        setattr(type(config), f"WEBHOOK_{service.upper()}_TEXT", f"{stub.url}/{service}_text")
+    config.BURST_DEBOUNCE_SECS = args.burst_debounce
+    config.BURST_HARDCAP_SECS = max(config.BURST_HARDCAP_SECS, args.burst_debounce)
+    media.MEDIA_GROUP_DELAY_SECS = args.album_delay
+    media.webhook_client.retry_backoff = args.retry_backoff
+
+
+async def wait_drained(timeout: float) -> None:
+    """Дождаться, пока все буферы сброшены и фоновые обработки завершены."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        busy = (
+            len(media.flush_scheduler)
+            or media.flush_scheduler.stats()["running_callbacks"]
+            or media.background_tasks
+            or await media.buffer_store.keys()
+        )
+        if not busy:
+            return
+        await asyncio.sleep(0.01)
+    raise TimeoutError("конвейер не опустел за отведённое время")
+
+
+def fmt(value) -> str:
+    return "-" if value is None else f"{value * 1000:.0f}"
+
+
+async def run(args: argparse.Namespace) -> None:
+    tmp = tempfile.TemporaryDirectory()
+    database.engine = create_engine(
+        f"sqlite:///{Path(tmp.name) / 'bench.db'}", connect_args={"check_same_thread": False}
+    )
+    database.create_tables()
+    stub = await StubWebhookServer(latency=args.latency, error_rate=args.error_rate).start()
+    api = await FakeTelegramAPI().start()
+    configure(stub, args)
+    bot = Bot(TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(api.url)))
+    media.tg_files_service.bot = bot
+    dp = Dispatcher()
+    dp.include_routers(commands_router, media_router)
+
+    raw = build_updates(args, api)
+    updates = [Update.model_validate(u, context={"bot": bot}) for u in raw]
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def feed(update: Update) -> None:
+        async with semaphore:
+            await dp.feed_update(bot, update)
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(feed(u) for u in updates))
+        handled = time.perf_counter() - started
+        await wait_drained(args.timeout)
+        drained = time.perf_counter() - started
+        traced_peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+    finally:
+        if args.tracemalloc:
+            tracemalloc.stop()
+        await bot.session.close()
+        await close_http_client()
+        await api.stop()
+        await stub.stop()
+        database.shutdown_db_executor()
+        tmp.cleanup()
+
+    total = len(updates)
+    print(
+        f"{total} обновлений от {args.users} пользователей "
+        f"(вебхук: задержка {args.latency * 1000:.0f} мс, ошибки {args.error_rate:.0%})"
+    )
+    print(f"  хендлеры:  {handled:6.2f} с, {total / handled:8.0f} обновлений/с")
+    print(f"  доставка:  {drained:6.2f} с, {total / drained:8.0f} обновлений/с")
+    print(f"  {'сброс':<8}{'count':>8}{'p50, ms':>10}{'p95, ms':>10}{'p99, ms':>10}")
+    for kind, summary in media.debounce.stats()["flush_latency"].items():
+        print(
+            f"  {kind:<8}{summary['count']:>8}{fmt(summary['p50']):>10}"
+            f"{fmt(summary['p95']):>10}{fmt(summary['p99']):>10}"
+        )
+    print(f"  вебхуки:   {stub.requests} запросов, {stub.errors} ошибок, {stub.bytes_received / 1024:.0f} KiB")
+    print(f"  Bot API:   {dict(sorted(api.calls.items()))}")
+    # ru_maxrss в Linux — в килобайтах
+    print(f"  память:    пик RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB", end="")
+    print(f", пик tracemalloc {traced_peak / 2 ** 20:.1f} MiB" if traced_peak is not None else "")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--photos", type=int, default=4, help="одиночных фото на пользователя")
+    parser.add_argument("--albums", type=int, default=2, help="альбомов на пользователя")
+    parser.add_argument("--album-size", type=int, default=5)
+    parser.add_argument("--texts", type=int, default=2, help="текстовых сообщений на пользователя")
+    parser.add_argument("--text-lines", type=int, default=20)
+    parser.add_argument("--xlsx", type=int, default=1, help="xlsx-файлов на пользователя")
+    parser.add_argument("--xlsx-rows", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02, help="задержка ответа вебхука, с")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 503")
+    parser.add_argument("--burst-debounce", type=float, default=config.BURST_DEBOUNCE_SECS)
+    parser.add_argument("--album-delay", type=float, default=media.MEDIA_GROUP_DELAY_SECS)
+    parser.add_argument("--retry-backoff", type=float, default=0.1, help="пауза перед первым повтором, с")
+    parser.add_argument("--concurrency", type=int, default=100, help="одновременно обрабатываемых обновлений")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--tracemalloc", action="store_true")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Бенчмарк: разбор Excel в event loop против потокового разбора в пуле.
+
+Генерирует книгу из нескольких листов (по умолчанию 3 × 4000 × 10 = 120k ячеек),
+отдаёт её со stub-сервера и измеряет время обработки и максимальную задержку
+event loop, которую видит параллельная задача-«тикер».
+
+Запуск:
+    python -m benchmarks.bench_excel [--sheets 3] [--rows 4000] [--cols 10] [--memory]
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+from io import BytesIO
+from openpyxl import Workbook
+from app.services.excel import aiter_excel_texts, download_to_spool, shutdown_excel_executor
+from app.services.webhook_client import close_http_client, get_http_client
+from benchmarks.stub_server import StubWebhookServer
+
+
+def make_workbook(sheets: int, rows: int, cols: int) -> bytes:
+    """Книга со строковыми и числовыми ячейками."""
+    wb = Workbook(write_only=True)
+    for n in range(sheets):
+        ws = wb.create_sheet(f"Sheet{n}")
+        ws.append([f"col{c}" for c in range(cols)])
+        for r in range(rows):
+            ws.append([f"Объявление {n}-{r}-{c}" if c % 2 else r * c for c in range(cols)])
+    data = BytesIO()
+    wb.save(data)
+    return data.getvalue()
+
+
+async def legacy(url: str) -> int:
+    """Старый путь: весь файл в память и разбор прямо в event loop."""
+    from openpyxl import load_workbook
+    resp = await get_http_client().get(url)
+    wb = load_workbook(filename=BytesIO(resp.content), read_only=True, data_only=True)
+    texts = []
+    for ws in wb.worksheets:
+        first = True
+        for row in ws.iter_rows(values_only=True):
+            if first:
+                first = False
+                continue
+            for cell in row:
+                if cell is None:
+                    continue
+                s = str(cell).strip()
+                if s:
+                    texts.append(s)
+    return len(texts)
+
+
+async def streaming(url: str) -> int:
+    """Новый путь: потоковое скачивание и разбор в пуле потоков."""
+    spool = await download_to_spool(url)
+    count = 0
+    try:
+        async for batch in aiter_excel_texts(spool):
+            count += len(batch)
+    finally:
+        spool.close()
+    return count
+
+
+async def measure(label: str, func, url: str, trace_memory: bool) -> None:
+    """Запустить обработку и параллельно замерить задержку event loop."""
+    stop = asyncio.Event()
+    max_lag = 0.0
+
+    async def ticker() -> None:
+        nonlocal max_lag
+        interval = 0.005
+        while not stop.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            max_lag = max(max_lag, time.perf_counter() - started - interval)
+
+    tick_task = asyncio.create_task(ticker())
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    count = await func(url)
+    elapsed = time.perf_counter() - started
+    memory = ""
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        memory = f", пик памяти: {peak / 1024 / 1024:6.1f} MiB"
+    stop.set()
+    await tick_task
+    print(
+        f"{label:<10} {count} текстов: {elapsed:6.2f} s, "
+        f"макс. задержка loop: {max_lag * 1000:8.1f} ms{memory}"
+    )
+
+
+async def main(sheets: int, rows: int, cols: int, trace_memory: bool) -> None:
+    content = make_workbook(sheets, rows, cols)
+    print(f"Книга: {sheets} листов × {rows} строк × {cols} колонок, {len(content) / 1024:.0f} KiB")
+    server = await StubWebhookServer().start()
+    server.files["/book.xlsx"] = content
+    url = server.url + "/book.xlsx"
+    try:
+        await measure("legacy", legacy, url, trace_memory)
+        await measure("streaming", streaming, url, trace_memory)
+    finally:
+        await close_http_client()
+        await server.stop()
+        shutdown_excel_executor()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sheets", type=int, default=3)
+    parser.add_argument("--rows", type=int, default=4000)
+    parser.add_argument("--cols", type=int, default=10)
+    parser.add_argument("--memory", action="store_true", help="замерить пик памяти (tracemalloc, медленно)")
+    args = parser.parse_args()
+    asyncio.run(main(args.sheets, args.rows, args.cols, args.memory))
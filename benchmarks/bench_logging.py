@@ -0,0 +1,146 @@
+"""Бенчмарк логирования: StreamHandler в event loop против очереди.
+
+Старый путь: f-строка собирается в месте вызова, StreamHandler форматирует
+запись, TokenMaskingFormatter маскирует токены, и строка пишется в поток
+прямо в вызывающем потоке. Новый путь:
+аргументы подставляются лениво (%s), LogQueueHandler только кладёт запись
+в очередь, а форматирование, маскировка и запись идут в потоке
+QueueListener. Поток вывода с --write-latency имитирует медленный stderr
+(терминал, pipe в сборщик логов).
+
+Печатает время на сообщение в вызывающем потоке (столько занят event
+loop) и общее время до записи всех строк. При сплошном потоке сообщений
+поток записи конкурирует с вызывающим за GIL; строка «idle» показывает
+саму стоимость постановки в очередь, когда запись идёт в паузах.
+Отдельно — стоимость отключённого debug-вызова с f-строкой и с ленивыми
+аргументами.
+
+Запуск:
+    python -m benchmarks.bench_logging [--messages 20000] [--write-latency 0.00002]
+"""
+import argparse
+import logging
+import queue
+import re
+import time
+from logging.handlers import QueueListener
+from app.utils.logging import LogQueueHandler, create_formatter
+from benchmarks.bench_compression import TOKEN
+
+
+class OldTokenMaskingFormatter(logging.Formatter):
+    """Исходный TokenMaskingFormatter (re.sub по строке шаблона)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        msg = super().format(record)
+        return re.sub(r'bot[0-9]+:[A-Za-z0-9_-]+', 'bot***MASKED***', msg)
+
+
+class SlowStream:
+    """Поток вывода, каждая запись в который занимает latency секунд."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.lines = 0
+
+    def write(self, text: str) -> None:
+        if self.latency:
+            # Блокирующая запись отпускает GIL, как write() в настоящий поток
+            time.sleep(self.latency)
+        self.lines += text.count("\n")
+
+    def flush(self) -> None:
+        pass
+
+
+def make_logger(handler: logging.Handler) -> logging.Logger:
+    logger = logging.getLogger("bench.logging")
+    logger.handlers[:] = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def run_old(messages: int, stream: SlowStream):
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(OldTokenMaskingFormatter(
+        fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S'
+    ))
+    logger = make_logger(handler)
+    url = f"https://api.telegram.org/file/bot{TOKEN}/photos/file.jpg"
+    started = time.perf_counter()
+    for n in range(messages):
+        logger.info(f"📦 Обработан burst пользователя {n} с {n % 10} сообщениями")
+        if n % 10 == 0:
+            logger.info(f"✅ Отправлено на {url}")
+    caller = time.perf_counter() - started
+    return caller, caller
+
+
+def run_new(messages: int, stream: SlowStream, busy_listener: bool = True):
+    """busy_listener=False: поток записи стартует после серии сообщений и не
+    конкурирует за GIL — так выглядит редкое логирование в живом боте."""
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(create_formatter("text"))
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, handler)
+    if busy_listener:
+        listener.start()
+    logger = make_logger(LogQueueHandler(log_queue))
+    url = f"https://api.telegram.org/file/bot{TOKEN}/photos/file.jpg"
+    started = time.perf_counter()
+    for n in range(messages):
+        logger.info("📦 Обработан burst пользователя %s с %d сообщениями", n, n % 10)
+        if n % 10 == 0:
+            logger.info("✅ %s на %s", "Отправлено", url)
+    caller = time.perf_counter() - started
+    if not busy_listener:
+        listener.start()
+    listener.stop()
+    return caller, time.perf_counter() - started
+
+
+def run_disabled_debug(messages: int):
+    logger = make_logger(logging.NullHandler())
+    payload = {"user_id": 42, "placement": "Телеграм-канал Драйва"}
+    started = time.perf_counter()
+    for n in range(messages):
+        logger.debug(f"📍 Placement пользователя {n}: {payload}")
+    eager = time.perf_counter() - started
+    started = time.perf_counter()
+    for n in range(messages):
+        logger.debug("📍 Placement пользователя %s: %s", n, payload)
+    return eager, time.perf_counter() - started
+
+
+def main(messages: int, write_latency: float) -> None:
+    total = messages + (messages + 9) // 10
+    print(f"{total} записей, запись строки в поток {write_latency * 1e6:.0f} мкс")
+    print(f"{'path':<22}{'caller, µs/msg':>16}{'until written, s':>18}")
+    results = {}
+    paths = (
+        ("StreamHandler", run_old),
+        ("QueueHandler", run_new),
+        ("QueueHandler (idle)", lambda m, s: run_new(m, s, busy_listener=False)),
+    )
+    for name, run in paths:
+        stream = SlowStream(write_latency)
+        caller, written = run(messages, stream)
+        assert stream.lines == total
+        results[name] = caller
+        print(f"{name:<22}{caller / total * 1e6:>16.2f}{written:>18.2f}")
+    for name in ("QueueHandler", "QueueHandler (idle)"):
+        print(f"  {name}: в вызывающем потоке {results['StreamHandler'] / results[name]:.1f}x от StreamHandler")
+    eager, lazy = run_disabled_debug(messages)
+    print(
+        f"отключённый debug: f-строка {eager / messages * 1e6:.2f} µs, "
+        f"%s {lazy / messages * 1e6:.2f} µs ({eager / lazy:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--write-latency", type=float, default=0.00002, help="время записи строки в поток, с")
+    args = parser.parse_args()
+    main(args.messages, args.write_latency)
@@ -0,0 +1,85 @@
+"""Бенчмарк таймеров debounce: задача на каждое сообщение против DeadlineScheduler.
+
+Старый путь: каждое сообщение отменяет задачу сброса своего ключа и создаёт
+новую с asyncio.sleep(delay). Новый путь: schedule() переносит срок ключа
+в куче одного планировщика. Поток — альбомы по 10 фото от многих
+пользователей; сообщения приходят быстрее, чем истекает debounce.
+
+Запуск:
+    python -m benchmarks.bench_scheduler [--albums 2000] [--photos 10] [--delay 0.2]
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+from app.utils.scheduler import DeadlineScheduler
+
+
+async def old_path(keys: List[str], delay: float) -> Dict[str, float]:
+    tasks: Dict[str, asyncio.Task] = {}
+    created = 0
+    flushed = 0
+
+    async def flush_later(key: str) -> None:
+        nonlocal flushed
+        await asyncio.sleep(delay)
+        tasks.pop(key, None)
+        flushed += 1
+
+    started_cpu = time.process_time()
+    for n, key in enumerate(keys):
+        task = tasks.get(key)
+        if task is not None:
+            task.cancel()
+        tasks[key] = asyncio.create_task(flush_later(key))
+        created += 1
+        if n % 100 == 0:
+            await asyncio.sleep(0)
+    while tasks:
+        await asyncio.sleep(delay / 4)
+    return {"tasks": created, "flushed": flushed, "cpu": time.process_time() - started_cpu}
+
+
+async def new_path(keys: List[str], delay: float) -> Dict[str, float]:
+    scheduler = DeadlineScheduler()
+    flushed = 0
+
+    def flush(key: str) -> None:
+        nonlocal flushed
+        flushed += 1
+
+    before = len(asyncio.all_tasks())
+    started_cpu = time.process_time()
+    for n, key in enumerate(keys):
+        scheduler.schedule(key, time.time() + delay, lambda key=key: flush(key))
+        if n % 100 == 0:
+            await asyncio.sleep(0)
+    created = len(asyncio.all_tasks()) - before
+    while len(scheduler):
+        await asyncio.sleep(delay / 4)
+    cpu = time.process_time() - started_cpu
+    await scheduler.stop()
+    return {"tasks": created, "flushed": flushed, "cpu": cpu}
+
+
+def make_keys(albums: int, photos: int) -> List[str]:
+    """Фото альбомов вперемешку, как они приходят от разных пользователей."""
+    return [f"album:{a}" for _ in range(photos) for a in range(albums)]
+
+
+def main(albums: int, photos: int, delay: float) -> None:
+    keys = make_keys(albums, photos)
+    print(f"{len(keys)} сообщений, {albums} альбомов, debounce {delay}с")
+    print(f"{'path':>10}{'tasks':>10}{'flushes':>10}{'CPU, ms':>10}")
+    for name, path in (("old", old_path), ("scheduler", new_path)):
+        result = asyncio.run(path(keys, delay))
+        print(f"{name:>10}{result['tasks']:>10}{result['flushed']:>10}{result['cpu'] * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--albums", type=int, default=2000)
+    parser.add_argument("--photos", type=int, default=10)
+    parser.add_argument("--delay", type=float, default=0.2)
+    args = parser.parse_args()
+    main(args.albums, args.photos, args.delay)
@@ -0,0 +1,55 @@
+"""Бенчмарк сериализации WebhookPayload: старый путь против encode_model.
+
+Старый путь: model_dump(by_alias=True) в словарь, json.dumps этого словаря
+для тела запроса (как делал httpx с json=) и отдельный model_dump_json()
+для last_payload. Новый путь: один encode_model в байты, которые идут
+и в тело, и в last_payload, плюс sha256 для X-Payload-Digest.
+
+Запуск:
+    python -m benchmarks.bench_serialization [--repeat 2000]
+"""
+import argparse
+import hashlib
+import json
+import time
+from typing import Callable
+from app.services.webhook_client import encode_model
+from benchmarks.bench_compression import make_webhook_payload_model
+
+
+def old_path(payload) -> None:
+    body = json.dumps(payload.model_dump(by_alias=True), ensure_ascii=False).encode("utf-8")
+    stored = payload.model_dump_json()
+    assert body and stored
+
+
+def new_path(payload) -> None:
+    body = encode_model(payload)
+    stored = body.decode("utf-8")
+    digest = hashlib.sha256(body).hexdigest()
+    assert stored and digest
+
+
+def measure(func: Callable, payload, repeat: int) -> float:
+    """Среднее время одного вызова, микросекунды."""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(payload)
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def main(repeat: int) -> None:
+    print(f"{'creatives':>10}{'old, µs':>12}{'new, µs':>12}{'speedup':>10}")
+    for creatives in (1, 10, 100):
+        payload = make_webhook_payload_model(creatives)
+        n = max(1, repeat // creatives)
+        old = measure(old_path, payload, n)
+        new = measure(new_path, payload, n)
+        print(f"{creatives:>10}{old:>12.1f}{new:>12.1f}{old / new:>9.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.repeat)
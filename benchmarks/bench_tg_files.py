@@ -0,0 +1,28 @@
+"""Бенчмарк: последовательное и параллельное получение URL файлов альбома.
+
+Запуск:
+    python -m benchmarks.bench_tg_files [--photos 10] [--latency 0.1]
+"""
+import argparse
+import asyncio
+import time
+from app.services.tg_files import TelegramFileService
+from benchmarks.fakes import FakeBot, make_photo_message
+
+
+async def main(photos: int, latency: float) -> None:
+    messages = [make_photo_message(i) for i in range(1, photos + 1)]
+    for concurrency in (1, 5, 10):
+        service = TelegramFileService(FakeBot(latency=latency), concurrency=concurrency)
+        started = time.perf_counter()
+        creatives = await service.extract_creatives_from_messages(messages)
+        elapsed = time.perf_counter() - started
+        print(f"concurrency={concurrency:<3} {len(creatives)} креативов: {elapsed * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--photos", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.1)
+    args = parser.parse_args()
+    asyncio.run(main(args.photos, args.latency))
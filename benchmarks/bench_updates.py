@@ -0,0 +1,123 @@
+"""Нагрузочный тест приёма обновлений: webhook (UpdateServer) против long polling.
+
+Webhook: N синтетических обновлений отправляются POST-запросами
+с конкурентностью --concurrency (Telegram держит до max_connections
+соединений). Измеряются время подтверждения (ack) и время до окончания
+обработки всех обновлений.
+
+Polling: те же обновления отдаёт локальный fake Bot API (getUpdates по
+100 штук, задержка --rtt на запрос), а читает их dp.start_polling.
+
+Хендлер в обоих режимах имитирует работу задержкой --work.
+
+Запуск:
+    python -m benchmarks.bench_updates [--updates 2000] [--concurrency 40] [--rtt 0.05] [--work 0.01]
+"""
+import argparse
+import asyncio
+import time
+import aiohttp
+from aiogram import Bot, Dispatcher, Router
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import Message
+from app.services.update_server import SECRET_HEADER, UpdateServer
+from app.utils.stats import LatencyWindow
+from benchmarks.fakes import FakeTelegramAPI, make_text_update
+
+TOKEN = "123456:BENCH-token"
+
+
+def make_dispatcher(work: float, done: list) -> Dispatcher:
+    router = Router()
+
+    @router.message()
+    async def handler(message: Message) -> None:
+        if work:
+            await asyncio.sleep(work)
+        done.append(message.message_id)
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+async def wait_done(done: list, total: int) -> None:
+    while len(done) < total:
+        await asyncio.sleep(0.005)
+
+
+async def bench_webhook(total: int, concurrency: int, work: float, workers: int) -> None:
+    done: list = []
+    bot = Bot(token=TOKEN)
+    server = UpdateServer(
+        make_dispatcher(work, done), bot, secret_token="bench",
+        workers=workers, queue_size=total, host="127.0.0.1", port=0, path="/tg"
+    )
+    await server.start()
+    url = f"http://127.0.0.1:{server.port}/tg"
+    acks = LatencyWindow(maxlen=total)
+    semaphore = asyncio.Semaphore(concurrency)
+    # Генератор нагрузки на aiohttp: пул httpx сам становится узким местом на тысячах запросов
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async with aiohttp.ClientSession(connector=connector) as client:
+        async def post(update_id: int) -> None:
+            async with semaphore:
+                started = time.perf_counter()
+                async with client.post(url, json=make_text_update(update_id), headers={SECRET_HEADER: "bench"}) as response:
+                    response.raise_for_status()
+                acks.add(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(post(i) for i in range(1, total + 1)))
+        acked = time.perf_counter() - started
+        await wait_done(done, total)
+        elapsed = time.perf_counter() - started
+
+    await server.stop()
+    await bot.session.close()
+    ack = acks.summary()
+    print(
+        f"webhook  workers={workers:<3} {total} upd: ack всех {acked * 1000:7.0f} ms "
+        f"(p50 {ack['p50'] * 1000:.1f} / p95 {ack['p95'] * 1000:.1f} ms), "
+        f"обработано за {elapsed * 1000:7.0f} ms, {total / elapsed:7.0f} upd/s"
+    )
+
+
+async def bench_polling(total: int, rtt: float, work: float) -> None:
+    done: list = []
+    api = await FakeTelegramAPI(latency=rtt).start()
+    api.add_updates([make_text_update(i) for i in range(1, total + 1)])
+    session = AiohttpSession(api=TelegramAPIServer.from_base(api.url))
+    bot = Bot(token=TOKEN, session=session)
+    dp = make_dispatcher(work, done)
+
+    started = time.perf_counter()
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, close_bot_session=False, polling_timeout=1))
+    await wait_done(done, total)
+    elapsed = time.perf_counter() - started
+    await dp.stop_polling()
+    await polling
+    await bot.session.close()
+    await api.stop()
+    print(
+        f"polling  rtt={rtt * 1000:.0f}ms   {total} upd: getUpdates x{api.calls.get('getUpdates', 0)}, "
+        f"обработано за {elapsed * 1000:7.0f} ms, {total / elapsed:7.0f} upd/s"
+    )
+
+
+async def main(total: int, concurrency: int, rtt: float, work: float) -> None:
+    for workers in (1, 16, 64):
+        await bench_webhook(total, concurrency, work, workers)
+    await bench_polling(total, rtt, work)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=40)
+    parser.add_argument("--rtt", type=float, default=0.05)
+    parser.add_argument("--work", type=float, default=0.01)
+    args = parser.parse_args()
+    asyncio.run(main(args.updates, args.concurrency, args.rtt, args.work))
@@ -0,0 +1,57 @@
+"""Бенчмарк: новый httpx.AsyncClient на каждый запрос против общего пула.
+
+Запуск:
+    python -m benchmarks.bench_webhook_pool [--requests 200] [--concurrency 10]
+"""
+import argparse
+import asyncio
+import time
+import httpx
+from app.services.webhook_client import WebhookClient, close_http_client
+from benchmarks.stub_server import StubWebhookServer
+
+
+async def _per_request_client(url: str, data: dict) -> None:
+    """Старое поведение: клиент (и соединение) создаётся на каждый запрос."""
+    async with httpx.AsyncClient(timeout=httpx.Timeout(25)) as client:
+        await client.post(url, json=data)
+
+
+async def _run(label: str, send, total: int, concurrency: int, server: StubWebhookServer) -> None:
+    """Выполнить total запросов с заданной конкурентностью и напечатать результат."""
+    server.requests = 0
+    server._connections.clear()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with semaphore:
+            await send()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    print(
+        f"{label:<22} {total} req, conc={concurrency}: {elapsed * 1000:8.1f} ms, "
+        f"{elapsed / total * 1000:6.2f} ms/req, соединений: {server.connections}"
+    )
+
+
+async def main(total: int, concurrency: int) -> None:
+    server = await StubWebhookServer().start()
+    url = server.url + "/hook"
+    client = WebhookClient()
+    try:
+        for conc in sorted({1, concurrency}):
+            await _run("per-request client", lambda: _per_request_client(url, {"ping": "ok"}), total, conc, server)
+            await _run("shared pool", lambda: client.send_ping(url), total, conc, server)
+    finally:
+        await close_http_client()
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
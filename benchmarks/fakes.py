@@ -0,0 +1,200 @@
+"""Фейковые объекты Telegram для бенчмарков."""
+import asyncio
+import itertools
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+from aiohttp import web
+
+
+class FakeBot:
+    """Минимальный Bot: getFile с настраиваемой задержкой."""
+
+    def __init__(self, latency: float = 0.05, token: str = "123456:TEST-token"):
+        self.latency = latency
+        self.token = token
+        self.get_file_calls = 0
+
+    async def get_file(self, file_id: str) -> SimpleNamespace:
+        self.get_file_calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return SimpleNamespace(file_id=file_id, file_path=f"photos/{file_id}.jpg")
+
+
+def make_photo_message(message_id: int, file_id: Optional[str] = None, media_group_id: Optional[str] = None) -> SimpleNamespace:
+    """Сообщение с фото, достаточное для TelegramFileService."""
+    file_id = file_id or f"file{message_id}"
+    sizes: List[SimpleNamespace] = [
+        SimpleNamespace(file_id=f"{file_id}_s", file_unique_id=f"u{file_id}_s", file_size=1000, width=90, height=90),
+        SimpleNamespace(file_id=file_id, file_unique_id=f"u{file_id}", file_size=120000, width=1080, height=1350),
+    ]
+    return SimpleNamespace(
+        message_id=message_id,
+        photo=sizes,
+        caption=None,
+        content_type="photo",
+        media_group_id=media_group_id,
+    )
+
+
+class FakeTelegramAPI:
+    """Локальный HTTP-сервер, отвечающий как Bot API.
+
+    Поддерживает getMe, getUpdates (с offset/limit и long polling),
+    getFile, скачивание файлов (/file/bot<token>/<path> из files) и отправку
+    сообщений; остальные методы отвечают {"ok": true}. Подключается
+    к настоящему Bot через TelegramAPIServer.from_base(api.url).
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.updates: List[Dict[str, Any]] = []
+        self.sent: List[Dict[str, Any]] = []
+        self.calls: Dict[str, int] = {}
+        self._new_updates = asyncio.Event()
+        self._message_ids = itertools.count(1)
+        # Файлы для скачивания: file_path -> байты, file_id -> file_path
+        self.files: Dict[str, bytes] = {}
+        self.file_paths: Dict[str, str] = {}
+        self._runner: Optional[web.AppRunner] = None
+        self.port: Optional[int] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def add_file(self, file_id: str, file_path: str, body: bytes) -> None:
+        """Отдавать body по getFile(file_id) и скачиванию file_path."""
+        self.file_paths[file_id] = file_path
+        self.files[file_path] = body
+
+    def add_updates(self, updates: List[Dict[str, Any]]) -> None:
+        """Добавить обновления для getUpdates."""
+        self.updates.extend(updates)
+        self._new_updates.set()
+
+    async def _params(self, request: web.Request) -> Dict[str, Any]:
+        if request.content_type == "multipart/form-data" or request.content_type == "application/x-www-form-urlencoded":
+            form = await request.post()
+            return {key: value for key, value in form.items() if isinstance(value, str)}
+        if request.can_read_body:
+            return await request.json()
+        return {}
+
+    def _ok(self, result: Any) -> web.Response:
+        return web.json_response({"ok": True, "result": result})
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] = self.calls.get(method, 0) + 1
+        params = await self._params(request)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if method == "getMe":
+            return self._ok({"id": 123456, "is_bot": True, "first_name": "bench", "username": "bench_bot"})
+        if method == "getUpdates":
+            return self._ok(await self._get_updates(params))
+        if method == "getFile":
+            file_id = params.get("file_id", "")
+            file_path = self.file_paths.get(file_id, f"photos/{file_id}.jpg")
+            return self._ok({"file_id": file_id, "file_unique_id": f"u{file_id}", "file_path": file_path})
+        if method.startswith("send"):
+            self.sent.append({"method": method, **params})
+            chat_id = int(params.get("chat_id", 0))
+            return self._ok({
+                "message_id": next(self._message_ids),
+                "date": 1728910000,
+                "chat": {"id": chat_id, "type": "private"},
+                "text": params.get("text", ""),
+            })
+        return self._ok(True)
+
+    async def _download(self, request: web.Request) -> web.Response:
+        self.calls["download"] = self.calls.get("download", 0) + 1
+        body = self.files.get(request.match_info["path"])
+        if body is None:
+            return web.Response(status=404)
+        return web.Response(body=body)
+
+    async def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+        # Подтверждённые (update_id < offset) больше не отдаём
+        self.updates = [u for u in self.updates if u["update_id"] >= offset]
+        if not self.updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.updates[:limit]
+
+    async def start(self) -> "FakeTelegramAPI":
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self._handle)
+        app.router.add_get("/file/bot{token}/{path:.*}", self._download)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def make_text_update(update_id: int, user_id: int = 1, text: str = "hello") -> Dict[str, Any]:
+    """Обновление Telegram с текстовым сообщением."""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1728910000,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "user"},
+            "text": text,
+        },
+    }
+
+
+def _user_message(update_id: int, user_id: int) -> Dict[str, Any]:
+    return {
+        "message_id": update_id,
+        "date": 1728910000,
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": "user"},
+    }
+
+
+def make_photo_update(update_id: int, user_id: int = 1, media_group_id: Optional[str] = None) -> Dict[str, Any]:
+    """Обновление Telegram с фото (в альбоме, если задан media_group_id)."""
+    message = _user_message(update_id, user_id)
+    message["photo"] = [
+        {"file_id": f"f{update_id}_s", "file_unique_id": f"u{update_id}_s", "file_size": 1000, "width": 90, "height": 90},
+        {"file_id": f"f{update_id}", "file_unique_id": f"u{update_id}", "file_size": 120000, "width": 1080, "height": 1350},
+    ]
+    if media_group_id:
+        message["media_group_id"] = media_group_id
+    return {"update_id": update_id, "message": message}
+
+
+def make_document_update(
+    update_id: int,
+    user_id: int = 1,
+    file_name: str = "texts.xlsx",
+    mime_type: str = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+) -> Dict[str, Any]:
+    """Обновление Telegram с документом (file_id — f<update_id>)."""
+    message = _user_message(update_id, user_id)
+    message["document"] = {
+        "file_id": f"f{update_id}",
+        "file_unique_id": f"u{update_id}",
+        "file_name": file_name,
+        "mime_type": mime_type,
+        "file_size": 10000,
+    }
+    return {"update_id": update_id, "message": message}
@@ -0,0 +1 @@
+"""Микробенчмарки горячих функций с сохранёнными базовыми значениями."""
@@ -0,0 +1,117 @@
+"""Фикстура bench: замер, сравнение с базовыми значениями и отчёт.
+
+Время каждого бенчмарка делится на время калибровочной нагрузки
+(чистый Python), которая замеряется вперемешку с ним: так частота
+процессора и соседние процессы влияют на оба замера одинаково. Базовые значения хранятся
+в этих относительных единицах в baselines.json, поэтому переносимы
+между машинами разной скорости. Бенчмарк падает, если стал медленнее
+базового значения больше чем в threshold раз.
+
+    python -m pytest benchmarks/micro                     # проверка
+    python -m pytest benchmarks/micro --update-baselines  # записать новые значения
+"""
+import json
+import timeit
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+import pytest
+
+BASELINES_PATH = Path(__file__).with_name("baselines.json")
+DEFAULT_THRESHOLD = 1.5
+
+
+def _calibration_workload() -> None:
+    data = {}
+    for i in range(200):
+        data[f"k{i}"] = [i, str(i), i * 1.5]
+    sum(len(v[1]) for v in data.values())
+
+
+def _autorange(timer: timeit.Timer, min_time: float) -> int:
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    return number
+
+
+def measure(func: Callable[[], object], repeat: int = 9, min_time: float = 0.02) -> Tuple[float, float]:
+    """Лучшее время одного вызова func и калибровочной нагрузки, секунды.
+
+    number подбирается так, чтобы один замер шёл не меньше min_time;
+    замеры func и калибровки чередуются repeat раз.
+    """
+    timer = timeit.Timer(func)
+    calibration = timeit.Timer(_calibration_workload)
+    number = _autorange(timer, min_time)
+    calibration_number = _autorange(calibration, min_time)
+    best, best_calibration = float("inf"), float("inf")
+    for _ in range(repeat):
+        best = min(best, timer.timeit(number) / number)
+        best_calibration = min(best_calibration, calibration.timeit(calibration_number) / calibration_number)
+    return best, best_calibration
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--update-baselines", action="store_true", default=False,
+        help="записать результаты микробенчмарков в baselines.json"
+    )
+
+
+class Bench:
+    def __init__(self, baselines: Dict, update: bool):
+        self.baselines = baselines
+        self.update = update
+        self.threshold = baselines.get("threshold", DEFAULT_THRESHOLD)
+        self.calibration: Optional[float] = None
+        self.results: Dict[str, Dict[str, Optional[float]]] = {}
+
+    def __call__(self, name: str, func: Callable[[], object], threshold: Optional[float] = None) -> float:
+        """Замерить func; упасть, если она медленнее базового значения больше чем в threshold раз."""
+        seconds, calibration = measure(func)
+        self.calibration = calibration
+        units = seconds / calibration
+        baseline = self.baselines.get("benchmarks", {}).get(name)
+        self.results[name] = {"seconds": seconds, "units": units, "baseline": baseline}
+        if self.update or baseline is None:
+            return seconds
+        limit = baseline * (threshold or self.threshold)
+        if units > limit:
+            pytest.fail(
+                f"{name}: {seconds * 1e6:.1f} мкс ({units:.2f} ед.) — медленнее базового "
+                f"{baseline:.2f} ед. больше чем в {threshold or self.threshold} раза",
+                pytrace=False
+            )
+        return seconds
+
+
+@pytest.fixture(scope="session")
+def bench(request):
+    baselines = json.loads(BASELINES_PATH.read_text()) if BASELINES_PATH.exists() else {}
+    update = request.config.getoption("--update-baselines")
+    harness = Bench(baselines, update)
+    request.config._micro_bench = harness
+    yield harness
+    if update:
+        baselines["threshold"] = harness.threshold
+        benchmarks = baselines.setdefault("benchmarks", {})
+        for name, result in harness.results.items():
+            benchmarks[name] = float(f"{result['units']:.4g}")
+        baselines["benchmarks"] = dict(sorted(benchmarks.items()))
+        BASELINES_PATH.write_text(json.dumps(baselines, indent=2, ensure_ascii=False) + "\n")
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    harness = getattr(config, "_micro_bench", None)
+    if harness is None or not harness.results:
+        return
+    terminalreporter.section("микробенчмарки")
+    terminalreporter.write_line(f"калибровка (последний замер): {harness.calibration * 1e6:.1f} мкс = 1 ед.")
+    terminalreporter.write_line(f"{'benchmark':<40}{'мкс':>12}{'ед.':>10}{'база':>10}{'×':>8}")
+    for name, result in sorted(harness.results.items()):
+        baseline = result["baseline"]
+        ratio = f"{result['units'] / baseline:.2f}" if baseline else "-"
+        terminalreporter.write_line(
+            f"{name:<40}{result['seconds'] * 1e6:>12.2f}{result['units']:>10.4g}"
+            f"{baseline if baseline is not None else '-':>10}{ratio:>8}"
+        )
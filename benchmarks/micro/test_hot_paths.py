@@ -0,0 +1,73 @@
+"""Микробенчмарки горячих путей конвейера креативов, логов и команд."""
+import asyncio
+import logging
+from aiogram.types import Message
+from app.handlers.commands import build_full_instructions
+from app.handlers.media import create_webhook_payload
+from app.services.excel import extract_texts_from_rows
+from app.services.tg_files import TelegramFileService
+from app.services.webhook_client import WebhookClient, encode_model
+from app.utils.cache import TTLCache
+from app.utils.logging import TokenMaskingFormatter
+from benchmarks.bench_compression import TOKEN, make_webhook_payload_model
+from benchmarks.fakes import FakeBot, make_photo_message, make_photo_update
+
+
+def test_create_webhook_payload(bench):
+    messages = [Message.model_validate(make_photo_update(n, 42, "album")["message"]) for n in range(1, 11)]
+    source = make_webhook_payload_model(10)
+    creatives, urls = source.creatives, source.download_urls
+    bench(
+        "create_webhook_payload[10]",
+        lambda: create_webhook_payload(messages, creatives, urls, "drive", "batch", 1, 1, "media_group", "канал")
+    )
+
+
+def test_encode_model(bench):
+    payload = make_webhook_payload_model(10)
+    bench("encode_model[10]", lambda: encode_model(payload))
+
+
+def test_encode_payload(bench):
+    client = WebhookClient()
+    payload = make_webhook_payload_model(10)
+    bench("encode_payload[10]", lambda: client.encode_payload(payload))
+
+
+def test_extract_creative_from_message(bench):
+    messages = [make_photo_message(n) for n in range(100)]
+    loop = asyncio.new_event_loop()
+
+    async def extract_all() -> None:
+        # Новый кэш на каждый прогон: каждый файл проходит через getFile
+        service = TelegramFileService(FakeBot(latency=0), path_cache=TTLCache(1000, 3000))
+        for message in messages:
+            await service.extract_creative_from_message(message)
+
+    try:
+        bench("extract_creative_from_message[100]", lambda: loop.run_until_complete(extract_all()))
+    finally:
+        loop.close()
+
+
+def test_token_masking_formatter(bench):
+    formatter = TokenMaskingFormatter(fmt="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    record = logging.LogRecord(
+        "httpx", logging.INFO, __file__, 1,
+        "HTTP Request: GET https://api.telegram.org/file/bot%s/photos/file_1.jpg \"%s\"",
+        (TOKEN, "HTTP/1.1 200 OK"), None
+    )
+    assert "***MASKED***" in formatter.format(record)
+    bench("TokenMaskingFormatter.format", lambda: formatter.format(record))
+
+
+def test_extract_texts_from_rows(bench):
+    rows = [("title", "description", "price", "city", "note")] + [
+        (f"Объявление {n}", f"  Описание {n}  ", n * 10, None if n % 3 else "Москва", "")
+        for n in range(1000)
+    ]
+    bench("extract_texts_from_rows[1000x5]", lambda: sum(1 for _ in extract_texts_from_rows(rows)))
+
+
+def test_build_full_instructions(bench):
+    bench("build_full_instructions", lambda: build_full_instructions("drive", "Телеграм-канал Драйва"))
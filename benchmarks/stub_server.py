@@ -0,0 +1,64 @@
+"""Локальный stub-сервер вебхука для бенчмарков."""
+import asyncio
+import random
+from typing import Dict, Optional
+from aiohttp import web
+
+
+class StubWebhookServer:
+    """HTTP-сервер, имитирующий вебхук: считает запросы и TCP-соединения."""
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, status: int = 200):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.status = status
+        self.requests = 0
+        self.errors = 0
+        self.bytes_received = 0
+        self._connections = set()
+        self._runner: Optional[web.AppRunner] = None
+        self.port: Optional[int] = None
+        # Файлы, отдаваемые на GET: путь -> содержимое
+        self.files: Dict[str, bytes] = {}
+
+    @property
+    def connections(self) -> int:
+        """Количество TCP-соединений, открытых клиентами."""
+        return len(self._connections)
+
+    @property
+    def url(self) -> str:
+        """Базовый URL сервера."""
+        return f"http://127.0.0.1:{self.port}"
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        """Принять запрос, выдержать задержку и вернуть статус."""
+        if request.method == "GET" and request.path in self.files:
+            return web.Response(body=self.files[request.path])
+        body = await request.read()
+        self.requests += 1
+        self.bytes_received += len(body)
+        self._connections.add(request.transport.get_extra_info("peername"))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            self.errors += 1
+            return web.Response(status=503, text="unavailable")
+        return web.Response(status=self.status, text="ok")
+
+    async def start(self) -> "StubWebhookServer":
+        """Запустить сервер на свободном порту."""
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_route("*", "/{tail:.*}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        """Остановить сервер."""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,29 @@
+"""Общие фикстуры тестов."""
+import pytest
+from sqlmodel import SQLModel, create_engine
+from app.models import database
+
+
+@pytest.fixture
+def db_engine(tmp_path, monkeypatch):
+    """Подменить движок БД на временную SQLite-базу."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'test.db'}",
+        echo=False,
+        connect_args={"check_same_thread": False}
+    )
+    monkeypatch.setattr(database, "engine", engine)
+    database.create_tables()
+    yield engine
+    database.shutdown_db_executor()
+    engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def reset_circuit_breakers():
+    """Circuit breaker'ы общие для процесса: не переносим состояние между тестами."""
+    from app.services import webhook_client
+
+    webhook_client._breakers.clear()
+    yield
+    webhook_client._breakers.clear()
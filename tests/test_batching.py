@@ -137,3 +137,159 @@ def test_media_group_payload():
     assert payload.batch.grouping == "media_group"
     assert len(payload.creatives) == 3
     assert len(payload.message_ids) == 3
+
+def test_process_messages_batch_sends_chunks_concurrently(monkeypatch):
+    """Чанки отправляются параллельно, seq/total и ключи идемпотентности сохраняются."""
+    import asyncio
+    from app.handlers import media
+    from app.models.repository import UserContext
+
+    class MockMessage:
+        def __init__(self, message_id):
+            self.message_id = message_id
+            self.media_group_id = None
+            self.chat = type("Chat", (), {"id": 123, "type": "private", "title": None})()
+            self.from_user = type("User", (), {"id": 456, "username": "testuser"})()
+            self.date = type("Date", (), {"timestamp": lambda self: 1728910000.0})()
+            self.answers = []
+
+        async def answer(self, text, **kwargs):
+            self.answers.append(text)
+
+    class MockFiles:
+        async def extract_creatives_from_messages(self, messages):
+            return [
+                Creative(type="photo", file_id=f"file{m.message_id}", download_url=f"url{m.message_id}")
+                for m in messages
+            ]
+
+    class MockPrefs:
+        def __init__(self):
+            self.saved = []
+
+        async def get_user_context(self, user_id):
+            return UserContext("drive", "канал")
+
+        async def save_last_payload(self, user_id, json_payload):
+            self.saved.append(json_payload)
+
+    class MockWebhookClient:
+        def __init__(self):
+            self.in_flight = 0
+            self.max_in_flight = 0
+            self.sent = []
+
+        def generate_idempotency_key(self, batch_id, seq):
+            return f"{batch_id}.{seq}"
+
+        def encode_payload(self, payload):
+            return payload.model_dump_json(by_alias=True).encode("utf-8")
+
+        async def send_payload(self, payload, webhook_url, idempotency_key, body=None):
+            assert body == self.encode_payload(payload)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            await asyncio.sleep(0.01 * (4 - payload.batch.seq))  # поздние чанки отвечают быстрее
+            self.in_flight -= 1
+            self.sent.append((payload.batch.seq, payload.batch.total, idempotency_key))
+            return payload.batch.seq != 2  # второй чанк не доставлен
+
+    prefs = MockPrefs()
+    client = MockWebhookClient()
+    monkeypatch.setattr(media, "tg_files_service", MockFiles())
+    monkeypatch.setattr(media, "prefs_service", prefs)
+    monkeypatch.setattr(media, "webhook_client", client)
+    monkeypatch.setattr(media.config, "get_webhook_url", lambda service: f"http://hook/{service}")
+    monkeypatch.setattr(media.config, "MAX_CREATIVES_PER_BATCH", 2)
+
+    messages = [MockMessage(i) for i in range(1, 6)]  # 5 креативов -> 3 чанка
+    asyncio.run(media.process_messages_batch(messages, 456, "debounce"))
+
+    assert client.max_in_flight == 3
+    assert sorted(seq for seq, _, _ in client.sent) == [1, 2, 3]
+    assert all(total == 3 for _, total, _ in client.sent)
+    batch_ids = {key.rsplit(".", 1)[0] for _, _, key in client.sent}
+    assert len(batch_ids) == 1
+    assert sorted(key.rsplit(".", 1)[1] for _, _, key in client.sent) == ["1", "2", "3"]
+    assert messages[0].answers == ["⚠️ Отправлено 2/3 пакетов на Drive"]
+    assert len(prefs.saved) == 1
+    assert '"seq":3' in prefs.saved[0]
+
+
+def _burst_harness(monkeypatch, debounce, hardcap, max_per_batch):
+    """Подготовить media к тесту burst-буфера; вернуть список сбросов (время, id сообщений)."""
+    import time
+    from app.handlers import media
+    from app.services.state import MemoryBufferStore
+    from app.utils.scheduler import DeadlineScheduler
+
+    flushes = []
+
+    async def fake_process(messages, user_id, grouping):
+        flushes.append((time.monotonic(), [m.message_id for m in messages]))
+
+    monkeypatch.setattr(media, "buffer_store", MemoryBufferStore())
+    monkeypatch.setattr(media, "flush_scheduler", DeadlineScheduler())
+    monkeypatch.setattr(media, "process_messages_batch", fake_process)
+    monkeypatch.setattr(media.config, "BURST_DEBOUNCE_SECS", debounce)
+    monkeypatch.setattr(media.config, "BURST_HARDCAP_SECS", hardcap)
+    monkeypatch.setattr(media.config, "MAX_CREATIVES_PER_BATCH", max_per_batch)
+    return media, flushes
+
+
+def _photo(message_id):
+    from aiogram.types import Message
+
+    return Message.model_validate({
+        "message_id": message_id,
+        "date": 1728910000,
+        "chat": {"id": 7, "type": "private"},
+        "from": {"id": 7, "is_bot": False, "first_name": "user"},
+        "photo": [{"file_id": f"f{message_id}", "file_unique_id": f"u{message_id}", "width": 1, "height": 1}],
+    })
+
+
+def test_burst_hardcap_bounds_latency_under_continuous_arrival(monkeypatch):
+    """Непрерывный поток фото не откладывает сброс дольше BURST_HARDCAP_SECS."""
+    import asyncio
+    import time
+
+    media, flushes = _burst_harness(monkeypatch, debounce=0.1, hardcap=0.25, max_per_batch=1000)
+    arrivals = {}
+
+    async def scenario():
+        # Фото каждые 20 мс — чаще debounce, поэтому без hard cap сброса не было бы
+        for i in range(1, 41):
+            arrivals[i] = time.monotonic()
+            await media.handle_single_photo(_photo(i))
+            await asyncio.sleep(0.02)
+        await asyncio.sleep(0.3)
+
+    asyncio.run(scenario())
+    assert len(flushes) >= 3
+    assert sorted(i for _, ids in flushes for i in ids) == list(range(1, 41))
+    for flushed_at, ids in flushes:
+        # От первого фото пачки до сброса — не больше hard cap (+ запас на планировщик)
+        assert flushed_at - arrivals[ids[0]] <= 0.25 + 0.08
+
+
+def test_burst_flushes_immediately_when_batch_is_full(monkeypatch):
+    """Пакет из MAX_CREATIVES_PER_BATCH фото уходит сразу, не дожидаясь таймера."""
+    import asyncio
+    import time
+
+    media, flushes = _burst_harness(monkeypatch, debounce=5, hardcap=10, max_per_batch=3)
+
+    async def scenario():
+        started = time.monotonic()
+        for i in range(1, 8):
+            await media.handle_single_photo(_photo(i))
+        await asyncio.sleep(0.05)
+        # Остаток (7-е фото) ждёт debounce
+        assert len(media.flush_scheduler) == 1
+        await media.flush_scheduler.stop()
+        return started
+
+    started = asyncio.run(scenario())
+    assert [ids for _, ids in flushes] == [[1, 2, 3], [4, 5, 6]]
+    assert all(flushed_at - started < 0.05 for flushed_at, _ in flushes)
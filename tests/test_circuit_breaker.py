@@ -0,0 +1,173 @@
+"""Тесты для circuit breaker."""
+import asyncio
+import httpx
+from app.utils.circuit_breaker import CircuitBreaker, CircuitBreakerRegistry
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_opens_after_threshold_and_recovers_through_half_open():
+    """closed → open после N ошибок, half_open после паузы, closed после успеха."""
+    clock = FakeClock()
+    breaker = CircuitBreaker("hook", failure_threshold=3, reset_timeout=10, clock=clock)
+
+    for _ in range(3):
+        assert breaker.allow_request()
+        breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow_request()
+    assert breaker.retry_after() == 10
+
+    clock.now = 10
+    assert breaker.state == "half_open"
+    assert breaker.allow_request()
+    assert not breaker.allow_request()  # только один пробный запрос
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.stats() == {"state": "closed", "failures": 0, "opened": 1, "rejected": 2}
+
+
+def test_half_open_failure_reopens():
+    """Ошибка пробного запроса снова открывает breaker на полную паузу."""
+    clock = FakeClock()
+    breaker = CircuitBreaker("hook", failure_threshold=1, reset_timeout=5, clock=clock)
+    breaker.record_failure()
+    clock.now = 5
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.retry_after() == 5
+    assert breaker.opened == 2
+
+
+def test_only_probe_result_changes_open_or_half_open_state():
+    """Ответ запроса, пропущенного до открытия, не закрывает breaker — только проба."""
+    clock = FakeClock()
+    breaker = CircuitBreaker("hook", failure_threshold=2, reset_timeout=10, clock=clock)
+
+    async def request(started: asyncio.Event, finish: asyncio.Event, ok: bool):
+        assert breaker.allow_request()
+        started.set()
+        await finish.wait()
+        breaker.record_success() if ok else breaker.record_failure()
+
+    async def scenario():
+        # Два медленных запроса пропущены, пока breaker закрыт
+        events = [(asyncio.Event(), asyncio.Event()) for _ in range(3)]
+        slow_ok = asyncio.create_task(request(*events[0], ok=True))
+        slow_fail = asyncio.create_task(request(*events[1], ok=False))
+        await events[0][0].wait()
+        await events[1][0].wait()
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.state == "open"
+
+        events[0][1].set()
+        await slow_ok
+        assert breaker.state == "open"
+
+        clock.now = 10
+        assert breaker.state == "half_open"
+        probe = asyncio.create_task(request(*events[2], ok=True))
+        await events[2][0].wait()
+        events[1][1].set()
+        await slow_fail
+        assert breaker.state == "half_open"
+
+        events[2][1].set()
+        await probe
+        assert breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_success_resets_consecutive_failures_and_zero_threshold_disables():
+    """Успех обнуляет счётчик ошибок; порог 0 выключает breaker."""
+    breaker = CircuitBreaker("hook", failure_threshold=2, reset_timeout=5)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+    disabled = CircuitBreaker("hook", failure_threshold=0, reset_timeout=5)
+    for _ in range(10):
+        disabled.record_failure()
+    assert disabled.allow_request()
+    assert disabled.state == "closed"
+
+
+def test_open_breaker_fails_fast_without_retries(monkeypatch):
+    """При открытом breaker отправка завершается без запросов и пауз."""
+    from app.services import webhook_client as module
+    from app.services.webhook_client import WebhookClient, close_http_client
+
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(503)
+
+    async def scenario():
+        monkeypatch.setattr(module, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        client = WebhookClient(breakers=CircuitBreakerRegistry(failure_threshold=2, reset_timeout=60))
+        client.max_retries = 5
+        client.retry_backoff = 0.01
+        chat = {"chat_id": 1, "type": "private", "title": None}
+        from_ = {"user_id": 1, "username": None}
+        first = await client.send_texts(["a"], "http://hook/a", "drive", chat, from_)
+        sent_before = len(requests)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        second = await client.send_texts(["b"], "http://hook/a", "drive", chat, from_)
+        elapsed = loop.time() - started
+        await close_http_client()
+        return client, first, second, sent_before, elapsed
+
+    client, first, second, sent_before, elapsed = asyncio.run(scenario())
+    assert first is False and second is False
+    assert sent_before == 2  # breaker открылся после второй ошибки, остальные повторы не выполнялись
+    assert len(requests) == 2
+    assert elapsed < 0.05
+    assert client.breaker_stats()["http://hook/a"]["state"] == "open"
+
+
+def test_outbox_defers_deliveries_while_breaker_open(db_engine, monkeypatch):
+    """Outbox откладывает доставку при открытом breaker, не расходуя попытки."""
+    from datetime import datetime
+    from app.models.repository import OutboxRepository
+    from app.services import webhook_client as module
+    from app.services.outbox import WebhookOutbox
+    from app.services.webhook_client import WebhookClient, close_http_client
+
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200)
+
+    async def scenario():
+        monkeypatch.setattr(module, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        client = WebhookClient(breakers=CircuitBreakerRegistry(failure_threshold=1, reset_timeout=60))
+        client.breaker("http://hook/a").record_failure()
+        outbox = WebhookOutbox(client, workers=1, poll_interval=0.01, max_attempts=1)
+        await outbox.start()
+        await outbox.enqueue("http://hook/a", "{}", "batch.1", "payload")
+        await asyncio.sleep(0.1)
+        await outbox.stop()
+        stats = await outbox.stats()
+        items = await OutboxRepository().claim_due(10, datetime.max)
+        await close_http_client()
+        return stats, items
+
+    stats, items = asyncio.run(scenario())
+    assert requests == []
+    assert stats["deferred"] == 1
+    assert stats["failed_total"] == 0
+    assert stats["circuit_breakers"]["http://hook/a"]["state"] == "open"
+    assert [item.attempts for item in items] == [0]
@@ -0,0 +1,82 @@
+"""Тесты для адаптивных окон debounce."""
+import pytest
+from app.utils.debounce import AdaptiveDebounce
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def feed(debounce, clock, key, user_id, gaps, default):
+    for gap in gaps:
+        clock.now += gap
+        debounce.observe(key, user_id, default)
+
+
+def test_default_until_enough_samples():
+    """Без истории окно равно значению по умолчанию."""
+    clock = FakeClock()
+    debounce = AdaptiveDebounce(0.3, clock=clock)
+    assert debounce.window("album", 1, 1.5) == 1.5
+    feed(debounce, clock, "album:g", 1, [0, 0.05, 0.05], 1.5)
+    assert debounce.window("album", 1, 1.5) == 1.5
+
+
+def test_window_shrinks_for_fast_albums_within_bounds():
+    """Быстрые альбомы сжимают окно, но не ниже минимума; отключённый режим — default."""
+    clock = FakeClock()
+    debounce = AdaptiveDebounce(0.3, clock=clock)
+    feed(debounce, clock, "album:g", 1, [0] + [0.05] * 12, 1.5)
+    assert debounce.window("album", 1, 1.5) == 0.3
+    # Новый пользователь ждёт полное окно
+    assert debounce.window("album", 2, 1.5) == 1.5
+    # Окно не превышает default, даже если он меньше минимума
+    assert debounce.window("album", 1, 0.1) == 0.1
+    assert AdaptiveDebounce(0.3, enabled=False, clock=clock).window("album", 1, 1.5) == 1.5
+
+
+def test_slow_user_gets_wider_window():
+    """Рваные интервалы пользователя расширяют его окно."""
+    clock = FakeClock()
+    debounce = AdaptiveDebounce(0.3, clock=clock)
+    feed(debounce, clock, "burst:1", 1, [0] + [0.05] * 12, 2.0)
+    feed(debounce, clock, "burst:2", 2, [0] + [0.2, 0.5, 0.4, 0.3] * 3, 2.0)
+    assert debounce.window("burst", 1, 2.0) == 0.3
+    assert debounce.window("burst", 2, 2.0) == pytest.approx(1.5)
+
+
+def test_album_split_is_counted_and_widens_window():
+    """Фото альбома после сброса считается разрывом, его интервал учитывается."""
+    clock = FakeClock()
+    debounce = AdaptiveDebounce(0.3, clock=clock)
+    feed(debounce, clock, "album:g", 1, [0] + [0.05] * 10, 1.5)
+    narrow = debounce.window("album", 1, 1.5)
+    clock.now += 0.3
+    assert debounce.flushed("album:g") == pytest.approx(0.8)
+    assert debounce.flushed("album:g") is None
+    feed(debounce, clock, "album:g", 1, [0.5], 1.5)
+    assert debounce.splits == 1
+    assert debounce.window("album", 1, 1.5) > narrow
+    stats = debounce.stats()
+    assert stats["flush_latency"]["album"]["count"] == 1
+    assert stats["splits"] == 1
+
+
+def test_bench_profiles_have_no_album_splits():
+    """Настройки по умолчанию не разрывают альбомы на профилях из bench_debounce.
+
+    Включённое адаптивное окно с нижней границей DEBOUNCE_MIN_SECS тоже
+    не должно давать разрывов там, где их нет у фиксированного окна.
+    """
+    import random
+    from benchmarks.bench_debounce import make_gaps, simulate
+    from app.utils.env import config
+
+    gaps = make_gaps(random.Random(1), users=200, albums=30, photos=6)
+    assert simulate(gaps, adaptive=False)["splits"] == 0
+    assert simulate(gaps, adaptive=config.ADAPTIVE_DEBOUNCE_ENABLED)["splits"] == 0
+    assert simulate(gaps, adaptive=True)["splits"] == 0
@@ -0,0 +1,70 @@
+"""Тесты для разбора Excel."""
+import asyncio
+from io import BytesIO
+import httpx
+from openpyxl import Workbook
+from app.services import webhook_client as webhook_module
+from app.services.excel import aiter_excel_texts, download_to_spool, extract_texts_from_rows
+from app.services.webhook_client import close_http_client
+
+
+def make_workbook() -> bytes:
+    """Книга с двумя листами, заголовками, пустыми ячейками и пробелами."""
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Заголовок", "Колонка"])
+    ws.append(["  первый  ", None])
+    ws.append([None, 42])
+    second = wb.create_sheet("Лист2")
+    second.append(["Заголовок"])
+    second.append(["   "])
+    second.append(["второй"])
+    data = BytesIO()
+    wb.save(data)
+    return data.getvalue()
+
+
+def test_extract_texts_skips_header_and_empty_cells():
+    """Первая строка и пустые ячейки пропускаются."""
+    rows = [("h1", "h2"), ("a", None), (" ", "b "), (3.5, "")]
+    assert list(extract_texts_from_rows(rows)) == ["a", "b", "3.5"]
+
+
+def test_aiter_excel_texts_yields_batches():
+    """Тексты всех листов отдаются пачками в исходном порядке."""
+    async def scenario():
+        return [batch async for batch in aiter_excel_texts(BytesIO(make_workbook()), batch_size=2)]
+
+    batches = asyncio.run(scenario())
+    assert batches == [["первый", "42"], ["второй"]]
+
+
+def test_aiter_excel_texts_raises_parse_errors():
+    """Ошибка разбора доходит до потребителя."""
+    async def scenario():
+        return [batch async for batch in aiter_excel_texts(BytesIO(b"not an xlsx"))]
+
+    try:
+        asyncio.run(scenario())
+    except Exception:
+        pass
+    else:
+        raise AssertionError("ожидалась ошибка разбора")
+
+
+def test_download_to_spool(monkeypatch):
+    """Файл скачивается потоком и возвращается с начала."""
+    content = make_workbook()
+    monkeypatch.setattr(
+        webhook_module, "_http_client",
+        httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, content=content)))
+    )
+
+    async def scenario():
+        spool = await download_to_spool("http://files/book.xlsx", max_memory=1024)
+        await close_http_client()
+        return spool
+
+    spool = asyncio.run(scenario())
+    assert spool.read() == content
+    spool.close()
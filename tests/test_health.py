@@ -0,0 +1,102 @@
+"""Тесты для фоновой проверки вебхуков."""
+import asyncio
+from app.services.health import WebhookHealthProber
+
+
+class FakeClient:
+    """Клиент, возвращающий заданные статусы ping по очереди."""
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.pings = 0
+
+    async def ping(self, url):
+        self.pings += 1
+        return self.statuses.pop(0)
+
+
+def test_probe_records_status_and_consecutive_failures():
+    """Состояние хранит последний статус, задержку и ошибки подряд."""
+    client = FakeClient([200, 500, None, 204])
+    prober = WebhookHealthProber(client, states={})
+    failures = []
+
+    async def scenario():
+        for _ in range(4):
+            health = await prober.probe("http://hook/a")
+            failures.append(health.consecutive_failures)
+
+    asyncio.run(scenario())
+    assert failures == [0, 1, 2, 0]
+    health = prober.get("http://hook/a")
+    assert health.healthy and health.last_status == 204
+    assert health.consecutive_failures == 0
+    assert health.last_latency is not None and health.age is not None
+    assert prober.get("http://hook/b") is None
+
+
+def test_consecutive_failures_accumulate():
+    """Ошибки подряд считаются до первого успешного ответа."""
+    prober = WebhookHealthProber(FakeClient([]), states={})
+    prober.record("http://hook/a", 200, 0.01)
+    prober.record("http://hook/a", 502, 0.02)
+    health = prober.record("http://hook/a", None, 25.0)
+    assert not health.healthy
+    assert health.consecutive_failures == 2
+    assert health.last_status is None
+
+
+def test_background_prober_checks_configured_webhooks(monkeypatch):
+    """Запущенный prober проверяет все настроенные URL, хендлеры читают кэш."""
+    from app.utils.env import Config
+
+    for name in ("WEBHOOK_DRIVE", "WEBHOOK_SAMOKATY", "WEBHOOK_PROKAT",
+                 "WEBHOOK_DRIVE_TEXT", "WEBHOOK_SAMOKATY_TEXT", "WEBHOOK_PROKAT_TEXT"):
+        monkeypatch.setattr(Config, name, "")
+    monkeypatch.setattr(Config, "WEBHOOK_DRIVE", "http://hook/drive")
+    monkeypatch.setattr(Config, "WEBHOOK_DRIVE_TEXT", "http://hook/drive-text")
+    client = FakeClient([200] * 100)
+    states = {}
+    prober = WebhookHealthProber(client, interval=0.01, states=states)
+    reader = WebhookHealthProber(client, states=states)
+
+    async def scenario():
+        prober.start()
+        await asyncio.sleep(0.05)
+        await prober.stop()
+
+    asyncio.run(scenario())
+    assert set(states) == {"http://hook/drive", "http://hook/drive-text"}
+    pings = client.pings
+    assert reader.get("http://hook/drive").healthy
+    assert client.pings == pings  # чтение состояния не делает запросов
+
+
+def test_zero_interval_disables_background_probe():
+    """HEALTH_PROBE_INTERVAL_SECS=0 выключает фоновую проверку, а не подставляет значение по умолчанию."""
+    client = FakeClient([200] * 10)
+    prober = WebhookHealthProber(client, interval=0, states={})
+
+    async def scenario():
+        prober.start()
+        await asyncio.sleep(0.02)
+        return prober._task
+
+    assert not prober.enabled
+    assert asyncio.run(scenario()) is None
+    assert client.pings == 0
+
+
+def test_ping_rejection_is_not_reported_as_down(monkeypatch, caplog):
+    """4xx на ping — вебхук отвечает; предупреждение только для 5xx и нет ответа."""
+    from app.handlers import media
+
+    prober = WebhookHealthProber(FakeClient([]), states={})
+    prober.record("http://hook/text", 405, 0.01)
+    prober.record("http://hook/down", 503, 0.01)
+    monkeypatch.setattr(media, "health_prober", prober)
+    with caplog.at_level("WARNING"):
+        media.log_webhook_health("http://hook/text")
+        media.log_webhook_health("http://hook/down")
+    warned = [r.getMessage() for r in caplog.records if r.levelname == "WARNING"]
+    assert len(warned) == 1 and "http://hook/down" in warned[0]
@@ -0,0 +1,96 @@
+"""Тесты настройки логирования."""
+import io
+import json
+import logging
+from app.utils import logging as app_logging
+from app.utils.env import config
+from app.utils.logging import JsonFormatter, LogQueueHandler, TokenMaskingFormatter, mask_tokens
+
+TOKEN = "123456:AAH-secret_Token"
+
+
+def make_record(msg: str, *args) -> logging.LogRecord:
+    return logging.LogRecord("test", logging.INFO, __file__, 1, msg, args, None)
+
+
+def test_mask_tokens():
+    assert mask_tokens(f"GET https://api.telegram.org/bot{TOKEN}/getMe") == (
+        "GET https://api.telegram.org/bot***MASKED***/getMe"
+    )
+    assert mask_tokens("без токена") == "без токена"
+
+
+def test_text_formatter_masks_lazy_args():
+    formatter = TokenMaskingFormatter(fmt="%(levelname)s %(message)s")
+    assert formatter.format(make_record("url %s", f"/file/bot{TOKEN}/a.jpg")) == "INFO url /file/bot***MASKED***/a.jpg"
+
+
+def test_json_formatter():
+    line = JsonFormatter().format(make_record("✅ %s на %s", "Отправлено", f"https://x/bot{TOKEN}"))
+    entry = json.loads(line)
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "test"
+    assert entry["message"] == "✅ Отправлено на https://x/bot***MASKED***"
+    assert entry["ts"].endswith("+00:00")
+
+
+def test_json_formatter_exception():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.LogRecord("test", logging.ERROR, __file__, 1, "fail", (), __import__("sys").exc_info())
+    entry = json.loads(JsonFormatter().format(record))
+    assert "ValueError: boom" in entry["exc_info"]
+
+
+def test_queue_logging_writes_in_background(monkeypatch):
+    stream = io.StringIO()
+    monkeypatch.setattr(type(config), "LOG_QUEUE_ENABLED", True)
+    monkeypatch.setattr(type(config), "LOG_FORMAT", "json")
+    monkeypatch.setattr(logging.StreamHandler, "__init__", _stream_init(stream))
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    try:
+        app_logging.setup_logging()
+        assert any(isinstance(h, LogQueueHandler) for h in root.handlers)
+        logging.getLogger("app.test").info("📦 Обработан burst пользователя %s", 42)
+        app_logging.shutdown_logging()
+        entry = json.loads(stream.getvalue().strip())
+        assert entry["message"] == "📦 Обработан burst пользователя 42"
+        assert entry["logger"] == "app.test"
+    finally:
+        app_logging.shutdown_logging()
+        root.handlers[:] = saved_handlers
+        root.setLevel(saved_level)
+
+
+def test_shutdown_restores_direct_handler(monkeypatch):
+    """После остановки слушателя записи идут напрямую в поток, а не в очередь."""
+    stream = io.StringIO()
+    monkeypatch.setattr(type(config), "LOG_QUEUE_ENABLED", True)
+    monkeypatch.setattr(type(config), "LOG_FORMAT", "text")
+    monkeypatch.setattr(logging.StreamHandler, "__init__", _stream_init(stream))
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    try:
+        app_logging.setup_logging()
+        logging.getLogger("app.test").info("до остановки")
+        app_logging.shutdown_logging()
+        assert not any(isinstance(h, LogQueueHandler) for h in root.handlers)
+        logging.getLogger("app.test").info("👋 Бот остановлен")
+        lines = stream.getvalue().splitlines()
+        assert lines[0].endswith("до остановки")
+        assert lines[1].endswith("👋 Бот остановлен")
+    finally:
+        app_logging.shutdown_logging()
+        root.handlers[:] = saved_handlers
+        root.setLevel(saved_level)
+
+
+def _stream_init(stream):
+    original = logging.StreamHandler.__init__
+
+    def init(self, _stream=None):
+        original(self, stream)
+
+    return init
@@ -0,0 +1,66 @@
+"""Тесты для мониторинга event loop."""
+import asyncio
+import time
+from app.utils.loop_monitor import LOOP_LAG_QUANTILE, LoopMonitor
+
+
+def test_slow_callback_names_blocking_coroutine():
+    """Блокирующий шаг задачи попадает в отчёт с именем корутины и строкой."""
+    monitor = LoopMonitor(interval=0, lag_threshold=0, slow_callback=0.03)
+    original = asyncio.Handle._run
+
+    async def blocking_handler():
+        time.sleep(0.06)  # синхронная работа в event loop
+        await asyncio.sleep(0)
+
+    async def run():
+        monitor.start()
+        try:
+            await asyncio.create_task(blocking_handler(), name="handler-task")
+            await asyncio.sleep(0.01)  # быстрые колбэки не считаются
+        finally:
+            await monitor.stop()
+
+    asyncio.run(run())
+    assert asyncio.Handle._run is original
+    assert monitor.slow_callbacks == 1
+    assert monitor.worst_duration >= 0.06
+    assert "handler-task" in monitor.worst_callback
+    assert "blocking_handler" in monitor.worst_callback
+    assert "test_loop_monitor.py" in monitor.worst_callback
+
+
+def test_lag_sampler_records_stall():
+    """Сэмплер замечает остановку цикла и отдаёт перцентили в метрики."""
+    monitor = LoopMonitor(interval=0.01, lag_threshold=0.05, slow_callback=0)
+
+    async def run():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        time.sleep(0.1)
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    asyncio.run(run())
+    stats = monitor.stats()
+    assert stats["lag"]["count"] >= 3
+    assert stats["lag"]["max"] >= 0.08
+    assert stats["slow_callbacks"] == 0
+    monitor.collect_metrics()
+    assert LOOP_LAG_QUANTILE.value(quantile="1") >= 0.08
+
+
+def test_slow_callback_detector_is_opt_in():
+    """По умолчанию (SLOW_CALLBACK_SECS=0) Handle._run не подменяется."""
+    from app.utils.env import Config
+
+    assert Config.SLOW_CALLBACK_SECS == 0
+    monitor = LoopMonitor(interval=0)
+    original = asyncio.Handle._run
+
+    async def run():
+        monitor.start()
+        assert asyncio.Handle._run is original
+        await monitor.stop()
+
+    asyncio.run(run())
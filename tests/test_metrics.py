@@ -0,0 +1,97 @@
+"""Тесты для метрик Prometheus."""
+import asyncio
+import httpx
+import pytest
+from app.services import webhook_client as webhook_module
+from app.services.metrics_server import MetricsServer
+from app.services.webhook_client import WebhookClient, close_http_client
+from app.utils.metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+
+def test_render_text_format():
+    """Счётчики, gauge и гистограммы с накопительными корзинами."""
+    registry = MetricsRegistry()
+    requests = registry.register(Counter("requests_total", "Запросы", ["status"]))
+    depth = registry.register(Gauge("depth", "Глубина"))
+    latency = registry.register(Histogram("latency_seconds", "Задержка", buckets=(0.1, 1.0)))
+    requests.inc(status="200")
+    requests.inc(2, status="500")
+    depth.set_function(lambda: 7)
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+
+    text = asyncio.run(registry.render())
+
+    assert '# TYPE requests_total counter' in text
+    assert 'requests_total{status="200"} 1' in text
+    assert 'requests_total{status="500"} 2' in text
+    assert 'depth 7' in text
+    assert 'latency_seconds_bucket{le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{le="1.0"} 3' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+    assert 'latency_seconds_count 4' in text
+    assert 'latency_seconds_sum 3.65' in text
+
+
+def test_labels_are_validated():
+    """Неверный набор меток и повторная регистрация — ошибка."""
+    registry = MetricsRegistry()
+    metric = registry.register(Counter("c_total", "c", ["service"]))
+    with pytest.raises(ValueError):
+        metric.inc(status="200")
+    with pytest.raises(ValueError):
+        registry.register(Counter("c_total", "c"))
+
+
+def test_webhook_client_records_retries_and_failures(monkeypatch):
+    """Повторы, неудачные попытки и итог отправки попадают в метрики клиента."""
+    responses = iter([503, 200])
+
+    def handler(request):
+        return httpx.Response(next(responses))
+
+    monkeypatch.setattr(webhook_module, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(type(webhook_module.config), "WEBHOOK_DRIVE", "https://hooks.test/drive")
+    client = WebhookClient()
+    client.retry_backoff = 0
+
+    retries = webhook_module.WEBHOOK_RETRIES.value(service="drive")
+    failures = webhook_module.WEBHOOK_FAILURES.value(service="drive", reason="status")
+    ok = webhook_module.WEBHOOK_DELIVERIES.value(service="drive", result="ok")
+    observed = webhook_module.WEBHOOK_REQUEST_SECONDS.count(service="drive", status="503")
+
+    async def run():
+        try:
+            return await client._send_with_retries(
+                "https://hooks.test/drive", client._headers(), b"{}", "payload", "ok"
+            )
+        finally:
+            await close_http_client()
+
+    assert asyncio.run(run())
+    assert webhook_module.WEBHOOK_RETRIES.value(service="drive") == retries + 1
+    assert webhook_module.WEBHOOK_FAILURES.value(service="drive", reason="status") == failures + 1
+    assert webhook_module.WEBHOOK_DELIVERIES.value(service="drive", result="ok") == ok + 1
+    assert webhook_module.WEBHOOK_REQUEST_SECONDS.count(service="drive", status="503") == observed + 1
+    assert webhook_module.WEBHOOK_IN_FLIGHT.value(service="drive") == 0
+
+
+def test_metrics_server_serves_registry():
+    """GET /metrics отдаёт реестр процесса, включая размеры состояния."""
+    import app.handlers.media  # noqa: F401 — регистрирует структуры состояния
+
+    async def run():
+        server = MetricsServer(host="127.0.0.1", port=0)
+        await server.start()
+        try:
+            async with httpx.AsyncClient() as client:
+                response = await client.get(f"http://127.0.0.1:{server.port}/metrics")
+        finally:
+            await server.stop()
+        return response
+
+    response = asyncio.run(run())
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE webhook_request_seconds histogram" in response.text
+    assert 'state_entries{structure="buffers"}' in response.text
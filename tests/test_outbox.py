@@ -0,0 +1,218 @@
+"""Тесты для очереди доставок на вебхуки."""
+import asyncio
+from datetime import datetime
+import httpx
+from app.models.repository import OutboxRepository
+from app.services import webhook_client as webhook_module
+from app.services.outbox import WebhookOutbox
+from app.services.webhook_client import WebhookClient, close_http_client
+
+
+def make_outbox(monkeypatch, statuses, **kwargs):
+    """Outbox с HTTP-транспортом, отвечающим статусами из списка по очереди."""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        status = statuses.pop(0) if statuses else 200
+        return httpx.Response(status)
+
+    monkeypatch.setattr(
+        webhook_module, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+    client = WebhookClient()
+    client.retry_backoff = 0.01
+    outbox = WebhookOutbox(client, workers=2, poll_interval=0.01, **kwargs)
+    return outbox, requests
+
+
+async def wait_for(predicate, timeout=2.0):
+    """Дождаться выполнения условия."""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "условие не выполнено"
+        await asyncio.sleep(0.01)
+
+
+def test_enqueue_is_idempotent(db_engine, monkeypatch):
+    """Повторная постановка с тем же ключом не создаёт дубль."""
+    outbox, _ = make_outbox(monkeypatch, [])
+
+    async def scenario():
+        first = await outbox.enqueue("http://hook/a", '{"a": 1}', "batch.1", "payload")
+        second = await outbox.enqueue("http://hook/a", '{"a": 1}', "batch.1", "payload")
+        stats = await outbox.stats()
+        await close_http_client()
+        return first, second, stats
+
+    first, second, stats = asyncio.run(scenario())
+    assert first is True
+    assert second is False
+    assert stats["queue_depth"] == 1
+
+
+def test_worker_retries_until_delivered(db_engine, monkeypatch):
+    """Воркер повторяет неуспешную доставку и передаёт ключ идемпотентности."""
+    outbox, requests = make_outbox(monkeypatch, [503, 500, 200])
+
+    async def scenario():
+        await outbox.start()
+        await outbox.enqueue("http://hook/a", '{"texts": ["a"]}', "msg.1", "texts")
+        await wait_for(lambda: outbox.delivered == 1)
+        await outbox.stop()
+        stats = await outbox.stats()
+        await close_http_client()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert len(requests) == 3
+    assert all(r.headers["X-Idempotency-Key"] == "msg.1" for r in requests)
+    assert requests[-1].content == b'{"texts": ["a"]}'
+    assert stats["queue_depth"] == 0
+    assert stats["delivery_latency"]["count"] == 1
+
+
+def test_worker_gives_up_after_max_attempts(db_engine, monkeypatch):
+    """После max_attempts доставка помечается неуспешной."""
+    outbox, requests = make_outbox(monkeypatch, [500] * 10, max_attempts=2)
+
+    async def scenario():
+        await outbox.start()
+        await outbox.enqueue("http://hook/a", "{}", "batch.1", "payload")
+        await wait_for(lambda: outbox.failed == 1)
+        await outbox.stop()
+        stats = await outbox.stats()
+        await close_http_client()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert len(requests) == 2
+    assert stats["failed_total"] == 1
+    assert stats["queue_depth"] == 0
+
+
+def test_interrupted_deliveries_are_requeued(db_engine, monkeypatch):
+    """Доставки, взятые в работу до перезапуска, отправляются после старта."""
+    outbox, requests = make_outbox(monkeypatch, [])
+    repo = OutboxRepository()
+
+    async def scenario():
+        await repo.add("batch.1", "http://hook/a", "payload", "{}")
+        claimed = await repo.claim_due(10, datetime.utcnow())
+        assert [item.idempotency_key for item in claimed] == ["batch.1"]
+        # «Падение» процесса: строка осталась in_flight
+        await outbox.start()
+        await wait_for(lambda: outbox.delivered == 1)
+        await outbox.stop()
+        await close_http_client()
+
+    asyncio.run(scenario())
+    assert len(requests) == 1
+
+
+def test_text_batches_with_same_message_id_in_different_chats(db_engine, monkeypatch):
+    """message_id уникален только в чате: одинаковые id из разных чатов не схлопываются."""
+    from aiogram.types import Message
+    from app.handlers import media
+    from app.models.repository import UserContext
+
+    outbox, _ = make_outbox(monkeypatch, [])
+    answers = []
+
+    async def fake_context(user_id):
+        return UserContext("drive")
+
+    async def fake_answer(self, text, **kwargs):
+        answers.append((self.chat.id, text))
+
+    monkeypatch.setattr(media, "outbox", outbox)
+    monkeypatch.setattr(media.prefs_service, "get_user_context", fake_context)
+    monkeypatch.setattr(type(media.config), "OUTBOX_ENABLED", True)
+    monkeypatch.setattr(type(media.config), "get_text_webhook_url", classmethod(lambda cls, service: "http://hook/t"))
+    monkeypatch.setattr(Message, "answer", fake_answer)
+
+    def text_message(chat_id):
+        return Message.model_validate({
+            "message_id": 42,
+            "date": 1728910000,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "user"},
+            "text": "строка",
+        })
+
+    async def scenario():
+        await media.handle_texts(text_message(1))
+        await media.handle_texts(text_message(2))
+        # Повторная доставка того же update — дубль
+        await media.handle_texts(text_message(2))
+        stats = await outbox.stats()
+        await close_http_client()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats["queue_depth"] == 2
+    assert answers[0][1].startswith("📥") and answers[1][1].startswith("📥")
+    assert answers[2] == (2, "♻️ Эти тексты уже поставлены в очередь на отправку")
+
+
+def test_purge_removes_old_finished_deliveries(db_engine, monkeypatch):
+    """purge удаляет доставленные и неуспешные записи старше retention, очередь не трогает."""
+    from datetime import timedelta
+    from app.models.database import run_in_db
+
+    outbox, _ = make_outbox(monkeypatch, [], retention=3600)
+    repo = OutboxRepository()
+    old = datetime.utcnow() - timedelta(hours=2)
+
+    async def scenario():
+        for key in ("old-delivered", "old-failed", "new-delivered", "pending"):
+            await repo.add(key, "http://hook/a", "payload", "{}")
+        items = {item.idempotency_key: item.id for item in await repo.claim_due(10, datetime.utcnow())}
+        await repo.mark_delivered(items["old-delivered"], 1, old)
+        await repo.mark_failed(items["old-failed"], 8, "delivery failed")
+        await run_in_db(repo._update, items["old-failed"], created_at=old)
+        await repo.mark_delivered(items["new-delivered"], 1, datetime.utcnow())
+        await repo.mark_retry(items["pending"], 1, datetime.utcnow(), "delivery failed")
+        assert await outbox.finished_count() == 3
+        removed = await outbox.purge()
+        counts = await repo.counts()
+        await close_http_client()
+        return removed, counts
+
+    removed, counts = asyncio.run(scenario())
+    assert removed == 2
+    assert counts == {"delivered": 1, "pending": 1}
+
+
+def test_worker_survives_repository_errors(db_engine, monkeypatch):
+    """Сбой mark_delivered не убивает воркер: доставка возвращается в очередь, следующие уходят."""
+    outbox, requests = make_outbox(monkeypatch, [])
+    outbox.workers = 1
+    repo = outbox._repo
+    original = repo.mark_delivered
+    failures = []
+
+    async def flaky_mark_delivered(item_id, attempts, now):
+        if not failures:
+            failures.append(item_id)
+            raise RuntimeError("database is locked")
+        await original(item_id, attempts, now)
+
+    monkeypatch.setattr(repo, "mark_delivered", flaky_mark_delivered)
+
+    async def scenario():
+        await outbox.start()
+        for n in range(3):
+            await outbox.enqueue("http://hook/a", '{"n": %d}' % n, f"batch.{n}", "payload")
+        await wait_for(lambda: outbox.delivered == 3)
+        stats = await outbox.stats()
+        await outbox.stop()
+        await close_http_client()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert len(failures) == 1
+    # Первая доставка отправлена повторно с тем же ключом, остальные — по разу
+    keys = [r.headers["X-Idempotency-Key"] for r in requests]
+    assert sorted(keys) == ["batch.0", "batch.0", "batch.1", "batch.2"]
+    assert stats["queue_depth"] == 0
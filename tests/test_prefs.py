@@ -0,0 +1,174 @@
+"""Тесты для сервиса предпочтений."""
+import asyncio
+import time
+from app.models.repository import PrefsRepository
+from app.services.prefs import PreferencesService
+from app.utils.cache import TTLCache
+from app.utils.env import config
+
+
+def test_get_user_service_creates_default(db_engine):
+    """Новый пользователь получает сервис по умолчанию."""
+    prefs = PreferencesService(cache=TTLCache(maxsize=10))
+
+    async def scenario():
+        assert await prefs.get_user_service(1) == config.DEFAULT_SERVICE
+        assert await prefs.get_user_placement(1) is None
+
+    asyncio.run(scenario())
+
+
+def test_cache_hits_after_first_read(db_engine):
+    """Повторные чтения не обращаются к БД."""
+    cache = TTLCache(maxsize=10)
+    prefs = PreferencesService(cache=cache)
+
+    async def scenario():
+        await prefs.set_user_service(1, "prokat")
+        cache.hits = cache.misses = 0
+        assert await prefs.get_user_service(1) == "prokat"
+        assert await prefs.get_user_placement(1) is None
+
+    asyncio.run(scenario())
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 0
+
+
+def test_write_through_shared_between_instances(db_engine):
+    """Запись через один экземпляр видна другому через общий кэш."""
+    cache = TTLCache(maxsize=10)
+    commands_prefs = PreferencesService(cache=cache)
+    media_prefs = PreferencesService(cache=cache)
+
+    async def scenario():
+        assert await media_prefs.get_user_service(7) == config.DEFAULT_SERVICE
+        await commands_prefs.set_user_service(7, "samokaty")
+        await commands_prefs.set_user_placement(7, "Телеграм-канал")
+        assert await media_prefs.get_user_service(7) == "samokaty"
+        assert await media_prefs.get_user_placement(7) == "Телеграм-канал"
+
+    asyncio.run(scenario())
+
+
+def test_warm_cache(db_engine):
+    """Прогрев загружает существующие записи в кэш."""
+    cache = TTLCache(maxsize=10)
+    prefs = PreferencesService(cache=cache)
+
+    async def scenario():
+        await PreferencesService(cache=TTLCache(maxsize=10)).set_user_service(3, "prokat")
+        assert await prefs.warm_cache() == 1
+        assert await prefs.get_user_service(3) == "prokat"
+
+    asyncio.run(scenario())
+    assert cache.misses == 0
+
+
+def test_last_payload_roundtrip(db_engine):
+    """Последний payload сохраняется и перезаписывается."""
+    prefs = PreferencesService(cache=TTLCache(maxsize=10))
+
+    async def scenario():
+        assert await prefs.get_last_payload(5) is None
+        await prefs.save_last_payload(5, '{"seq": 1}')
+        await prefs.save_last_payload(5, '{"seq": 2}')
+        return await prefs.get_last_payload(5)
+
+    assert asyncio.run(scenario()) == '{"seq": 2}'
+
+
+def test_event_loop_responsive_during_slow_writes(db_engine):
+    """Медленная запись в БД не блокирует event loop."""
+    class SlowRepository(PrefsRepository):
+        def _set_service(self, user_id, service):
+            time.sleep(0.3)  # имитация медленного fsync
+            return super()._set_service(user_id, service)
+
+    prefs = PreferencesService(cache=TTLCache(maxsize=10), repository=SlowRepository())
+
+    async def scenario():
+        ticks = []
+        stop = asyncio.Event()
+
+        async def ticker():
+            while not stop.is_set():
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.01)
+
+        ticker_task = asyncio.create_task(ticker())
+        await asyncio.gather(*(prefs.set_user_service(i, "prokat") for i in range(3)))
+        stop.set()
+        await ticker_task
+        return ticks
+
+    ticks = asyncio.run(scenario())
+    max_gap = max(b - a for a, b in zip(ticks, ticks[1:]))
+    assert len(ticks) > 30
+    assert max_gap < 0.1
+
+
+def test_get_user_context_read_only_for_existing_user(db_engine):
+    """Промах кэша для существующего пользователя — один SELECT без записи."""
+    from sqlalchemy import event
+
+    statements = []
+    event.listen(db_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    cache = TTLCache(maxsize=10)
+    prefs = PreferencesService(cache=cache)
+
+    assert asyncio.run(prefs.get_user_context(11)) == (config.DEFAULT_SERVICE, None)
+    assert len(statements) == 2
+    assert statements[0].lstrip().startswith("SELECT")
+    assert "ON CONFLICT" in statements[1] and "DO NOTHING" in statements[1]
+
+    statements.clear()
+    cache.clear()
+    assert asyncio.run(prefs.get_user_context(11)) == (config.DEFAULT_SERVICE, None)
+    assert len(statements) == 1
+    assert statements[0].lstrip().startswith("SELECT")
+
+
+def test_get_or_create_falls_back_to_select_on_conflict(db_engine, monkeypatch):
+    """Если строку создали между SELECT и INSERT, возвращается существующая запись."""
+    repo = PrefsRepository()
+    asyncio.run(repo.set_service(12, "prokat"))
+    original = PrefsRepository._select_prefs
+    calls = []
+
+    def select_once_empty(self, session, user_id):
+        calls.append(user_id)
+        return None if len(calls) == 1 else original(self, session, user_id)
+
+    monkeypatch.setattr(PrefsRepository, "_select_prefs", select_once_empty)
+    assert asyncio.run(repo.get_or_create(12, "drive")) == ("prokat", None)
+    assert len(calls) == 2
+
+
+def test_setters_upsert_existing_and_new_rows(db_engine):
+    """set_* создают запись при отсутствии и не затирают другие поля."""
+    cache = TTLCache(maxsize=10)
+    prefs = PreferencesService(cache=cache)
+
+    async def scenario():
+        await prefs.set_user_placement(21, "Instagram аккаунт")
+        await prefs.set_user_service(21, "prokat")
+        cache.clear()
+        return await prefs.get_user_context(21)
+
+    assert asyncio.run(scenario()) == ("prokat", "Instagram аккаунт")
+
+
+def test_cache_ttl_capped_for_shared_backend(monkeypatch):
+    """При STATE_BACKEND=sqlite кэш предпочтений не держит записи дольше PREFS_CACHE_SHARED_TTL_SECS."""
+    from app.services.prefs import prefs_cache_ttl
+
+    monkeypatch.setattr(type(config), "PREFS_CACHE_SHARED_TTL_SECS", 5.0)
+    monkeypatch.setattr(type(config), "PREFS_CACHE_TTL_SECS", 3600.0)
+    monkeypatch.setattr(type(config), "STATE_BACKEND", "memory")
+    assert prefs_cache_ttl() == 3600.0
+    monkeypatch.setattr(type(config), "STATE_BACKEND", "sqlite")
+    assert prefs_cache_ttl() == 5.0
+    monkeypatch.setattr(type(config), "PREFS_CACHE_TTL_SECS", 0.0)
+    assert prefs_cache_ttl() == 5.0
+    monkeypatch.setattr(type(config), "PREFS_CACHE_TTL_SECS", 1.0)
+    assert prefs_cache_ttl() == 1.0
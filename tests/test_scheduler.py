@@ -0,0 +1,88 @@
+"""Тесты для DeadlineScheduler."""
+import asyncio
+import time
+from app.utils.scheduler import DeadlineScheduler
+
+
+def test_fires_in_deadline_order():
+    """Сроки срабатывают по возрастанию, а не в порядке постановки."""
+    async def run():
+        scheduler = DeadlineScheduler()
+        fired = []
+        now = time.time()
+        for key, delay in (("c", 0.06), ("a", 0.02), ("b", 0.04)):
+            scheduler.schedule(key, now + delay, lambda key=key: fired.append(key))
+        await asyncio.sleep(0.12)
+        await scheduler.stop()
+        return fired, scheduler.stats()
+
+    fired, stats = asyncio.run(run())
+    assert fired == ["a", "b", "c"]
+    assert stats["pending"] == 0
+    assert stats["fired"] == 3
+
+
+def test_reschedule_replaces_deadline():
+    """Повторный schedule переносит срок: callback срабатывает один раз, по новому сроку."""
+    async def run():
+        scheduler = DeadlineScheduler()
+        fired = []
+        started = time.time()
+        for n in range(50):
+            scheduler.schedule("album", time.time() + 0.05, lambda n=n: fired.append((n, time.time() - started)))
+            await asyncio.sleep(0.001)
+        assert len(scheduler) == 1
+        await asyncio.sleep(0.15)
+        await scheduler.stop()
+        return fired
+
+    fired = asyncio.run(run())
+    assert len(fired) == 1
+    n, elapsed = fired[0]
+    assert n == 49
+    assert elapsed >= 0.05
+
+
+def test_cancel_and_coroutine_callbacks():
+    """Отменённый ключ не срабатывает; корутины запускаются отдельными задачами."""
+    async def run():
+        scheduler = DeadlineScheduler()
+        done = []
+
+        async def flush(key):
+            await asyncio.sleep(0)
+            done.append(key)
+
+        scheduler.schedule("x", time.time() + 0.02, lambda: flush("x"))
+        scheduler.schedule("y", time.time() + 0.02, lambda: flush("y"))
+        assert "x" in scheduler
+        assert scheduler.cancel("x")
+        assert not scheduler.cancel("x")
+        assert scheduler.deadline("x") is None
+        await asyncio.sleep(0.08)
+        await scheduler.stop()
+        return done
+
+    assert asyncio.run(run()) == ["y"]
+
+
+def test_one_task_for_many_keys():
+    """Тысячи ключей обслуживает одна задача, устаревшие записи кучи вычищаются."""
+    async def run():
+        scheduler = DeadlineScheduler()
+        fired = []
+        before = len(asyncio.all_tasks())
+        deadline = time.time() + 0.05
+        for n in range(2000):
+            scheduler.schedule(n % 100, deadline, lambda n=n: fired.append(n))
+        assert len(asyncio.all_tasks()) - before == 1
+        assert len(scheduler) == 100
+        await asyncio.sleep(0.1)
+        stats = scheduler.stats()
+        await scheduler.stop()
+        return fired, stats
+
+    fired, stats = asyncio.run(run())
+    assert sorted(fired) == list(range(1900, 2000))
+    assert stats["pending"] == 0
+    assert stats["heap_size"] < 2000
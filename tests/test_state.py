@@ -0,0 +1,165 @@
+"""Тесты для хранилищ буферов и FSM."""
+import asyncio
+import time
+import pytest
+from aiogram import Bot
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.types import Message
+from app.services.state import MemoryBufferStore, SQLiteBufferStore, SQLiteStorage
+
+
+def make_message(message_id: int, user_id: int = 5, media_group_id=None) -> Message:
+    data = {
+        "message_id": message_id,
+        "date": 1728910000,
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": "user"},
+        "photo": [{"file_id": f"f{message_id}", "file_unique_id": f"u{message_id}", "width": 1, "height": 1}],
+    }
+    if media_group_id:
+        data["media_group_id"] = media_group_id
+    return Message.model_validate(data)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def buffer_store(request):
+    if request.param == "sqlite":
+        request.getfixturevalue("db_engine")
+        return SQLiteBufferStore()
+    return MemoryBufferStore()
+
+
+def test_buffer_append_extends_deadline_and_take_respects_it(buffer_store):
+    """Новое сообщение переносит срок; до срока буфер не отдаётся."""
+    async def scenario():
+        first = await buffer_store.append("burst:5", make_message(1), deadline=100.0)
+        second = await buffer_store.append("burst:5", make_message(2), deadline=200.0)
+        early = await buffer_store.take("burst:5", due_before=150.0)
+        keys = await buffer_store.keys()
+        taken = await buffer_store.take("burst:5", due_before=200.0)
+        again = await buffer_store.take("burst:5")
+        return first, second, early, keys, taken, again, await buffer_store.peek("burst:5")
+
+    first, second, early, keys, taken, again, after = asyncio.run(scenario())
+    assert (first.count, second.count) == (1, 2)
+    assert second.first_at == first.first_at and second.deadline == 200.0
+    assert early == [] and keys == ["burst:5"]
+    assert [m.message_id for m in taken] == [1, 2]
+    assert again == [] and after is None
+
+
+def test_sqlite_buffer_is_taken_once_and_messages_keep_bot(db_engine):
+    """Буфер забирает только один из конкурентов; сообщения привязаны к боту."""
+    bot = Bot(token="123456:TEST")
+    store = SQLiteBufferStore()
+
+    async def scenario():
+        for i in range(1, 4):
+            await store.append("album:g", make_message(i, media_group_id="g"), deadline=0.0)
+        results = await asyncio.gather(*(store.take("album:g", bot, due_before=time.time()) for _ in range(3)))
+        await bot.session.close()
+        return results
+
+    results = asyncio.run(scenario())
+    winners = [r for r in results if r]
+    assert len(winners) == 1
+    assert [m.message_id for m in winners[0]] == [1, 2, 3]
+    assert winners[0][0].bot is bot
+    assert winners[0][0].media_group_id == "g"
+
+
+def test_sqlite_fsm_storage(db_engine):
+    """Состояние и данные FSM сохраняются и читаются другим экземпляром."""
+    key = StorageKey(bot_id=1, chat_id=2, user_id=3)
+
+    async def scenario():
+        storage = SQLiteStorage()
+        await storage.set_state(key, "PlacementState:waiting_placement")
+        await storage.update_data(key, {"a": 1})
+        await storage.update_data(key, {"b": "два"})
+        other = SQLiteStorage()
+        result = (await other.get_state(key), await other.get_data(key))
+        await other.set_state(key, None)
+        return result, await storage.get_state(key), await storage.get_data(StorageKey(1, 2, 4))
+
+    (state, data), cleared, empty = asyncio.run(scenario())
+    assert state == "PlacementState:waiting_placement"
+    assert data == {"a": 1, "b": "два"}
+    assert cleared is None
+    assert empty == {}
+
+
+def test_album_split_across_replicas_is_processed_once(db_engine, monkeypatch):
+    """Фото альбома, пришедшее на другую реплику, переносит срок и попадает в ту же пачку."""
+    from app.handlers import media
+
+    processed = []
+
+    async def fake_process(messages, user_id, grouping):
+        processed.append(([m.message_id for m in messages], user_id, grouping))
+
+    from app.utils.scheduler import DeadlineScheduler
+
+    store = SQLiteBufferStore()
+    monkeypatch.setattr(media, "buffer_store", store)
+    monkeypatch.setattr(media, "flush_scheduler", DeadlineScheduler())
+    monkeypatch.setattr(media, "process_messages_batch", fake_process)
+    monkeypatch.setattr(media, "MEDIA_GROUP_DELAY_SECS", 0.1)
+
+    async def scenario():
+        await media.handle_media_group(make_message(1, media_group_id="g"))
+        await asyncio.sleep(0.05)
+        # Вторая реплика пишет в общее хранилище и переносит срок
+        await store.append("album:g", make_message(2, media_group_id="g"), time.time() + 0.1)
+        await asyncio.sleep(0.08)
+        assert processed == []
+        await asyncio.sleep(0.2)
+
+    asyncio.run(scenario())
+    assert processed == [([1, 2], 5, "media_group")]
+    assert len(media.flush_scheduler) == 0
+
+
+def test_burst_arriving_during_flush_starts_new_buffer(monkeypatch):
+    """Фото, пришедшее во время сброса, не теряется и уходит следующей пачкой."""
+    from app.handlers import media
+
+    processed = []
+
+    async def fake_process(messages, user_id, grouping):
+        processed.append([m.message_id for m in messages])
+        await asyncio.sleep(0.05)
+
+    from app.utils.scheduler import DeadlineScheduler
+
+    monkeypatch.setattr(media, "buffer_store", MemoryBufferStore())
+    monkeypatch.setattr(media, "flush_scheduler", DeadlineScheduler())
+    monkeypatch.setattr(media, "process_messages_batch", fake_process)
+    monkeypatch.setattr(media.config, "BURST_DEBOUNCE_SECS", 0.02)
+
+    async def scenario():
+        await media.handle_single_photo(make_message(1))
+        await media.handle_single_photo(make_message(2))
+        await asyncio.sleep(0.04)
+        await media.handle_single_photo(make_message(3))
+        await asyncio.sleep(0.15)
+
+    asyncio.run(scenario())
+    assert processed == [[1, 2], [3]]
+
+
+def test_buffer_deadline_is_capped_by_max_age(buffer_store):
+    """С max_age срок сброса не уходит дальше first_at + max_age."""
+    async def scenario():
+        first = await buffer_store.append("burst:5", make_message(1), time.time() + 1, max_age=2)
+        states = [
+            await buffer_store.append("burst:5", make_message(i), time.time() + 1 + i, max_age=2)
+            for i in range(2, 6)
+        ]
+        return first, states
+
+    first, states = asyncio.run(scenario())
+    assert first.deadline <= first.first_at + 2
+    assert states[-1].count == 5
+    assert all(state.deadline <= first.first_at + 2 + 1e-6 for state in states)
+    assert states[-1].deadline == pytest.approx(first.first_at + 2)
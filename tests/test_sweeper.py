@@ -0,0 +1,75 @@
+"""Тесты для очистки состояния в памяти."""
+import asyncio
+import time
+from app.services.state import MemoryBufferStore
+from app.services.sweeper import StateSweeper
+from app.utils.cache import TTLCache
+from app.utils.scheduler import DeadlineScheduler
+from tests.test_state import make_message
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_sweep_expires_caches_and_reports_gauges():
+    """sweep удаляет просроченные записи, gauges отражают размеры после очистки."""
+    clock = FakeClock()
+    cache = TTLCache(maxsize=100, ttl=10, clock=clock)
+    for n in range(5):
+        cache.set(n, n)
+    items = {"a", "b"}
+
+    def broken():
+        raise RuntimeError("boom")
+
+    sweeper = StateSweeper(interval=60)
+    sweeper.track_cache("cache", cache)
+    sweeper.track("items", items.__len__)
+    sweeper.track("broken", len, broken)
+
+    async def run():
+        clock.now = 11
+        cache.set("fresh", 1)
+        removed = await sweeper.sweep()
+        return removed, await sweeper.gauges(), await sweeper.stats()
+
+    removed, gauges, stats = asyncio.run(run())
+    assert removed == {"cache": 5}
+    assert gauges == {"cache": 1, "items": 2}
+    assert stats["sweeps"] == 1
+    assert stats["swept"] == {"cache": 5}
+
+
+def test_orphaned_buffer_is_flushed_by_sweep(monkeypatch):
+    """Буфер, сброс которого потерян, сбрасывается при очистке."""
+    from app.handlers import media
+
+    processed = []
+
+    async def fake_process(messages, user_id, grouping):
+        processed.append(([m.message_id for m in messages], grouping))
+
+    store = MemoryBufferStore()
+    monkeypatch.setattr(media, "buffer_store", store)
+    monkeypatch.setattr(media, "flush_scheduler", DeadlineScheduler())
+    monkeypatch.setattr(media, "process_messages_batch", fake_process)
+
+    async def scenario():
+        # Срок давно прошёл, а в планировщике буфера нет
+        await store.append("burst:5", make_message(1), time.time() - 60)
+        # Свежий буфер ещё ждёт своего срока и не трогается
+        await store.append("burst:6", make_message(2, user_id=6), time.time() + 60)
+        recovered = await media.recover_orphaned_buffers()
+        await asyncio.sleep(0.05)
+        await media.flush_scheduler.stop()
+        return recovered, await store.keys()
+
+    recovered, keys = asyncio.run(scenario())
+    assert recovered == 1
+    assert processed == [([1], "debounce")]
+    assert keys == ["burst:6"]
@@ -0,0 +1,127 @@
+"""Тесты для сервиса файлов Telegram."""
+import asyncio
+from types import SimpleNamespace
+from app.services.tg_files import TelegramFileService
+
+
+class MockBot:
+    """Bot с getFile, который считает одновременные вызовы."""
+
+    def __init__(self, delays=None, fail_ids=()):
+        self.token = "123:abc"
+        self.delays = delays or {}
+        self.fail_ids = set(fail_ids)
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get_file(self, file_id):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delays.get(file_id, 0.01))
+            if file_id in self.fail_ids:
+                raise RuntimeError("flood control")
+            return SimpleNamespace(file_path=f"photos/{file_id}.jpg")
+        finally:
+            self.in_flight -= 1
+
+
+def make_message(message_id, file_id):
+    photo = SimpleNamespace(file_id=file_id, file_unique_id=f"u{file_id}", file_size=100, width=10, height=10)
+    return SimpleNamespace(message_id=message_id, photo=[photo], caption=None, content_type="photo")
+
+
+def test_extract_creatives_preserves_order():
+    """Порядок креативов совпадает с порядком сообщений, даже если ответы приходят вразнобой."""
+    bot = MockBot(delays={"f1": 0.05, "f2": 0.01, "f3": 0.03})
+    service = TelegramFileService(bot, concurrency=3)
+    messages = [make_message(1, "f1"), make_message(2, "f2"), make_message(3, "f3")]
+
+    creatives = asyncio.run(service.extract_creatives_from_messages(messages))
+
+    assert [c.file_id for c in creatives] == ["f1", "f2", "f3"]
+    assert creatives[0].download_url.endswith("/photos/f1.jpg")
+
+
+def test_extract_creatives_respects_concurrency_limit():
+    """Не больше `concurrency` одновременных запросов getFile."""
+    bot = MockBot()
+    service = TelegramFileService(bot, concurrency=2)
+    messages = [make_message(i, f"f{i}") for i in range(8)]
+
+    creatives = asyncio.run(service.extract_creatives_from_messages(messages))
+
+    assert len(creatives) == 8
+    assert bot.max_in_flight == 2
+
+
+def test_extract_creatives_isolates_failures():
+    """Ошибка одного сообщения не ломает остальные креативы."""
+    bot = MockBot(fail_ids={"f2"})
+    service = TelegramFileService(bot, concurrency=3)
+    broken = SimpleNamespace(message_id=4, content_type="photo")  # нет атрибута photo
+    messages = [make_message(1, "f1"), make_message(2, "f2"), make_message(3, "f3"), broken]
+
+    creatives = asyncio.run(service.extract_creatives_from_messages(messages))
+
+    assert [c.file_id for c in creatives] == ["f1", "f2", "f3"]
+    assert creatives[1].download_url is None
+
+
+def test_get_file_url_uses_cache():
+    """Повторный запрос того же файла не вызывает getFile."""
+    bot = MockBot()
+    calls = []
+    original = bot.get_file
+
+    async def counting_get_file(file_id):
+        calls.append(file_id)
+        return await original(file_id)
+
+    bot.get_file = counting_get_file
+    service = TelegramFileService(bot)
+
+    async def scenario():
+        first = await service.get_file_url("f1", "uf1")
+        # Пересланный файл: другой file_id, тот же file_unique_id
+        second = await service.get_file_url("f1-forwarded", "uf1")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert first == second
+    assert calls == ["f1"]
+    assert service.cache_stats()["hits"] == 1
+    assert service.cache_stats()["misses"] == 1
+
+
+def test_get_file_url_does_not_cache_errors():
+    """Ошибки getFile не кэшируются."""
+    bot = MockBot(fail_ids={"f1"})
+    service = TelegramFileService(bot)
+
+    assert asyncio.run(service.get_file_url("f1", "uf1")) is None
+    assert len(service.path_cache) == 0
+
+
+def test_file_url_uses_bot_api_server():
+    """URL файла строится по серверу Bot API сессии бота (например, локальному)."""
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+
+    async def build():
+        local = Bot("123:abc", session=AiohttpSession(api=TelegramAPIServer.from_base("http://localhost:8081")))
+        default = Bot("123:abc")
+        try:
+            return (
+                TelegramFileService(local).file_url("photos/a.jpg"),
+                TelegramFileService(default).file_url("photos/a.jpg"),
+            )
+        finally:
+            await local.session.close()
+            await default.session.close()
+
+    local_url, default_url = asyncio.run(build())
+    assert local_url == "http://localhost:8081/file/bot123:abc/photos/a.jpg"
+    assert default_url == "https://api.telegram.org/file/bot123:abc/photos/a.jpg"
@@ -0,0 +1,103 @@
+"""Тесты для приёма обновлений по HTTP."""
+import asyncio
+import httpx
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message
+from app.services.update_server import SECRET_HEADER, UpdateServer
+
+
+def make_update(update_id: int, text: str = "hello") -> dict:
+    """Минимальное обновление с текстовым сообщением."""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1728910000,
+            "chat": {"id": 1, "type": "private"},
+            "from": {"id": 1, "is_bot": False, "first_name": "user"},
+            "text": text,
+        },
+    }
+
+
+def make_server(handler, **kwargs) -> UpdateServer:
+    router = Router()
+    router.message()(handler)
+    dp = Dispatcher()
+    dp.include_router(router)
+    bot = Bot(token="123456:TEST")
+    return UpdateServer(dp, bot, secret_token="s3cret", host="127.0.0.1", port=0, path="/tg", **kwargs)
+
+
+def test_secret_token_is_required_and_updates_are_processed():
+    """Без секрета — 401; с секретом обновление подтверждается и обрабатывается."""
+    seen = []
+
+    async def handler(message: Message):
+        seen.append(message.text)
+
+    async def scenario():
+        server = make_server(handler, workers=2)
+        await server.start()
+        url = f"http://127.0.0.1:{server.port}/tg"
+        async with httpx.AsyncClient() as client:
+            denied = await client.post(url, json=make_update(1), headers={SECRET_HEADER: "wrong"})
+            missing = await client.post(url, json=make_update(2))
+            ok = await client.post(url, json=make_update(3, "привет"), headers={SECRET_HEADER: "s3cret"})
+        await server.stop()
+        await server.bot.session.close()
+        return server, denied.status_code, missing.status_code, ok.status_code
+
+    server, denied, missing, ok = asyncio.run(scenario())
+    assert (denied, missing, ok) == (401, 401, 200)
+    assert seen == ["привет"]
+    assert server.stats()["unauthorized"] == 2
+    assert server.stats()["processed"] == 1
+
+
+def test_full_queue_returns_503_and_ack_does_not_wait_for_handler():
+    """Ответ не ждёт обработки; при заполненной очереди сервер отвечает 503."""
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def handler(message: Message):
+            await gate.wait()
+
+        server = make_server(handler, workers=1, queue_size=1)
+        await server.start()
+        url = f"http://127.0.0.1:{server.port}/tg"
+        headers = {SECRET_HEADER: "s3cret"}
+        statuses = []
+        async with httpx.AsyncClient() as client:
+            for update_id in range(1, 4):
+                response = await asyncio.wait_for(client.post(url, json=make_update(update_id), headers=headers), 1)
+                statuses.append(response.status_code)
+                await asyncio.sleep(0.02)  # воркер успевает взять первое обновление
+        gate.set()
+        await server.stop()
+        await server.bot.session.close()
+        return server, statuses
+
+    server, statuses = asyncio.run(scenario())
+    # 1 — в обработке у воркера, 2 — в очереди, 3 — очередь заполнена
+    assert statuses == [200, 200, 503]
+    assert server.rejected == 1
+    assert server.processed == 2
+
+
+def test_webhook_mode_waits_for_sigterm():
+    """В режиме webhook SIGTERM завершает ожидание, и main доходит до finally."""
+    import os
+    import signal
+    from app.main import wait_for_stop_signal
+
+    async def scenario():
+        waiter = asyncio.create_task(wait_for_stop_signal())
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        os.kill(os.getpid(), signal.SIGTERM)
+        await asyncio.wait_for(waiter, 1)
+
+    asyncio.run(scenario())
+    # Обработчик снят: сигнал больше не перехватывается циклом
+    assert signal.getsignal(signal.SIGTERM) == signal.SIG_DFL
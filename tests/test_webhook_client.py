@@ -0,0 +1,258 @@
+"""Тесты для клиента вебхуков."""
+import asyncio
+from app.services.webhook_client import get_http_client, close_http_client
+
+
+def test_http_client_is_shared():
+    """Общий HTTP-клиент переиспользуется и пересоздаётся после закрытия."""
+    async def scenario():
+        first = get_http_client()
+        assert get_http_client() is first
+        await close_http_client()
+        assert first.is_closed
+        second = get_http_client()
+        assert second is not first
+        await close_http_client()
+
+    asyncio.run(scenario())
+
+
+def test_parallelism_limited_per_webhook(monkeypatch):
+    """Одновременных запросов к одному URL не больше WEBHOOK_PARALLELISM."""
+    import httpx
+    from app.models.payload import TextsPayload
+    from app.services import webhook_client as module
+    from app.services.webhook_client import WebhookClient
+
+    state = {"in_flight": 0, "max": {}}
+
+    async def handler(request):
+        url = str(request.url)
+        state["in_flight"] += 1
+        state["max"][url] = max(state["max"].get(url, 0), state["in_flight"])
+        await asyncio.sleep(0.02)
+        state["in_flight"] -= 1
+        return httpx.Response(200)
+
+    async def scenario():
+        monkeypatch.setattr(module, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        client = WebhookClient(parallelism=2)
+        chat = {"chat_id": 1, "type": "private", "title": None}
+        from_ = {"user_id": 1, "username": None}
+        results = await asyncio.gather(*(
+            client.send_texts([f"t{i}"], "http://hook/a", "drive", chat, from_)
+            for i in range(6)
+        ))
+        await close_http_client()
+        return results
+
+    assert all(asyncio.run(scenario()))
+    assert state["max"]["http://hook/a"] == 2
+
+
+def test_chunk_texts_by_count_and_bytes():
+    """Тексты режутся по количеству и по размеру в байтах."""
+    from app.services.webhook_client import chunk_texts
+
+    assert chunk_texts(["a", "b", "c", "d", "e"], max_count=2, max_bytes=1000) == [["a", "b"], ["c", "d"], ["e"]]
+    # "ж" — 2 байта в UTF-8, плюс 3 байта на кавычки и запятую
+    assert chunk_texts(["жж", "жж", "жж"], max_count=100, max_bytes=14) == [["жж", "жж"], ["жж"]]
+    # Слишком большой текст уходит отдельным чанком
+    assert chunk_texts(["x" * 50, "y"], max_count=100, max_bytes=10) == [["x" * 50], ["y"]]
+    assert chunk_texts([], max_count=10, max_bytes=10) == []
+
+
+def test_send_texts_batch_retries_chunks_independently(monkeypatch):
+    """Повторяется только неуспешный чанк; чанки несут batch/seq/total."""
+    import json
+    import httpx
+    from app.services import webhook_client as module
+    from app.services.webhook_client import WebhookClient
+
+    seen = []
+    failed_once = set()
+
+    def handler(request):
+        body = json.loads(request.content)
+        key = request.headers["X-Idempotency-Key"]
+        seen.append((key, body["batch"]["seq"], body["batch"]["total"], body["texts"]))
+        if body["batch"]["seq"] == 2 and key not in failed_once:
+            failed_once.add(key)
+            return httpx.Response(503)
+        return httpx.Response(200)
+
+    monkeypatch.setattr(module.config, "TEXTS_CHUNK_MAX_COUNT", 2)
+    monkeypatch.setattr(module.config, "TEXTS_CHUNK_MAX_BYTES", 10_000)
+
+    async def scenario():
+        monkeypatch.setattr(module, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        client = WebhookClient()
+        client.retry_backoff = 0.001
+        chat = {"chat_id": 1, "type": "private", "title": None}
+        from_ = {"user_id": 1, "username": None}
+        result = await client.send_texts_batch(
+            ["a", "b", "c", "d", "e"], "http://hook/t", "drive", chat, from_, batch_id="42"
+        )
+        await close_http_client()
+        return result
+
+    assert asyncio.run(scenario()) == (3, 3)
+    assert sorted(seen) == [
+        ("42.1", 1, 3, ["a", "b"]),
+        ("42.2", 2, 3, ["c", "d"]),
+        ("42.2", 2, 3, ["c", "d"]),
+        ("42.3", 3, 3, ["e"]),
+    ]
+
+
+def test_compression_per_webhook_with_threshold(monkeypatch):
+    """Сжимаются только тела настроенных вебхуков не меньше порога."""
+    import gzip
+    import httpx
+    from app.services import webhook_client as module
+    from app.services.webhook_client import WebhookClient
+    from app.utils.env import Config
+
+    monkeypatch.setattr(Config, "WEBHOOK_DRIVE_TEXT", "http://hook/drive-text")
+    monkeypatch.setattr(Config, "WEBHOOK_SAMOKATY_TEXT", "http://hook/samokaty-text")
+    monkeypatch.setattr(Config, "WEBHOOK_COMPRESSION", {"drive_text": "gzip"})
+    monkeypatch.setattr(Config, "WEBHOOK_COMPRESSION_MIN_BYTES", 600)
+    received = []
+
+    def handler(request):
+        received.append((str(request.url), request.headers.get("Content-Encoding"), request.content))
+        return httpx.Response(200)
+
+    async def scenario():
+        monkeypatch.setattr(module, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        client = WebhookClient()
+        chat = {"chat_id": 1, "type": "private", "title": None}
+        from_ = {"user_id": 1, "username": None}
+        big = [f"строка объявления {i}" for i in range(50)]
+        await client.send_texts(big, "http://hook/drive-text", "drive", chat, from_, batch_id="1")
+        await client.send_texts(["коротко"], "http://hook/drive-text", "drive", chat, from_, batch_id="2")
+        await client.send_texts(big, "http://hook/samokaty-text", "samokaty", chat, from_, batch_id="3")
+        await close_http_client()
+
+    asyncio.run(scenario())
+    (url1, enc1, body1), (_, enc2, _), (_, enc3, _) = received
+    assert enc1 == "gzip"
+    assert "строка объявления 49" in gzip.decompress(body1).decode("utf-8")
+    assert enc2 is None
+    assert enc3 is None
+
+
+def test_zstd_falls_back_to_gzip_without_package(monkeypatch):
+    """Без пакета zstandard используется gzip."""
+    import builtins
+    import gzip
+    from app.services.webhook_client import compress_body
+
+    real_import = builtins.__import__
+
+    def fake_import(name, *args, **kwargs):
+        if name == "zstandard":
+            raise ImportError(name)
+        return real_import(name, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "__import__", fake_import)
+    data, encoding = compress_body(b'{"a": 1}' * 100, "zstd")
+    assert encoding == "gzip"
+    assert gzip.decompress(data) == b'{"a": 1}' * 100
+
+
+def _sample_payload():
+    """Небольшой WebhookPayload с кириллицей и алиасом from."""
+    from app.models.payload import BatchInfo, ChatInfo, Creative, MessageInfo, UserInfo, WebhookPayload
+
+    return WebhookPayload(
+        service="drive",
+        chat=ChatInfo(chat_id=1, type="private"),
+        from_=UserInfo(user_id=7, username="user"),
+        message=MessageInfo(message_id=10, date_ts=1700000000),
+        message_ids=[10],
+        creatives=[Creative(type="photo", caption="Привет", file_id="f1", download_url="u1")],
+        download_urls=["u1"],
+        batch=BatchInfo(batch_id="b", seq=1, total=1, grouping="debounce"),
+    )
+
+
+def test_encode_model_matches_model_dump():
+    """Быстрая сериализация даёт тот же JSON, что и model_dump(by_alias=True)."""
+    import json
+    from app.services.webhook_client import encode_model
+
+    payload = _sample_payload()
+    body = encode_model(payload)
+    assert isinstance(body, bytes)
+    assert json.loads(body) == payload.model_dump(by_alias=True)
+    assert "Привет".encode("utf-8") in body
+
+
+def test_send_payload_reuses_body_and_sends_digest(monkeypatch):
+    """Переданное тело уходит как есть, payload повторно не сериализуется."""
+    import hashlib
+    import httpx
+    from app.services import webhook_client as module
+    from app.services.webhook_client import WebhookClient, encode_model
+
+    received = []
+
+    def handler(request):
+        received.append((request.content, request.headers.get("X-Payload-Digest")))
+        return httpx.Response(200)
+
+    def fail_encode(model):
+        raise AssertionError("payload сериализован повторно")
+
+    payload = _sample_payload()
+    body = encode_model(payload)
+    monkeypatch.setattr(module, "encode_model", fail_encode)
+
+    async def scenario():
+        monkeypatch.setattr(module, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        ok = await WebhookClient().send_payload(payload, "http://hook/a", "b.1", body=body)
+        await close_http_client()
+        return ok
+
+    assert asyncio.run(scenario())
+    assert received == [(body, "sha256=" + hashlib.sha256(body).hexdigest())]
+
+
+def test_check_optional_packages_warns_once_for_missing_h2(monkeypatch, caplog):
+    """HTTP2_ENABLED без пакета h2 — предупреждение при старте и откат на HTTP/1.1."""
+    import importlib.util
+    import logging
+    from app.services import webhook_client as webhook_module
+
+    real_find_spec = importlib.util.find_spec
+    monkeypatch.setattr(
+        importlib.util, "find_spec", lambda name, *a: None if name == "h2" else real_find_spec(name, *a)
+    )
+    monkeypatch.setattr(type(webhook_module.config), "HTTP2_ENABLED", True)
+
+    with caplog.at_level(logging.WARNING):
+        assert webhook_module.check_optional_packages() == ["h2"]
+        client = webhook_module._create_http_client()
+    assert [r.getMessage() for r in caplog.records if "h2" in r.getMessage()] == [
+        "⚠️ HTTP2_ENABLED=true, но пакет h2 не установлен (pip install h2) — используем HTTP/1.1"
+    ]
+    asyncio.run(client.aclose())
+
+
+def test_check_optional_packages_warns_for_missing_zstandard(monkeypatch, caplog):
+    """zstd в WEBHOOK_COMPRESSION без пакета zstandard — предупреждение при старте, сжатие gzip."""
+    import importlib.util
+    import logging
+    from app.services import webhook_client as webhook_module
+
+    real_find_spec = importlib.util.find_spec
+    monkeypatch.setattr(
+        importlib.util, "find_spec", lambda name, *a: None if name == "zstandard" else real_find_spec(name, *a)
+    )
+    monkeypatch.setattr(type(webhook_module.config), "HTTP2_ENABLED", False)
+    monkeypatch.setattr(type(webhook_module.config), "WEBHOOK_COMPRESSION", {"prokat": "zstd"})
+
+    with caplog.at_level(logging.WARNING):
+        assert webhook_module.check_optional_packages() == ["zstandard"]
+    assert any("zstandard" in r.getMessage() for r in caplog.records)